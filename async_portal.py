@@ -0,0 +1,121 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import services
+
+#  asyncio façade over services.py
+#
+#  The drivers block, so every call runs on a bounded thread pool and the
+#  event loop stays free to serve other sessions meanwhile. The pool is
+#  sized to the connection pool by default: a worker never has to wait for
+#  a connection another worker holds.
+#
+#    async with AsyncPortal() as portal:
+#        order_id = await portal.place_order("101", {12: 2, 15: 1})
+
+
+class AsyncPortal:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or database.pool_capacity(database.settings.db_name)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="portal")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    # Users
+    async def register_user(self, user_id, password, role, email, age, contact_number, city, state, pincode):
+        return await self._run(services.register_user, user_id, password, role, email, age,
+                               contact_number, city, state, pincode)
+
+    async def authenticate(self, user_id, password, role):
+        return await self._run(services.authenticate, user_id, password, role)
+
+    async def login(self, user_id, password, role):
+        return await self._run(services.login, user_id, password, role)
+
+    # In-memory lookups: no need for a worker
+    async def session_user(self, token):
+        return services.session_user(token)
+
+    async def logout(self, token):
+        services.logout(token)
+
+    # Catalog
+    async def list_categories(self):
+        return await self._run(services.list_categories)
+
+    async def list_subcategories(self, category_id):
+        return await self._run(services.list_subcategories, category_id)
+
+    async def list_products(self, subcategory_id, in_stock_only=False):
+        return await self._run(services.list_products, subcategory_id, in_stock_only)
+
+    async def get_product(self, product_id):
+        return await self._run(services.get_product, product_id)
+
+    async def search_products(self, text, limit=20, in_stock_only=True):
+        return await self._run(services.search_products, text, limit, in_stock_only)
+
+    async def add_product(self, name, category, subcategory, price, stock, reorder_threshold=0):
+        return await self._run(services.add_product, name, category, subcategory, price, stock,
+                               reorder_threshold)
+
+    async def delete_product(self, product_id):
+        return await self._run(services.delete_product, product_id)
+
+    async def low_stock_watchlist(self):
+        return await self._run(services.low_stock_watchlist)
+
+    # Orders
+    async def place_order(self, user_id, cart, idempotency_key=None):
+        return await self._run(services.place_order, user_id, cart, idempotency_key)
+
+    async def shortages(self, cart):
+        return await self._run(services.shortages, cart)
+
+    async def active_order_lines(self, user_id):
+        return await self._run(services.active_order_lines, user_id)
+
+    async def update_order_line(self, user_id, order_id, product_id, new_quantity, expected_quantity=None,
+                                idempotency_key=None):
+        return await self._run(services.update_order_line, user_id, order_id, product_id,
+                               new_quantity, expected_quantity, idempotency_key)
+
+    async def cancel_order(self, user_id, order_id, idempotency_key=None):
+        return await self._run(services.cancel_order, user_id, order_id, idempotency_key)
+
+    async def fetch_orders_page(self, user_id=None, status=None, since=None, until=None, after=None, limit=None,
+                                include_archived=False):
+        return await self._run(services.fetch_orders_page, user_id, status, since, until, after, limit,
+                               include_archived)
+
+    # Streams orders page by page, like services.iter_orders()
+    async def iter_orders(self, user_id=None, status=None, since=None, until=None, page_size=None,
+                          include_archived=False):
+        after = None
+        while True:
+            rows, after = await self.fetch_orders_page(user_id, status, since, until, after, page_size,
+                                                       include_archived)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    async def get_order(self, order_id, user_id=None):
+        return await self._run(services.get_order, order_id, user_id)
+
+    # Reports
+    async def sales_report(self, days=7, top=10):
+        return await self._run(services.sales_report, days, top)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
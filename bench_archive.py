@@ -0,0 +1,137 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import bench_export
+import database
+import order_archive
+import services
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Order archival: hot-table size, customer reads, and batch lengths
+#
+#  Fills a year of order history (bench_export.fill_orders: statuses spread
+#  over Placed / Shipped / Delivered / Cancelled), times the customer order
+#  reads, archives everything cancelled or delivered older than --days, and
+#  times the reads again. Reports how long the longest archive batch held
+#  its transaction open, and checks that every customer's history (with
+#  include_archived) lists exactly the orders it listed before.
+#
+#    python bench_archive.py --orders 500000 --days 90
+
+READS = 200
+
+
+def _time_reads(customer_ids, rng):
+    timings = {"active_order_lines": [], "orders_page": []}
+    for _ in range(READS):
+        user_id = rng.choice(customer_ids)
+        started = time.perf_counter()
+        services.active_order_lines(user_id)
+        timings["active_order_lines"].append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        services.fetch_orders_page(user_id, status="Placed")
+        timings["orders_page"].append((time.perf_counter() - started) * 1000.0)
+    return {name: {"p50_ms": round(percentile(sorted(values), 50), 3),
+                   "p95_ms": round(percentile(sorted(values), 95), 3)}
+            for name, values in timings.items()}
+
+
+def _histories(customer_ids):
+    return {user_id: sorted(row[0] for row in services.iter_orders(user_id, include_archived=True))
+            for user_id in customer_ids}
+
+
+def run_benchmark(orders=100_000, lines=2, days=90, batch_size=None, seed=1):
+    rng = random.Random(seed)
+    bench_export.fill_orders(orders, lines, rng)
+    customer_ids = [row[0] for row in bench_export.bench_orders._execute(
+        "SELECT DISTINCT user_id FROM orders", fetch=True)]
+    sizes_before = order_archive.table_sizes()
+    histories_before = _histories(customer_ids)
+    reads_before = _time_reads(customer_ids, random.Random(seed))
+
+    batch_ends = []
+    report = order_archive.archive_orders(days, batch_size,
+                                          progress=lambda archived, elapsed: batch_ends.append(elapsed))
+    batch_ms = [(end - start) * 1000.0 for start, end in zip([0.0] + batch_ends, batch_ends)]
+
+    sizes_after = order_archive.table_sizes()
+    reads_after = _time_reads(customer_ids, random.Random(seed))
+    histories_match = _histories(customer_ids) == histories_before
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "orders": orders,
+            "lines_per_order": lines,
+            "days": days,
+            "batch_size": batch_size or database.settings.archive_batch_size,
+            "seed": seed,
+            "backend": database.get_backend().name,
+        },
+        "sizes_before": sizes_before,
+        "sizes_after": sizes_after,
+        "archive": {
+            "orders_archived": report["orders_archived"],
+            "lines_archived": report["lines_archived"],
+            "batches": report["batches"],
+            "elapsed_s": report["elapsed_s"],
+            "orders_per_sec": round(report["orders_archived"] / report["elapsed_s"], 1) if report["elapsed_s"] else 0.0,
+            "longest_batch_ms": round(max(batch_ms), 2) if batch_ms else 0.0,
+        },
+        "reads_before": reads_before,
+        "reads_after": reads_after,
+        "histories_match": histories_match,
+    }
+
+
+def print_report(report):
+    config, archive = report["config"], report["archive"]
+    before, after = report["sizes_before"], report["sizes_after"]
+    print(f"\n🗄 Archiving orders older than {config['days']} days "
+          f"(batch {config['batch_size']}, backend={config['backend']})")
+    print(f"Live orders: {before['orders']:,} -> {after['orders']:,} "
+          f"({archive['orders_archived']:,} archived with {archive['lines_archived']:,} lines)")
+    print(f"{archive['batches']} batches in {archive['elapsed_s']}s ({archive['orders_per_sec']:,} orders/sec), "
+          f"longest {archive['longest_batch_ms']} ms")
+    print(f"{'Read':<20} {'p50 before':<12} {'p50 after':<12} {'p95 before':<12} {'p95 after':<12}")
+    for name in report["reads_before"]:
+        b, a = report["reads_before"][name], report["reads_after"][name]
+        print(f"{name:<20} {b['p50_ms']:<12} {a['p50_ms']:<12} {b['p95_ms']:<12} {a['p95_ms']:<12}")
+    if report["histories_match"]:
+        print("✅ Every customer's history lists the same orders as before archiving.")
+    else:
+        print("❌ Customer histories changed when their orders were archived!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark order archival")
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--lines", type=int, default=2)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_archive_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+    report = run_benchmark(args.orders, args.lines, args.days, args.batch_size, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+
+import database
+import services
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Login and per-request authentication cost
+#
+#  For each PBKDF2 cost: logins/sec (password check + token issue, over
+#  --threads threads) and what authenticating one request costs with a
+#  session token versus re-checking the password. The plaintext query the
+#  portal used before hashed passwords is timed as a baseline.
+#
+#    python bench_auth.py --costs 10000,100000,600000 --logins 50 --threads 4
+
+BENCH_USER = "880000"
+BENCH_PASSWORD = "bench-auth"
+
+
+def _prepare_user(iterations):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM users WHERE user_id = %s", (BENCH_USER,))
+        conn.commit()
+        cursor.close()
+    database.settings.password_hash_iterations = iterations
+    services.register_user(BENCH_USER, BENCH_PASSWORD, "Customer", "auth@bench.local", 30, "", "", "", "")
+
+
+def _timed(func, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return sorted(samples)
+
+
+def _latency(samples):
+    return {
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+    }
+
+
+def _legacy_login():
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE user_id = %s AND password = %s AND role = %s",
+                       (BENCH_USER, BENCH_PASSWORD, "Customer"))
+        cursor.fetchone()
+        cursor.close()
+
+
+def _login_throughput(logins, threads):
+    failures = []
+
+    def worker(count):
+        for _ in range(count):
+            token = services.login(BENCH_USER, BENCH_PASSWORD, "Customer")
+            if token is None:
+                failures.append(1)
+            else:
+                services.logout(token)
+
+    shares = [logins // threads + (1 if i < logins % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(n,)) for n in shares]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - started
+    return round(logins / wall, 2), len(failures)
+
+
+def run_benchmark(costs=(10_000, 100_000, 600_000), logins=20, threads=1, requests=10_000):
+    database.create_database()
+    database.apply_migrations()
+    configured = database.settings.password_hash_iterations
+    results = []
+    try:
+        for iterations in costs:
+            _prepare_user(iterations)
+            logins_per_sec, failures = _login_throughput(logins, threads)
+            token = services.login(BENCH_USER, BENCH_PASSWORD, "Customer")
+            results.append({
+                "iterations": iterations,
+                "logins_per_sec": logins_per_sec,
+                "login_failures": failures,
+                "login": _latency(_timed(lambda: services.login(BENCH_USER, BENCH_PASSWORD, "Customer"), logins)),
+                "per_request_password": _latency(
+                    _timed(lambda: services.authenticate(BENCH_USER, BENCH_PASSWORD, "Customer"), logins)),
+                "per_request_session": _latency(_timed(lambda: services.session_user(token), requests)),
+            })
+            services.session_cache.clear()
+        legacy = _latency(_timed(_legacy_login, requests // 10 or 1))
+    finally:
+        database.settings.password_hash_iterations = configured
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "costs": list(costs),
+            "logins": logins,
+            "threads": threads,
+            "session_requests": requests,
+            "backend": database.get_backend().name,
+        },
+        "legacy_plaintext_query": legacy,
+        "costs": results,
+    }
+
+
+def print_report(report):
+    legacy = report["legacy_plaintext_query"]
+    print(f"\n🔐 Plaintext SQL check (before hashing): {legacy['mean_ms']} ms per request")
+    print(f"{'Iterations':<12} {'logins/s':<10} {'login p50 ms':<14} {'password/request ms':<21} "
+          f"{'session/request µs':<19} Speed-up")
+    for r in report["costs"]:
+        password_ms = r["per_request_password"]["mean_ms"]
+        session_ms = r["per_request_session"]["mean_ms"]
+        speedup = f"{password_ms / session_ms:,.0f}x" if session_ms else "-"
+        print(f"{r['iterations']:<12} {r['logins_per_sec']:<10} {r['login']['p50_ms']:<14} {password_ms:<21} "
+              f"{round(session_ms * 1000, 2):<19} {speedup}")
+        if r["login_failures"]:
+            print(f"❌ {r['login_failures']} failed logins at {r['iterations']} iterations")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark password hashing cost and session lookups")
+    parser.add_argument("--costs", default="10000,100000,600000", help="comma separated PBKDF2 iteration counts")
+    parser.add_argument("--logins", type=int, default=20, help="logins timed per cost")
+    parser.add_argument("--threads", type=int, default=1, help="threads logging in concurrently")
+    parser.add_argument("--requests", type=int, default=10000, help="session lookups timed per cost")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_auth_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+
+    report = run_benchmark(
+        costs=[int(c) for c in args.costs.split(",") if c.strip()],
+        logins=args.logins,
+        threads=args.threads,
+        requests=args.requests,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+from datetime import datetime, timedelta
+
+import bench_orders
+import data_export
+import database
+from storage import MySQLBackend, SQLiteBackend
+
+#  Streaming export throughput on a large order history
+#
+#  Fills the store with --orders orders of --lines lines each (straight
+#  INSERTs: summaries and stock are not kept, this data is only exported),
+#  then exports them once per format and reports rows/sec, file size and how
+#  much the process's peak RSS grew while exporting: close to nothing when
+#  rows really stream.
+#
+#    python bench_export.py --orders 1000000 --lines 2
+
+FORMATS = ("csv", "csv.gz", "jsonl", "jsonl.gz")
+STATUSES = ("Placed", "Shipped", "Delivered", "Cancelled")
+
+
+def _executemany(sql, rows):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(sql, rows)
+        conn.commit()
+        cursor.close()
+
+
+def fill_orders(orders, lines, rng, batch_size=10000):
+    customer_ids, _ = bench_orders.prepare_store(50, 0, None)
+    products = bench_orders._execute("SELECT id, price FROM products ORDER BY id", fetch=True)
+    first_id = (bench_orders._execute("SELECT MAX(id) FROM orders", fetch=True)[0][0] or 0) + 1
+    start = datetime.now() - timedelta(days=365)
+    for batch_start in range(0, orders, batch_size):
+        order_rows, line_rows = [], []
+        for order_id in range(first_id + batch_start, first_id + min(orders, batch_start + batch_size)):
+            requested = start + timedelta(seconds=rng.randrange(365 * 86400))
+            order_rows.append((order_id, int(rng.choice(customer_ids)), rng.choice(STATUSES), requested,
+                               "Pune", "Maharashtra", "411001"))
+            for product_id, price in rng.sample(products, min(lines, len(products))):
+                line_rows.append((order_id, product_id, rng.randint(1, 5), price))
+        _executemany("""
+            INSERT INTO orders (id, user_id, status, requested_date, shipping_city, shipping_state, shipping_pincode)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, order_rows)
+        _executemany("INSERT INTO order_lines (order_id, product_id, quantity, unit_price) VALUES (%s, %s, %s, %s)",
+                     line_rows)
+
+
+def _peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_benchmark(orders=100_000, lines=2, out_dir=None, chunk_size=5000, seed=1):
+    rng = random.Random(seed)
+    fill_orders(orders, lines, rng)
+    out_dir = out_dir or tempfile.mkdtemp(prefix="bench_export_")
+    results = {}
+    peak_before = _peak_rss_mib()
+    for fmt in FORMATS:
+        path = os.path.join(out_dir, f"orders.{fmt}")
+        report = data_export.export_table("orders", path, chunk_size=chunk_size)
+        results[fmt] = {key: report[key] for key in ("rows", "bytes", "elapsed_s", "rows_per_sec")}
+        os.remove(path)
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "orders": orders,
+            "lines_per_order": lines,
+            "chunk_size": chunk_size,
+            "seed": seed,
+            "backend": database.get_backend().name,
+        },
+        "formats": results,
+        "peak_rss_growth_mib": round(_peak_rss_mib() - peak_before, 1),
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    rows = next(iter(report["formats"].values()))["rows"]
+    print(f"\n📤 Order export: {rows:,} order lines (chunk {config['chunk_size']}, backend={config['backend']})")
+    print(f"{'Format':<10} {'seconds':<10} {'rows/sec':<12} {'MiB':<10}")
+    for fmt, s in report["formats"].items():
+        print(f"{fmt:<10} {s['elapsed_s']:<10} {s['rows_per_sec']:<12,.0f} {s['bytes'] / 2 ** 20:<10.1f}")
+    print(f"📈 Peak RSS grew {report['peak_rss_growth_mib']} MiB while exporting")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark streaming order export")
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--lines", type=int, default=2, help="lines per order")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--out-dir", help="where the export files go (removed after each run)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_export_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+
+    report = run_benchmark(args.orders, args.lines, args.out_dir, args.chunk_size, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
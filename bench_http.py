@@ -0,0 +1,321 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import database
+import services
+from bench_orders import check_consistency, percentile, prepare_store, stock_ledger
+from portal_server import PortalHTTPServer
+from storage import MySQLBackend, SQLiteBackend
+
+#  Load test for portal_server.py
+#
+#  Each simulated kiosk logs one customer in, keeps one keep-alive
+#  connection and runs a weighted mix of browse / order / listing requests
+#  with that session's token. Without --url a server is
+#  started in-process on a fresh store, which also allows the stock ledger
+#  check afterwards.
+#
+#    python bench_http.py --clients 16 --requests 200 --sqlite-path bench.db
+#    python bench_http.py --url http://127.0.0.1:8080 --clients 32 --duration 30
+
+MIX = {
+    "browse": 30,
+    "product": 10,
+    "place_order": 25,
+    "list_orders": 15,
+    "view_order": 10,
+    "update_order": 5,
+    "cancel_order": 5,
+}
+
+
+class Kiosk:
+    def __init__(self, host, port, rng, user_id, product_ids, max_quantity, cart_lines):
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.user_id = user_id
+        self.product_ids = product_ids
+        self.max_quantity = max_quantity
+        self.cart_lines = cart_lines
+        self.orders = []  # (order_id, product_id, quantity) of orders placed here
+        self.connects = 0
+        self.conn = None
+        self.token = None
+
+    def login(self, password):
+        status, body, _ = self.request("POST", "/sessions", {"user_id": self.user_id, "password": password,
+                                                              "role": "Customer"})
+        if status != 201:
+            raise RuntimeError(f"login of {self.user_id} failed: {status} {body}")
+        self.token = body["token"]
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                self.connects += 1
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = json.loads(response.read() or b"null")
+                return response.status, data, float(response.getheader("X-Response-Time-Ms") or 0)
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+    def run(self, operation):
+        rng = self.rng
+        if operation == "browse":
+            _, categories, _ = self.request("GET", "/categories")
+            category = rng.choice(categories)
+            _, subcategories, _ = self.request("GET", f"/categories/{category['id']}/subcategories")
+            subcategory = rng.choice(subcategories)
+            return self.request("GET", f"/subcategories/{subcategory['id']}/products?in_stock=1")
+        if operation == "product":
+            return self.request("GET", f"/products/{rng.choice(self.product_ids)}")
+        if operation == "place_order":
+            products = rng.sample(self.product_ids, rng.randint(1, self.cart_lines))
+            items = [{"product_id": pid, "quantity": rng.randint(1, self.max_quantity)} for pid in products]
+            result = self.request("POST", "/orders", {"items": items})
+            if result[0] == 201:
+                first = items[0]
+                self.orders.append((result[1]["order_id"], first["product_id"], first["quantity"]))
+            return result
+        if operation == "list_orders":
+            return self.request("GET", "/orders?limit=20")  # a customer session lists its own
+        if not self.orders:
+            return self.request("GET", "/orders?limit=20")
+        order_id, product_id, quantity = rng.choice(self.orders)
+        if operation == "view_order":
+            return self.request("GET", f"/orders/{order_id}")
+        if operation == "update_order":
+            new_quantity = rng.randint(1, self.max_quantity)
+            result = self.request("PATCH", f"/orders/{order_id}", {
+                "product_id": product_id, "quantity": new_quantity, "expected_quantity": quantity,
+            })
+            if result[0] == 200:
+                self.orders.remove((order_id, product_id, quantity))
+                self.orders.append((order_id, product_id, new_quantity))
+            return result
+        if operation == "cancel_order":
+            result = self.request("POST", f"/orders/{order_id}/cancel", {})
+            self.orders.remove((order_id, product_id, quantity))
+            return result
+        raise ValueError(f"unknown operation: {operation}")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _worker(kiosk, requests, deadline, results, errors):
+    operations = list(MIX)
+    weights = [MIX[op] for op in operations]
+    done = 0
+    try:
+        while (requests is None or done < requests) and (deadline is None or time.monotonic() < deadline):
+            operation = kiosk.rng.choices(operations, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _, server_ms = kiosk.run(operation)
+            except Exception as err:  # recorded per request, the run goes on
+                status, server_ms = 0, 0.0
+                errors.append(f"{operation}: {type(err).__name__}: {err}")
+            results.append((operation, status, (time.perf_counter() - started) * 1000.0, server_ms))
+            done += 1
+    finally:
+        kiosk.close()
+
+
+def summarize(results, wall, connects, errors, consistency, config):
+    operations = {}
+    for name in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == name]
+        latencies = sorted(r[2] for r in rows)
+        statuses = {}
+        for r in rows:
+            statuses[str(r[1])] = statuses.get(str(r[1]), 0) + 1
+        operations[name] = {
+            "count": len(rows),
+            "statuses": statuses,
+            "requests_per_sec": round(len(rows) / wall, 2) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "server_mean_ms": round(sum(r[3] for r in rows) / len(rows), 3),
+        }
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "wall_time_s": round(wall, 3),
+        "total_requests": len(results),
+        "requests_per_sec": round(len(results) / wall, 2) if wall else 0.0,
+        "connections_opened": connects,
+        "server_errors": sum(1 for r in results if r[1] >= 500 or r[1] == 0),
+        "operations": operations,
+        "consistency": consistency,
+        "errors": errors[:20],
+    }
+
+
+def run_load_test(url=None, clients=8, requests=100, duration=None, seed=1, workers=None,
+                  max_quantity=3, cart_lines=3, stock=1000, password="bench"):
+    server = thread = None
+    before = None
+    if url is None:
+        customer_ids, _ = prepare_store(clients, 0, stock)
+        before = stock_ledger()
+        server = PortalHTTPServer(("127.0.0.1", 0), workers=workers)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+    else:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        customer_ids = None
+
+    rng = random.Random(seed)
+    probe = Kiosk(host, port, rng, None, [], max_quantity, cart_lines)
+    product_ids = []
+    for category in probe.request("GET", "/categories")[1]:
+        for subcategory in probe.request("GET", f"/categories/{category['id']}/subcategories")[1]:
+            products = probe.request("GET", f"/subcategories/{subcategory['id']}/products")[1]
+            product_ids.extend(p["id"] for p in products)
+    probe.close()
+    if customer_ids is None:
+        # Against an external server: the customers bench_orders.prepare_store() creates
+        customer_ids = [str(900000 + i) for i in range(clients)]
+
+    kiosks = [Kiosk(host, port, random.Random(rng.random()), customer_ids[i % len(customer_ids)], product_ids,
+                    max_quantity, cart_lines)
+              for i in range(clients)]
+    for kiosk in kiosks:
+        kiosk.login(password)
+    results = []
+    errors = []
+    deadline = time.monotonic() + duration if duration else None
+    try:
+        threads = [
+            threading.Thread(target=_worker, args=(kiosk, None if duration else requests, deadline, results, errors))
+            for kiosk in kiosks
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    consistency = check_consistency(before, stock_ledger()) if before is not None else None
+    group_commit = None
+    if server is not None and database.settings.group_commit:
+        group_commit = services.order_writer().stats()
+        services.close_order_writer()
+    report = summarize(results, wall, sum(k.connects for k in kiosks), errors, consistency, {
+        "url": url or f"http://{host}:{port} (in-process)",
+        "clients": clients,
+        "requests_per_client": None if duration else requests,
+        "duration_s": duration,
+        "seed": seed,
+        "workers": server.workers if server is not None else None,
+        "cart_lines": cart_lines,
+        "backend": database.get_backend().name if server is not None else None,
+        "group_commit": bool(server is not None and database.settings.group_commit),
+    })
+    report["group_commit"] = group_commit
+    return report
+
+
+def print_report(report):
+    print(f"\n📈 {report['total_requests']} requests in {report['wall_time_s']}s "
+          f"({report['requests_per_sec']} req/s, {report['connections_opened']} connections)")
+    print(f"{'Operation':<15} {'Count':<7} {'req/s':<9} {'p50 ms':<9} {'p95 ms':<9} {'p99 ms':<9} "
+          f"{'server ms':<10} Statuses")
+    for name, s in report["operations"].items():
+        statuses = ", ".join(f"{code}: {n}" for code, n in sorted(s["statuses"].items()))
+        print(f"{name:<15} {s['count']:<7} {s['requests_per_sec']:<9} {s['p50_ms']:<9} {s['p95_ms']:<9} "
+              f"{s['p99_ms']:<9} {s['server_mean_ms']:<10} {statuses}")
+    if report["server_errors"]:
+        print(f"❌ {report['server_errors']} failed requests")
+    group_commit = report.get("group_commit")
+    if group_commit:
+        print(f"📦 Group commit: {group_commit['requests']} writes in {group_commit['batches']} batches "
+              f"(mean {group_commit['mean_batch_size']}, max {group_commit['max_batch_size']}), "
+              f"commit p50/p95 {group_commit['commit_p50_ms']}/{group_commit['commit_p95_ms']} ms, "
+              f"queue wait p95 {group_commit['queue_wait_p95_ms']} ms")
+    consistency = report["consistency"]
+    if consistency is not None:
+        if consistency["violations"]:
+            print(f"❌ {consistency['violations']} stock ledger violations")
+        else:
+            print("✅ No oversell or stock ledger violations.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the portal HTTP server")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--password", default="bench", help="password of the bench customers (with --url)")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent keep-alive clients")
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--duration", type=float, help="run for N seconds instead of a fixed count")
+    parser.add_argument("--workers", type=int, help="server worker threads (in-process server only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-quantity", type=int, default=3)
+    parser.add_argument("--cart-lines", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=1000, help="reset every product's stock first (-1 keeps it)")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--group-commit", action="store_true", help="batch order writes (in-process server only)")
+    parser.add_argument("--output", default="bench_http_results.json")
+    args = parser.parse_args(argv)
+
+    if args.url is None:
+        settings = database.settings
+        if args.group_commit:
+            settings.group_commit = True
+        if args.backend == "sqlite":
+            backend = SQLiteBackend(args.sqlite_path)
+        else:
+            backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+        database.configure_backend(backend)
+
+    report = run_load_test(
+        url=args.url,
+        clients=args.clients,
+        requests=args.requests,
+        duration=args.duration,
+        seed=args.seed,
+        workers=args.workers,
+        max_quantity=args.max_quantity,
+        cart_lines=args.cart_lines,
+        stock=None if args.stock < 0 else args.stock,
+        password=args.password,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
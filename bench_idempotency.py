@@ -0,0 +1,148 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bench_orders
+import database
+import services
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Cost of a retried order with and without an idempotency key
+#
+#  Times place_order without a key, with a fresh key, and the retry of that
+#  key: answered from the in-process recent keys, and again with them
+#  cleared (the stored row, as another process or a restarted one sees it).
+#  Then fires --clients concurrent attempts at every one of --races keys,
+#  the way a kiosk retries while the first attempt is still in flight, and
+#  counts the orders and stock that went out: one order per key, nothing
+#  reserved twice.
+#
+#    python bench_idempotency.py --orders 5000
+#    python bench_idempotency.py --backend mysql --clients 8
+
+CUSTOMERS = 50
+
+
+def _stats(timings):
+    timings = sorted(timings)
+    return {
+        "p50_us": round(percentile(timings, 50), 1),
+        "p95_us": round(percentile(timings, 95), 1),
+        "mean_us": round(sum(timings) / len(timings), 1),
+    }
+
+
+def _timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, (time.perf_counter() - started) * 1e6
+
+
+# (orders, units ordered) so far
+def _ordered():
+    orders = bench_orders._execute("SELECT COUNT(*) FROM orders", fetch=True)[0][0]
+    units = bench_orders._execute("SELECT COALESCE(SUM(quantity), 0) FROM order_lines", fetch=True)[0][0]
+    return orders, units
+
+
+def run_benchmark(orders=2000, races=200, clients=4, seed=1):
+    customer_ids, _ = bench_orders.prepare_store(CUSTOMERS, 0, 10 ** 7)
+    product_ids = [row[0] for row in bench_orders._execute("SELECT id FROM products", fetch=True)]
+    rng = random.Random(seed)
+
+    def cart():
+        return {rng.choice(product_ids): rng.randint(1, 3)}
+
+    timings = {"no_key": [], "first": [], "retry_cached": [], "retry_stored": []}
+    attempts = []
+    for i in range(orders):
+        user_id = rng.choice(customer_ids)
+        timings["no_key"].append(_timed(lambda: services.place_order(user_id, cart()))[1])
+        attempts.append((user_id, f"bench-{seed}-{i}", cart()))
+    for user_id, key, items in attempts:
+        timings["first"].append(_timed(lambda: services.place_order(user_id, items, key))[1])
+    for user_id, key, items in attempts:
+        timings["retry_cached"].append(_timed(lambda: services.place_order(user_id, items, key))[1])
+    services.recent_keys.clear()
+    for user_id, key, items in attempts:
+        timings["retry_stored"].append(_timed(lambda: services.place_order(user_id, items, key))[1])
+
+    orders_before, units_before = _ordered()
+    races_run = [(rng.choice(customer_ids), f"race-{seed}-{i}", cart()) for i in range(races)]
+    expected_units = sum(sum(items.values()) for _, _, items in races_run)
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = [[pool.submit(services.place_order, user_id, items, key) for _ in range(clients)]
+                    for user_id, key, items in races_run]
+        order_ids = [{future.result() for future in futures} for futures in outcomes]
+    orders_after, units_after = _ordered()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "orders": orders,
+            "races": races,
+            "clients": clients,
+            "seed": seed,
+            "backend": database.get_backend().name,
+            "cache_size": database.settings.idempotency_cache_size,
+        },
+        "latency": {name: _stats(values) for name, values in timings.items()},
+        "races": {
+            "keys": races,
+            "attempts": races * clients,
+            "orders_created": orders_after - orders_before,
+            "keys_with_one_order": sum(1 for ids in order_ids if len(ids) == 1),
+            "units_reserved": int(units_after - units_before),
+            "units_expected": expected_units,
+        },
+        "recent_keys": services.recent_keys.stats(),
+    }
+
+
+def print_report(report):
+    config, races = report["config"], report["races"]
+    print(f"\n🔁 Order retries with idempotency keys, {config['orders']:,} orders (backend={config['backend']})")
+    print(f"{'Attempt':<14} {'p50':<10} {'p95':<10} {'mean':<10}")
+    for name, stats in report["latency"].items():
+        print(f"{name:<14} {stats['p50_us']:<10} {stats['p95_us']:<10} {stats['mean_us']:<10}")
+    print("   (microseconds)")
+    print(f"{races['attempts']:,} concurrent attempts at {races['keys']:,} keys: "
+          f"{races['orders_created']:,} orders, {races['units_reserved']:,} units reserved")
+    if races["orders_created"] == races["keys"] == races["keys_with_one_order"] \
+            and races["units_reserved"] == races["units_expected"]:
+        print("✅ Every key placed exactly one order; no stock was reserved twice.")
+    else:
+        print("❌ Retried attempts placed duplicate orders!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark order retries with idempotency keys")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--races", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_idempotency_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+    report = run_benchmark(args.orders, args.races, args.clients, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+import bench_orders
+import database
+import order_ingest
+import services
+from storage import MySQLBackend, SQLiteBackend
+
+#  Batch order ingestion versus one place_order() per order
+#
+#  Writes --orders JSONL order requests for bench customers over the seeded
+#  catalog (a --invalid share naming an unknown customer or product, some
+#  with a shipping override), ingests them, and places --single orders one
+#  place_order() call at a time for comparison. The stock ledger and the
+#  summaries are checked afterwards.
+#
+#    python bench_ingest.py --orders 50000 --chunk-size 500
+
+def write_requests(path, orders, customer_ids, product_ids, invalid, rng):
+    with open(path, "w") as f:
+        for _ in range(orders):
+            request = {
+                "user_id": rng.choice(customer_ids),
+                "product_id": rng.choice(product_ids),
+                "quantity": rng.randint(1, 3),
+            }
+            roll = rng.random()
+            if roll < invalid / 2:
+                request["user_id"] = "nobody"
+            elif roll < invalid:
+                request["product_id"] = max(product_ids) + 1000
+            elif roll < invalid + 0.1:
+                request["shipping_city"] = "Nagpur"
+            f.write(json.dumps(request) + "\n")
+
+
+def run_benchmark(orders=20_000, single=500, chunk_size=500, invalid=0.02, customers=100, seed=1):
+    rng = random.Random(seed)
+    customer_ids, _ = bench_orders.prepare_store(customers, 0, 10 ** 8)
+    product_ids = [row[0] for row in bench_orders._execute("SELECT id FROM products", fetch=True)]
+    before = bench_orders.stock_ledger()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    path = os.path.join(workdir, "orders.jsonl")
+    write_requests(path, orders, customer_ids, product_ids, invalid, rng)
+    report = order_ingest.ingest_orders(path, chunk_size=chunk_size)
+    os.remove(path)
+    os.remove(report["results_path"])
+    os.rmdir(workdir)
+
+    started = time.perf_counter()
+    for _ in range(single):
+        services.place_order(rng.choice(customer_ids), {rng.choice(product_ids): rng.randint(1, 3)})
+    single_s = time.perf_counter() - started
+
+    consistency = bench_orders.check_consistency(before, bench_orders.stock_ledger())
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "orders": orders,
+            "single": single,
+            "chunk_size": chunk_size,
+            "invalid_share": invalid,
+            "seed": seed,
+            "backend": database.get_backend().name,
+        },
+        "batch": {key: report[key] for key in ("orders_placed", "lines_rejected", "chunks", "elapsed_s",
+                                               "orders_per_min")},
+        "single_orders_per_min": round(single / single_s * 60, 1) if single else 0.0,
+        "ledger_violations": consistency["violations"],
+        "summary_drift": len(services.summary_drift()),
+    }
+
+
+def print_report(report):
+    batch = report["batch"]
+    print(f"\n📦 Ingested {batch['orders_placed']:,} orders ({batch['lines_rejected']} rejected) "
+          f"in {batch['elapsed_s']}s, {batch['chunks']} transactions (backend={report['config']['backend']})")
+    print(f"{'Mode':<14} {'orders/min':<12}")
+    print(f"{'batch':<14} {batch['orders_per_min']:<12,.0f}")
+    print(f"{'place_order':<14} {report['single_orders_per_min']:<12,.0f}")
+    if report["single_orders_per_min"]:
+        print(f"📈 Batch ingestion is {batch['orders_per_min'] / report['single_orders_per_min']:,.1f}x "
+              "faster than one place_order() per order")
+    if report["ledger_violations"] or report["summary_drift"]:
+        print(f"❌ {report['ledger_violations']} stock ledger violations, "
+              f"{report['summary_drift']} summary rows off")
+    else:
+        print("✅ Stock ledger and summaries are consistent.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batch JSONL order ingestion")
+    parser.add_argument("--orders", type=int, default=50000, help="order requests ingested in batch")
+    parser.add_argument("--single", type=int, default=1000, help="orders placed one call at a time")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--invalid", type=float, default=0.02, help="share of requests that must be rejected")
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_ingest_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+
+    report = run_benchmark(args.orders, args.single, args.chunk_size, args.invalid, args.customers, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
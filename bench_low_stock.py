@@ -0,0 +1,189 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import bench_orders
+import database
+import low_stock
+import services
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Low-stock watchlist versus a scan of the catalog
+#
+#  Builds a catalog of --products bench products with random stock; a
+#  --watched share of them get a reorder threshold two units below their
+#  stock, so one order of three crosses it. Orders push products over their
+#  threshold, timing what keeping the watchlist current adds to a write;
+#  then reading the low-stock list from the watchlist is timed against the
+#  naive "WHERE stock < reorder_threshold" scan, and the two are compared.
+#
+#    python bench_low_stock.py --products 200000 --reads 50 --orders 500
+
+BENCH_CATEGORY = ("Bench", "Low Stock")
+
+
+def _timed(func, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return sorted(samples)
+
+
+def _latency(samples):
+    return {
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+    }
+
+
+def _read(func):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        rows = func(cursor)
+        cursor.close()
+    return rows
+
+
+# Upserts the bench products and sets their thresholds; returns the ids of
+# the watched ones and how long filling the watchlist took
+def build_catalog(products, watched, rng, batch_size=1000):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        for start in range(0, products, batch_size):
+            rows = [(f"Bench Product {i}", *BENCH_CATEGORY, 10.0, rng.randint(100, 1000))
+                    for i in range(start, min(products, start + batch_size))]
+            services.upsert_products(cursor, rows)
+            conn.commit()
+        cursor.execute("""
+            SELECT p.id FROM products p
+            JOIN subcategories s ON s.id = p.subcategory_id
+            JOIN categories c ON c.id = s.category_id
+            WHERE c.name = %s AND s.name = %s ORDER BY p.id
+        """, BENCH_CATEGORY)
+        ids = [row[0] for row in cursor.fetchall()]
+        watched_ids = [product_id for product_id in ids if rng.random() < watched]
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            cursor.execute(f"UPDATE products SET reorder_threshold = 0 WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                           chunk)
+        for start in range(0, len(watched_ids), batch_size):
+            chunk = watched_ids[start:start + batch_size]
+            cursor.execute(f"""
+                UPDATE products SET reorder_threshold = stock - 2
+                WHERE id IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+        conn.commit()
+        started = time.perf_counter()
+        low_stock.rebuild(cursor)
+        conn.commit()
+        rebuild_ms = (time.perf_counter() - started) * 1000.0
+        cursor.close()
+    database.catalog_cache.invalidate()
+    database.product_search.invalidate()
+    return watched_ids, rebuild_ms
+
+
+# check() for one product inside a transaction that is rolled back
+def _check_cost(product_ids, rng, count):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        samples = _timed(lambda: low_stock.check(cursor, [rng.choice(product_ids)]), count)
+        conn.rollback()
+        cursor.close()
+    return samples
+
+
+def run_benchmark(products=100_000, watched=0.01, reads=20, orders=200, seed=1):
+    rng = random.Random(seed)
+    customer_ids, _ = bench_orders.prepare_store(1, 0, None)
+    watched_ids, rebuild_ms = build_catalog(products, watched, rng)
+    listed_before = len(_read(low_stock.watchlist))
+
+    # Each order takes a watched product below its threshold (or further)
+    targets = [rng.choice(watched_ids) for _ in range(orders)]
+    order_ms = _latency(_timed(lambda: services.place_order(customer_ids[0], {targets.pop(): 3}), orders))
+    check = _latency(_check_cost(watched_ids, rng, orders))
+
+    read_watchlist = _latency(_timed(lambda: _read(low_stock.watchlist), reads))
+    read_scan = _latency(_timed(lambda: _read(low_stock.scan), reads))
+
+    watchlist = _read(low_stock.watchlist)
+    scan = _read(low_stock.scan)
+    alerts = _read(lambda cursor: low_stock.alerts_after(cursor, 0, 10 ** 9))
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "products": products,
+            "watched_share": watched,
+            "reads": reads,
+            "orders": orders,
+            "seed": seed,
+            "backend": database.get_backend().name,
+        },
+        "watchlist_fill_ms": round(rebuild_ms, 3),
+        "listed_before_orders": listed_before,
+        "listed_after_orders": len(watchlist),
+        "alerts": len(alerts),
+        "read_watchlist": read_watchlist,
+        "read_scan": read_scan,
+        "check_per_write": check,
+        "place_order": order_ms,
+        "watchlist_matches_scan": [row[0] for row in watchlist] == [row[0] for row in scan],
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n📉 Low stock over {config['products']} products "
+          f"({report['listed_before_orders']} -> {report['listed_after_orders']} listed, "
+          f"{report['alerts']} alerts, backend={config['backend']})")
+    print(f"{'Read':<12} {'mean ms':<10} {'p50 ms':<10} {'p95 ms':<10}")
+    for name in ("read_watchlist", "read_scan"):
+        s = report[name]
+        print(f"{name[5:]:<12} {s['mean_ms']:<10} {s['p50_ms']:<10} {s['p95_ms']:<10}")
+    scan, watchlist = report["read_scan"]["p50_ms"], report["read_watchlist"]["p50_ms"]
+    if watchlist:
+        print(f"📈 Watchlist read is {scan / watchlist:,.0f}x faster than the scan (p50)")
+    print(f"📝 Keeping it current: {report['check_per_write']['p50_ms']} ms per write (p50), "
+          f"place_order p50 {report['place_order']['p50_ms']} ms")
+    if report["watchlist_matches_scan"]:
+        print("✅ Watchlist matches the scan.")
+    else:
+        print("❌ Watchlist differs from the scan.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the low-stock watchlist against a catalog scan")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--watched", type=float, default=0.01, help="share of products with a reorder threshold")
+    parser.add_argument("--reads", type=int, default=20, help="timed reads of each kind")
+    parser.add_argument("--orders", type=int, default=200, help="orders placed against watched products")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_low_stock_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+
+    report = run_benchmark(args.products, args.watched, args.reads, args.orders, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
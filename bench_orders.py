@@ -0,0 +1,441 @@
+import argparse
+import builtins
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+import database
+import pharmacy_portal
+import reservations
+import services
+from passwords import hash_password
+from storage import MySQLBackend, SQLiteBackend
+
+#  Concurrent load generator for the order lifecycle
+#
+#  Simulated customers and admins drive the real interactive portal
+#  functions (place_order, update_order, cancel_order, view_orders, login).
+#  Each worker thread gets its own scripted console that reads what the
+#  portal printed and answers its prompts, so no portal code is bypassed.
+#
+#    python bench_orders.py --customers 16 --admins 2 --ops 200 --sqlite-path bench.db
+#    python bench_orders.py --backend mysql --output mysql_run.json
+
+CUSTOMER_MIX = {
+    "place_order": 50,
+    "update_order": 15,
+    "cancel_order": 10,
+    "view_orders": 20,
+    "login": 5,
+}
+ADMIN_MIX = {
+    "admin_place_order": 40,
+    "admin_view_orders": 50,
+    "admin_login": 10,
+}
+
+MENU_RE = re.compile(r"^(\d+)\. ")
+ROW_RE = re.compile(r"^(\d+)\s")
+
+_local = threading.local()
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+#  Round-trip counting wrappers around the backend's connections
+class CountingCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        _count_round_trip()
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        _count_round_trip()
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class CountingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        _count_round_trip()
+        return self._conn.commit()
+
+    def rollback(self):
+        _count_round_trip()
+        return self._conn.rollback()
+
+    def is_connected(self):
+        _count_round_trip()
+        return self._conn.is_connected()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class CountingBackend:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def connect(self, db=None):
+        return CountingConnection(self._backend.connect(db))
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+
+def _count_round_trip():
+    _local.round_trips = getattr(_local, "round_trips", 0) + 1
+
+
+#  Scripted console: stands in for print()/input() inside pharmacy_portal
+def _console_print(*args, **kwargs):
+    console = getattr(_local, "console", None)
+    if console is None:
+        return builtins.print(*args, **kwargs)
+    console.screen.extend(" ".join(str(a) for a in args).splitlines())
+
+
+def _console_input(prompt=""):
+    console = getattr(_local, "console", None)
+    if console is None:
+        return builtins.input(prompt)
+    answer = console.answer(prompt.strip(), console.screen)
+    console.transcript.extend(console.screen)
+    console.screen = []
+    return answer
+
+
+class SimulatedUser:
+    def __init__(self, role, user_id, password, rng, customer_ids, max_quantity, cart_lines=1):
+        self.role = role
+        self.user_id = user_id
+        self.password = password
+        self.rng = rng
+        self.customer_ids = customer_ids
+        self.max_quantity = max_quantity
+        self.cart_lines = cart_lines
+        self.cart_size = 1
+        self.browsed = 0
+        self.screen = []
+        self.transcript = []
+
+    def _pick(self, pattern, screen):
+        choices = [m.group(1) for m in (pattern.match(line) for line in screen) if m]
+        if not choices:
+            raise BenchmarkError(f"nothing to choose from on screen: {screen[-5:]}")
+        return self.rng.choice(choices)
+
+    def answer(self, prompt, screen):
+        if prompt in ("Select category number (or type a product name to search):", "Select subcategory number:",
+                      "Select line number:"):
+            return self._pick(MENU_RE, screen)
+        if prompt == "Add another product? (y/n):":
+            self.browsed += 1
+            return "y" if self.browsed < self.cart_size else "n"
+        if prompt in ("Enter the Product ID to order:", "Enter Order ID to update:", "Enter Order ID to cancel:"):
+            return self._pick(ROW_RE, screen)
+        if prompt in ("Enter quantity:", "Enter new quantity:"):
+            return str(self.rng.randint(1, self.max_quantity))
+        if prompt == "Enter Customer User ID for placing order:":
+            return self.rng.choice(self.customer_ids)
+        if prompt == "Role (Admin/Customer):":
+            return self.role
+        if prompt == "User ID:":
+            return self.user_id
+        if prompt == "Password:":
+            return self.password
+        if prompt == "Enter choice:":
+            # Log straight back out of whichever menu login opened
+            for line in reversed(screen):
+                match = MENU_RE.match(line)
+                if match and "Logout" in line:
+                    return match.group(1)
+            raise BenchmarkError(f"no Logout option on screen: {screen[-5:]}")
+        raise BenchmarkError(f"unexpected prompt: {prompt!r}")
+
+    def run(self, operation):
+        self.screen = []
+        self.transcript = []
+        # Each order fills a cart of 1..cart_lines products
+        self.cart_size = self.rng.randint(1, self.cart_lines)
+        self.browsed = 0
+        if operation == "place_order":
+            pharmacy_portal.place_order(self.user_id)
+        elif operation == "update_order":
+            pharmacy_portal.update_order(self.user_id)
+        elif operation == "cancel_order":
+            pharmacy_portal.cancel_order(self.user_id)
+        elif operation == "view_orders":
+            pharmacy_portal.view_orders(self.user_id)
+        elif operation == "admin_place_order":
+            pharmacy_portal.place_order(None)
+        elif operation == "admin_view_orders":
+            pharmacy_portal.view_orders(admin=True)
+        elif operation in ("login", "admin_login"):
+            pharmacy_portal.login()
+        else:
+            raise BenchmarkError(f"unknown operation: {operation}")
+        self.transcript.extend(self.screen)
+        return self.transcript
+
+
+def _outcome(transcript):
+    if any("✅" in line for line in transcript):
+        return "ok"
+    if any("❌" in line or "⚠️" in line for line in transcript):
+        return "rejected"
+    return "ok"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+#  Fixture data
+def _execute(sql, params=(), fetch=False):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if fetch else None
+        conn.commit()
+        cursor.close()
+    return rows
+
+
+def prepare_store(customers, admins, stock):
+    services.bootstrap()
+
+    # Numeric user ids: orders.user_id is an INT column on MySQL
+    customer_ids = [str(900000 + i) for i in range(customers)]
+    admin_ids = [str(990000 + i) for i in range(admins)]
+    # One hash shared by every bench user: hashing each at full cost would
+    # dominate setup; logins still pay the configured cost per attempt
+    password = hash_password("bench", database.settings.password_hash_iterations)
+    for user_id, role in [(c, "Customer") for c in customer_ids] + [(a, "Admin") for a in admin_ids]:
+        if not _execute("SELECT id FROM users WHERE user_id = %s", (user_id,), fetch=True):
+            _execute("""
+                INSERT INTO users (user_id, password, role, email, age, contact_number, city, state, pincode)
+                VALUES (%s, %s, %s, %s, 30, '9000000000', 'Pune', 'Maharashtra', '411001')
+            """, (user_id, password, role, f"{user_id}@bench.local"))
+    if stock is not None:
+        _execute("UPDATE products SET stock = %s", (stock,))
+        database.catalog_cache.invalidate()
+        database.product_search.invalidate()
+    return customer_ids, admin_ids
+
+
+# stock + quantity held by live orders is constant per product under any
+# interleaving of place/update/cancel; drift or negative stock is a violation
+def stock_ledger():
+    rows = _execute("""
+        SELECT p.id, p.stock, COALESCE(SUM(CASE WHEN o.status != 'Cancelled' THEN l.quantity ELSE 0 END), 0)
+        FROM products p
+        LEFT JOIN order_lines l ON l.product_id = p.id
+        LEFT JOIN orders o ON o.id = l.order_id
+        GROUP BY p.id, p.stock
+    """, fetch=True)
+    return {row[0]: (int(row[1]), int(row[2])) for row in rows}
+
+
+def check_consistency(before, after):
+    oversold = [
+        {"product_id": pid, "stock": stock}
+        for pid, (stock, _) in sorted(after.items()) if stock < 0
+    ]
+    drift = []
+    for pid, (stock, held) in sorted(after.items()):
+        if pid not in before:
+            continue
+        expected = sum(before[pid])
+        if stock + held != expected:
+            drift.append({"product_id": pid, "expected_total": expected, "stock": stock, "held_by_orders": held})
+    return {"oversold_products": oversold, "ledger_violations": drift,
+            "violations": len(oversold) + len(drift)}
+
+
+#  Load generation
+def _worker(user, mix, ops, deadline, results, errors):
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+    _local.console = user
+    try:
+        done = 0
+        while (ops is None or done < ops) and (deadline is None or time.monotonic() < deadline):
+            operation = user.rng.choices(operations, weights)[0]
+            _local.round_trips = 0
+            started = time.perf_counter()
+            try:
+                transcript = user.run(operation)
+                outcome = _outcome(transcript)
+            except Exception as err:  # recorded per operation, the run goes on
+                outcome = "error"
+                errors.append(f"{operation}: {type(err).__name__}: {err}")
+            elapsed = time.perf_counter() - started
+            results.append((operation, outcome, elapsed, _local.round_trips))
+            done += 1
+    finally:
+        _local.console = None
+
+
+def run_benchmark(customers=8, admins=1, ops=100, duration=None, seed=1, max_quantity=3, stock=1000,
+                  cart_lines=3):
+    customer_ids, admin_ids = prepare_store(customers, admins, stock)
+    before = stock_ledger()
+
+    rng = random.Random(seed)
+    users = [(SimulatedUser("Customer", c, "bench", random.Random(rng.random()), customer_ids, max_quantity,
+                            cart_lines), CUSTOMER_MIX)
+             for c in customer_ids]
+    users += [(SimulatedUser("Admin", a, "bench", random.Random(rng.random()), customer_ids, max_quantity,
+                             cart_lines), ADMIN_MIX)
+              for a in admin_ids]
+
+    results = []
+    errors = []
+    reservations.reset_stats()
+    deadline = time.monotonic() + duration if duration else None
+    pharmacy_portal.print = _console_print
+    pharmacy_portal.input = _console_input
+    try:
+        threads = [
+            threading.Thread(target=_worker, args=(user, mix, None if duration else ops, deadline, results, errors))
+            for user, mix in users
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+    finally:
+        del pharmacy_portal.print
+        del pharmacy_portal.input
+
+    after = stock_ledger()
+    return summarize(results, wall, errors, check_consistency(before, after), {
+        "customers": customers,
+        "admins": admins,
+        "ops_per_user": None if duration else ops,
+        "duration_s": duration,
+        "seed": seed,
+        "max_quantity": max_quantity,
+        "cart_lines": cart_lines,
+        "initial_stock": stock,
+        "backend": database.get_backend().name,
+    })
+
+
+def summarize(results, wall, errors, consistency, config):
+    operations = {}
+    for name in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == name]
+        latencies = sorted(r[2] * 1000.0 for r in rows)
+        operations[name] = {
+            "count": len(rows),
+            "ok": sum(1 for r in rows if r[1] == "ok"),
+            "rejected": sum(1 for r in rows if r[1] == "rejected"),
+            "errors": sum(1 for r in rows if r[1] == "error"),
+            "ops_per_sec": round(len(rows) / wall, 2) if wall else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "round_trips_per_op": round(sum(r[3] for r in rows) / len(rows), 2),
+        }
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "wall_time_s": round(wall, 3),
+        "total_ops": len(results),
+        "ops_per_sec": round(len(results) / wall, 2) if wall else 0.0,
+        "operations": operations,
+        "consistency": consistency,
+        "reservations": reservations.stats(),
+        "pool": {str(db): stats for db, stats in database.pool_stats().items()},
+        "errors": errors[:20],
+    }
+
+
+def print_report(report):
+    print(f"\n📈 {report['total_ops']} ops in {report['wall_time_s']}s "
+          f"({report['ops_per_sec']} ops/sec, backend={report['config']['backend']})")
+    print(f"{'Operation':<20} {'Count':<7} {'OK':<6} {'Rej':<6} {'Err':<5} {'ops/s':<9} "
+          f"{'p50 ms':<9} {'p95 ms':<9} {'p99 ms':<9} {'RT/op':<6}")
+    for name, s in report["operations"].items():
+        print(f"{name:<20} {s['count']:<7} {s['ok']:<6} {s['rejected']:<6} {s['errors']:<5} {s['ops_per_sec']:<9} "
+              f"{s['p50_ms']:<9} {s['p95_ms']:<9} {s['p99_ms']:<9} {s['round_trips_per_op']:<6}")
+    consistency = report["consistency"]
+    if consistency["violations"]:
+        print(f"❌ {len(consistency['oversold_products'])} oversold products, "
+              f"{len(consistency['ledger_violations'])} stock ledger violations")
+    else:
+        print("✅ No oversell or stock ledger violations.")
+    res = report["reservations"]
+    print(f"🔒 Reservations: {res['reserved']} reserved, {res['conflicts']} conflicts, "
+          f"{res['retries']} deadlock retries")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent order lifecycle benchmark")
+    parser.add_argument("--customers", type=int, default=8)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--ops", type=int, default=100, help="operations per simulated user")
+    parser.add_argument("--duration", type=float, help="run for N seconds instead of a fixed op count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-quantity", type=int, default=3)
+    parser.add_argument("--cart-lines", type=int, default=3, help="most products per placed order")
+    parser.add_argument("--stock", type=int, default=1000, help="reset every product's stock first (-1 keeps it)")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(CountingBackend(backend))
+
+    report = run_benchmark(
+        customers=args.customers,
+        admins=args.admins,
+        ops=args.ops,
+        duration=args.duration,
+        seed=args.seed,
+        max_quantity=args.max_quantity,
+        cart_lines=args.cart_lines,
+        stock=None if args.stock < 0 else args.stock,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import bench_orders
+import database
+import services
+from storage import SQLiteBackend
+
+#  Primary load with and without read replicas
+#
+#  Runs the same mix of portal operations twice over a SQLite file primary:
+#  once with every statement on the primary, once with two SQLite files as
+#  read replicas (copied from the primary before the run; they lag behind it
+#  from then on, which changes nothing about where statements go). Counts
+#  the statements each database executes and reports how much of the
+#  primary's load the replicas took.
+#
+#  Half the threads are customer sessions (order pages, logins, checkouts),
+#  half admin sessions (order lookups, listings, reports). The operations
+#  come far faster than real customers send them, so the read-your-own-writes
+#  window is scaled down with them (--sticky-seconds).
+#
+#    python bench_replicas.py --ops 5000 --threads 8
+
+MIX = {
+    "customer": {"view_orders": 50, "login": 25, "place_order": 25},
+    "admin": {"admin_view_order": 50, "admin_view_orders": 25, "sales_report": 15, "low_stock": 10},
+}
+
+
+class _Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statements = 0
+
+    def bump(self):
+        with self.lock:
+            self.statements += 1
+
+
+class _CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter.bump()
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.bump()
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class _CountingConnection:
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._conn.cursor(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# Counts the statements run on its connections
+class StatementCountingBackend:
+    def __init__(self, backend):
+        self._backend = backend
+        self.counter = _Counter()
+
+    def connect(self, db=None):
+        return _CountingConnection(self._backend.connect(db), self.counter)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+
+# Copies the primary file over each replica file: "replication" for the stand-ins
+def replicate(primary, replicas):
+    source = sqlite3.connect(primary)
+    try:
+        for path in replicas:
+            target = sqlite3.connect(path)
+            source.backup(target)
+            target.close()
+    finally:
+        source.close()
+
+
+def _operation(name, rng, customer_ids, order_ids):
+    if name == "view_orders":
+        services.fetch_orders_page(rng.choice(customer_ids))
+    elif name == "admin_view_order":
+        services.get_order(rng.choice(order_ids))
+    elif name == "admin_view_orders":
+        services.fetch_orders_page(status="Placed")
+    elif name == "login":
+        services.authenticate(rng.choice(customer_ids), "bench", "Customer")
+    elif name == "sales_report":
+        services.sales_report()
+    elif name == "low_stock":
+        services.low_stock_watchlist()
+    else:
+        product_ids = [row[0] for row in services.list_products(rng.choice(services.list_subcategories(
+            rng.choice(services.list_categories())[0]))[0])]
+        services.place_order(rng.choice(customer_ids), {rng.choice(product_ids): 1})
+
+
+def _run_mix(ops, threads, customer_ids, order_ids, seed):
+    errors = []
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        mix = MIX["customer" if index % 2 == 0 else "admin"]
+        names, weights = list(mix), list(mix.values())
+        for _ in range(ops // threads):
+            try:
+                _operation(rng.choices(names, weights)[0], rng, customer_ids, order_ids)
+            except Exception as err:
+                errors.append(repr(err))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, errors
+
+
+def _run(workdir, replicas, customers, ops, threads, seed):
+    primary_path = os.path.join(workdir, "primary.db")
+    replica_paths = [os.path.join(workdir, f"replica{i}.db") for i in range(1, replicas + 1)]
+    for path in [primary_path] + replica_paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    primary = StatementCountingBackend(SQLiteBackend(primary_path))
+    database.configure_backend(primary)
+    customer_ids, _ = bench_orders.prepare_store(customers, 0, 10 ** 6)
+    rng = random.Random(seed)
+    order_ids = [services.place_order(customer_id, {rng.randint(1, 20): 1}) for customer_id in customer_ids * 5]
+    replicate(primary_path, replica_paths)
+    backends = [(path, StatementCountingBackend(SQLiteBackend(path))) for path in replica_paths]
+    database.configure_replicas(backends or None)
+
+    primary.counter.statements = 0
+    elapsed, errors = _run_mix(ops, threads, customer_ids, order_ids, seed)
+    result = {
+        "primary_statements": primary.counter.statements,
+        "replica_statements": sum(backend.counter.statements for _, backend in backends),
+        "ops_per_sec": round(ops / elapsed, 1),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "routing": database.replica_stats(),
+    }
+    database.configure_backend(None)
+    return result
+
+
+def run_benchmark(workdir, customers=200, ops=2000, threads=4, replicas=2, hash_iterations=1000,
+                  sticky_seconds=0.05, seed=1):
+    settings = database.settings
+    saved = settings.password_hash_iterations, settings.replica_sticky_seconds
+    settings.password_hash_iterations = hash_iterations
+    settings.replica_sticky_seconds = sticky_seconds
+    try:
+        primary_only = _run(workdir, 0, customers, ops, threads, seed)
+        with_replicas = _run(workdir, replicas, customers, ops, threads, seed)
+    finally:
+        settings.password_hash_iterations, settings.replica_sticky_seconds = saved
+    before = primary_only["primary_statements"]
+    after = with_replicas["primary_statements"]
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "customers": customers,
+            "ops": ops,
+            "threads": threads,
+            "replicas": replicas,
+            "sticky_seconds": sticky_seconds,
+            "mix": MIX,
+            "seed": seed,
+        },
+        "primary_only": primary_only,
+        "with_replicas": with_replicas,
+        "primary_reduction_pct": round(100.0 * (before - after) / before, 1) if before else 0.0,
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n🔀 {config['ops']} operations on {config['threads']} threads "
+          f"(half customers, half admins), {config['replicas']} replicas")
+    print(f"{'Setup':<16} {'primary stmts':<15} {'replica stmts':<15} {'ops/sec':<10}")
+    for name in ("primary_only", "with_replicas"):
+        s = report[name]
+        print(f"{name:<16} {s['primary_statements']:<15} {s['replica_statements']:<15} {s['ops_per_sec']:<10}")
+    print(f"📈 Replicas took {report['primary_reduction_pct']}% of the statements off the primary")
+    routing = report["with_replicas"]["routing"]
+    if routing:
+        print(f"📝 {routing['sticky_reads']} reads stayed on the primary after their user's write, "
+              f"{routing['fallbacks']} fell back to it")
+    errors = report["primary_only"]["errors"] + report["with_replicas"]["errors"]
+    if errors:
+        print(f"❌ {errors} operations failed")
+    else:
+        print("✅ Every operation succeeded.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark primary load with and without read replicas")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--hash-iterations", type=int, default=1000, help="password hash cost for the logins")
+    parser.add_argument("--sticky-seconds", type=float, default=0.05,
+                        help="how long a customer's reads stay on the primary after they write")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="where the primary and replica files go (default: a temp dir)")
+    parser.add_argument("--output", default="bench_replicas_results.json")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_replicas_")
+    report = run_benchmark(workdir, args.customers, args.ops, args.threads, args.replicas, args.hash_iterations,
+                           args.sticky_seconds, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import bench_orders
+import database
+import services
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Product search: the in-memory index versus LIKE '%term%'
+#
+#  Builds a catalog of --products bench products named from a drug-store
+#  vocabulary (brand, ingredient, form, strength, pack size: every
+#  combination once) spread over a few categories, with some out of stock.
+#  Then times building the index, in-stock searches through it, the same searches as LIKE
+#  '%word%' on name, category and subcategory, and a search right after an
+#  order changed one product's stock (the index re-reads just that product).
+#
+#    python bench_search.py --products 1000000 --searches 200
+
+BRANDS = [
+    "Acme", "Apex", "Aurora", "Bayside", "Bluebell", "Cedar", "Clearwell", "Crescent", "Dawn", "Everest",
+    "Evergreen", "Fairview", "Granite", "Harbor", "Horizon", "Juniper", "Keystone", "Lakeside", "Lotus", "Maple",
+    "Meadow", "Medix", "Nova", "Oakridge", "Orchid", "Pinnacle", "Prairie", "Redwood", "Riverside", "Sage",
+    "Sequoia", "Silverline", "Summit", "Sunrise", "Trinity", "Unity", "Valley", "Vertex", "Willow", "Zenith",
+]
+INGREDIENTS = [
+    "Acetaminophen", "Acyclovir", "Albendazole", "Allopurinol", "Amlodipine", "Amoxicillin", "Atenolol",
+    "Azithromycin", "Bisacodyl", "Calcium", "Cetirizine", "Ciprofloxacin", "Clotrimazole", "Dextromethorphan",
+    "Diclofenac", "Domperidone", "Doxycycline", "Esomeprazole", "Famotidine", "Ferrous", "Fexofenadine",
+    "Fluconazole", "Folic", "Glucosamine", "Guaifenesin", "Hydrocortisone", "Ibuprofen", "Iron", "Lansoprazole",
+    "Levocetirizine", "Loperamide", "Loratadine", "Losartan", "Magnesium", "Meclizine", "Melatonin", "Metformin",
+    "Metronidazole", "Miconazole", "Montelukast", "Naproxen", "Niacin", "Omega", "Omeprazole", "Ondansetron",
+    "Pantoprazole", "Paracetamol", "Phenylephrine", "Potassium", "Probiotic", "Pseudoephedrine", "Ranitidine",
+    "Riboflavin", "Salbutamol", "Senna", "Simethicone", "Thiamine", "Turmeric", "Vitamin", "Zinc",
+]
+FORMS = ["Tablets", "Capsules", "Syrup", "Drops", "Gel", "Cream", "Ointment", "Spray", "Powder", "Lozenges"]
+STRENGTHS = ["5mg", "10mg", "20mg", "25mg", "50mg", "100mg", "200mg", "250mg", "400mg", "500mg",
+             "650mg", "1000mg"]
+PACKS = ["10 Pack", "30 Pack", "60 Pack", "100 Pack"]
+CATEGORIES = [
+    ("Bench Pain Relief", ["Analgesics", "Anti Inflammatory", "Muscle Rubs"]),
+    ("Bench Cold Flu", ["Decongestants", "Cough Suppressants", "Antihistamines"]),
+    ("Bench Digestive Care", ["Antacids", "Laxatives", "Probiotics"]),
+    ("Bench Supplements", ["Multivitamins", "Minerals", "Herbal"]),
+    ("Bench Skin Care", ["Antifungals", "Steroid Creams", "Moisturizers"]),
+]
+
+
+# The name of bench product i: every i below the number of combinations
+# gets a different one
+def product_name(i):
+    i, pack = divmod(i, len(PACKS))
+    i, strength = divmod(i, len(STRENGTHS))
+    i, form = divmod(i, len(FORMS))
+    i, ingredient = divmod(i, len(INGREDIENTS))
+    brand = BRANDS[i % len(BRANDS)]
+    return f"{brand} {INGREDIENTS[ingredient]} {FORMS[form]} {STRENGTHS[strength]} {PACKS[pack]}"
+
+
+def build_catalog(products, out_of_stock, rng, batch_size=1000):
+    limit = len(BRANDS) * len(INGREDIENTS) * len(FORMS) * len(STRENGTHS) * len(PACKS)
+    if products > limit:
+        raise ValueError(f"at most {limit} bench products have distinct names")
+    subcategories = [(category, sub) for category, subs in CATEGORIES for sub in subs]
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        for start in range(0, products, batch_size):
+            rows = []
+            for i in range(start, min(products, start + batch_size)):
+                category, subcategory = subcategories[i % len(subcategories)]
+                stock = 0 if rng.random() < out_of_stock else rng.randint(1, 500)
+                rows.append((product_name(i), category, subcategory, round(rng.uniform(1, 50), 2), stock))
+            services.upsert_products(cursor, rows)
+            conn.commit()
+        cursor.close()
+    database.catalog_cache.invalidate()
+    database.product_search.invalidate()
+
+
+# Search texts: whole words, prefixes, and two-word queries
+def queries(count, rng):
+    vocabulary = [word for words in (BRANDS, INGREDIENTS, FORMS) for word in words]
+    vocabulary += [name for name, _ in CATEGORIES] + [sub for _, subs in CATEGORIES for sub in subs]
+    texts = []
+    for _ in range(count):
+        word = rng.choice(vocabulary).split()[-1].lower()
+        kind = rng.random()
+        if kind < 0.4:
+            texts.append(word)
+        elif kind < 0.7:
+            texts.append(word[:rng.randint(3, max(3, len(word) - 1))])
+        else:
+            texts.append(f"{rng.choice(BRANDS).lower()} {rng.choice(INGREDIENTS).lower()[:4]}")
+    return texts
+
+
+# The same search without the index: every word somewhere in name,
+# category or subcategory, in-stock only, in id order
+def like_search(cursor, text, limit):
+    words = text.split()
+    where = " AND ".join(["(p.name LIKE %s OR s.name LIKE %s OR c.name LIKE %s)"] * len(words))
+    cursor.execute(f"""
+        SELECT p.id, p.name, p.price, p.stock
+        FROM products p
+        JOIN subcategories s ON s.id = p.subcategory_id
+        JOIN categories c ON c.id = s.category_id
+        WHERE p.stock > 0 AND {where}
+        ORDER BY p.id LIMIT %s
+    """, [f"%{word}%" for word in words for _ in range(3)] + [limit])
+    return cursor.fetchall()
+
+
+def _latency(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+    }
+
+
+def _time_each(func, items):
+    samples, results = [], []
+    for item in items:
+        started = time.perf_counter()
+        results.append(func(item))
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples, results
+
+
+def run_benchmark(products=100_000, searches=100, like_searches=20, orders=50, out_of_stock=0.1, limit=20, seed=1):
+    rng = random.Random(seed)
+    customer_ids, _ = bench_orders.prepare_store(1, 0, None)
+    started = time.perf_counter()
+    build_catalog(products, out_of_stock, rng)
+    catalog_s = time.perf_counter() - started
+
+    index = database.product_search
+    started = time.perf_counter()
+    index.warm()
+    build_ms = (time.perf_counter() - started) * 1000.0
+
+    texts = queries(searches, rng)
+    index_ms, index_rows = _time_each(lambda text: services.search_products(text, limit), texts)
+
+    like_texts = texts[:like_searches]
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        like_ms, like_rows = _time_each(lambda text: like_search(cursor, text, limit), like_texts)
+        cursor.close()
+
+    # Each order moves one product's stock; the next search re-reads it
+    hits = [row[0] for rows in index_rows for row in rows if row[3] > 1]
+    targets = [rng.choice(hits) for _ in range(orders)] if hits else []
+    after_write_ms = []
+    for product_id in targets:
+        services.place_order(customer_ids[0], {product_id: 1})
+        started = time.perf_counter()
+        services.search_products(texts[0], limit)
+        after_write_ms.append((time.perf_counter() - started) * 1000.0)
+
+    stats = index.stats()
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "products": products,
+            "searches": searches,
+            "like_searches": len(like_texts),
+            "orders": len(targets),
+            "out_of_stock_share": out_of_stock,
+            "limit": limit,
+            "seed": seed,
+            "backend": database.get_backend().name,
+        },
+        "catalog_load_s": round(catalog_s, 2),
+        "index_build_ms": round(build_ms, 1),
+        "index_products": stats["products"],
+        "index_tokens": stats["tokens"],
+        "search_index": _latency(index_ms),
+        "search_like": _latency(like_ms),
+        "search_after_write": _latency(after_write_ms) if after_write_ms else None,
+        "mean_results": round(sum(len(rows) for rows in index_rows) / len(index_rows), 1),
+        # A prefix of a word is also a substring, so the index's hits are a
+        # subset of LIKE's: its n-th id can't come before LIKE's n-th
+        "index_results_in_stock": all(row[3] > 0 for rows in index_rows for row in rows),
+        "like_agrees": all(len(index) <= len(like) and all(a[0] >= b[0] for a, b in zip(index, like))
+                           for index, like in zip(index_rows, like_rows)),
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n🔍 Search over {config['products']} products ({report['index_tokens']} tokens, "
+          f"backend={config['backend']}); index built in {report['index_build_ms']} ms")
+    print(f"{'Search':<14} {'mean ms':<10} {'p50 ms':<10} {'p95 ms':<10} {'p99 ms':<10}")
+    for name in ("search_index", "search_like", "search_after_write"):
+        s = report[name]
+        if s:
+            print(f"{name[7:]:<14} {s['mean_ms']:<10} {s['p50_ms']:<10} {s['p95_ms']:<10} {s['p99_ms']:<10}")
+    like, index = report["search_like"]["p50_ms"], report["search_index"]["p50_ms"]
+    if index:
+        print(f"📈 Index search is {like / index:,.0f}x faster than LIKE (p50)")
+    if report["index_results_in_stock"] and report["like_agrees"]:
+        print("✅ Every index result is in stock and within what LIKE finds.")
+    else:
+        print("❌ Index results disagree with LIKE or include products out of stock.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the product search index against LIKE '%%term%%'")
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--searches", type=int, default=200, help="timed searches through the index")
+    parser.add_argument("--like-searches", type=int, default=20, help="the first N of them again with LIKE")
+    parser.add_argument("--orders", type=int, default=50, help="orders followed by a timed search")
+    parser.add_argument("--out-of-stock", type=float, default=0.1, help="share of products with no stock")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--output", default="bench_search_results.json")
+    args = parser.parse_args(argv)
+
+    settings = database.settings
+    if args.backend == "sqlite":
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password)
+    database.configure_backend(backend)
+
+    report = run_benchmark(args.products, args.searches, args.like_searches, args.orders, args.out_of_stock,
+                           args.limit, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
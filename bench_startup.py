@@ -0,0 +1,124 @@
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+#  Startup cost of the portal: importing it, then getting the store ready
+#
+#  Every sample is a fresh interpreter, pointed at a SQLite file through
+#  DB_BACKEND / SQLITE_PATH like a real launch. "cold" starts from a missing
+#  file, "warm" re-opens the file the cold run left behind. The legacy
+#  startup (create_database + apply_migrations + populate_products on every
+#  launch) is measured next to services.bootstrap().
+#
+#    python bench_startup.py --runs 7
+
+HEAVY_MODULES = ("pydantic_settings", "pydantic", "mysql.connector")
+STARTUPS = ("legacy", "bootstrap")
+
+
+# Runs inside the child interpreter; prints one JSON line
+def _child(startup):
+    started = time.perf_counter()
+    importlib.import_module("pharmacy_portal")  # what launching the CLI imports
+    imported = time.perf_counter()
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    import bench_orders
+    import database
+    import services
+    settings_at = time.perf_counter()
+    backend = database.get_backend()  # loads the settings
+    database.configure_backend(bench_orders.CountingBackend(backend))
+    ready_at = time.perf_counter()
+    if startup == "legacy":
+        database.create_database()
+        database.apply_migrations()
+        services.populate_products()
+    else:
+        services.bootstrap()
+    ready = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000.0,
+        "heavy_modules_after_import": heavy,
+        "settings_ms": (ready_at - settings_at) * 1000.0,
+        "startup_ms": (ready - ready_at) * 1000.0,
+        "statements": getattr(bench_orders._local, "round_trips", 0),
+    }))
+
+
+def _sample(startup, path):
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=path)
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", startup],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    sample = json.loads(out.stdout.strip().splitlines()[-1])
+    sample["process_ms"] = (time.perf_counter() - started) * 1000.0
+    return sample
+
+
+def _median(samples):
+    summary = {}
+    for key in ("process_ms", "import_ms", "settings_ms", "startup_ms", "statements"):
+        summary[key] = round(statistics.median(s[key] for s in samples), 3)
+    summary["heavy_modules_after_import"] = samples[0]["heavy_modules_after_import"]
+    return summary
+
+
+def run_benchmark(runs=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for startup in STARTUPS:
+            cold, warm = [], []
+            for i in range(runs):
+                path = os.path.join(tmp, f"{startup}-{i}.db")
+                cold.append(_sample(startup, path))
+                warm.append(_sample(startup, path))
+            results[startup] = {"cold": _median(cold), "warm": _median(warm)}
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {"runs": runs, "backend": "sqlite", "python": sys.version.split()[0]},
+        "startups": results,
+    }
+
+
+def print_report(report):
+    print(f"\n🚀 Startup, median of {report['config']['runs']} fresh interpreters")
+    print(f"{'Startup':<11} {'Store':<6} {'process ms':<12} {'import ms':<11} {'settings ms':<13} "
+          f"{'ready ms':<10} {'statements':<11} Heavy imports")
+    for startup, runs in report["startups"].items():
+        for store, s in runs.items():
+            heavy = ", ".join(s["heavy_modules_after_import"]) or "-"
+            print(f"{startup:<11} {store:<6} {s['process_ms']:<12} {s['import_ms']:<11} {s['settings_ms']:<13} "
+                  f"{s['startup_ms']:<10} {s['statements']:<11} {heavy}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark portal startup on cold and warm stores")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per startup and store state")
+    parser.add_argument("--output", default="bench_startup_results.json")
+    parser.add_argument("--child", choices=STARTUPS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        _child(args.child)
+        return None
+
+    report = run_benchmark(args.runs)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
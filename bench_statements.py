@@ -0,0 +1,147 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import bench_orders
+import database
+import reservations
+import services
+import statements
+from bench_orders import percentile
+from storage import MySQLBackend, SQLiteBackend
+
+#  Per-statement latency of the hot statements, prepared vs text
+#
+#  Times each hot statement (statements.py) on one pooled connection, inside
+#  a transaction that is rolled back afterwards, once with
+#  prepared_statements on and once with it off. On MySQL that compares
+#  server-side prepared statements with the text protocol; on SQLite,
+#  sqlite3's per-connection statement cache with compiling every call.
+#
+#    python bench_statements.py --iterations 20000
+#    python bench_statements.py --backend mysql
+
+CUSTOMERS = 50
+
+
+# name -> (sql, params(rng, product_ids, customer_ids))
+def hot_statements():
+    return {
+        "stock_by_id": (reservations.STOCK_BY_ID, lambda rng, p, c: (rng.choice(p),)),
+        "reserve_stock": (reservations.RESERVE_STOCK, lambda rng, p, c: (1, rng.choice(p), 1)),
+        "release_stock": (reservations.RELEASE_STOCK, lambda rng, p, c: (1, rng.choice(p))),
+        "insert_order": (services.INSERT_ORDER, lambda rng, p, c: (rng.choice(c),)),
+        "active_order_lines": (services.ACTIVE_ORDER_LINES, lambda rng, p, c: (rng.choice(c),)),
+    }
+
+
+def make_backend(kind, sqlite_path, prepared):
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path, prepared_statements=prepared)
+    settings = database.settings
+    return MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password, prepared)
+
+
+def _time_statements(iterations, warmup, orders_per_customer, seed):
+    customer_ids, _ = bench_orders.prepare_store(CUSTOMERS, 0, 10 ** 6)
+    product_ids = [row[0] for row in bench_orders._execute("SELECT id FROM products", fetch=True)]
+    rng = random.Random(seed)
+    for customer_id in customer_ids:
+        for _ in range(orders_per_customer):
+            services.place_order(customer_id, {rng.choice(product_ids): 1})
+
+    results = {}
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        for name, (sql, params) in hot_statements().items():
+            database.get_backend().begin(cursor)
+            timings = []
+            for i in range(warmup + iterations):
+                args = params(rng, product_ids, customer_ids)
+                started = time.perf_counter()
+                cursor.execute(sql, args)
+                if cursor.description:
+                    cursor.fetchall()
+                if i >= warmup:
+                    timings.append((time.perf_counter() - started) * 1e6)
+            conn.rollback()
+            timings.sort()
+            results[name] = {
+                "p50_us": round(percentile(timings, 50), 1),
+                "p95_us": round(percentile(timings, 95), 1),
+                "mean_us": round(sum(timings) / len(timings), 1),
+            }
+        cursor.close()
+    return results
+
+
+def run_benchmark(backend="sqlite", sqlite_path=":memory:", iterations=5000, warmup=200, orders_per_customer=5,
+                  seed=1):
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "backend": backend,
+            "iterations": iterations,
+            "warmup": warmup,
+            "customers": CUSTOMERS,
+            "orders_per_customer": orders_per_customer,
+            "seed": seed,
+        },
+    }
+    for mode, prepared in (("text", False), ("prepared", True)):
+        database.configure_backend(make_backend(backend, sqlite_path, prepared))
+        statements.reset_stats()
+        try:
+            report[mode] = _time_statements(iterations, warmup, orders_per_customer, seed)
+        finally:
+            database.configure_backend(None)
+        if prepared:
+            report["prepared_counts"] = statements.stats()
+    report["savings_pct"] = {
+        name: round(100.0 * (1 - report["prepared"][name]["p50_us"] / report["text"][name]["p50_us"]), 1)
+        if report["text"][name]["p50_us"] else 0.0
+        for name in report["text"]
+    }
+    return report
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n🧮 Hot statements, {config['iterations']:,} runs each (backend={config['backend']})")
+    print(f"{'Statement':<20} {'text p50':<10} {'prepared p50':<14} {'text mean':<11} {'prepared mean':<15} {'saved':<6}")
+    for name, text in report["text"].items():
+        prepared = report["prepared"][name]
+        print(f"{name:<20} {text['p50_us']:<10} {prepared['p50_us']:<14} {text['mean_us']:<11} "
+              f"{prepared['mean_us']:<15} {report['savings_pct'][name]}%")
+    print("   (microseconds)")
+    slower = [name for name, pct in report["savings_pct"].items() if pct < 0]
+    if slower:
+        print(f"⚠️ Prepared was slower for: {', '.join(slower)}")
+    else:
+        print("📈 Every hot statement was faster prepared.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hot statements prepared vs as text")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--orders-per-customer", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_statements_results.json")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.backend, args.sqlite_path, args.iterations, args.warmup, args.orders_per_customer,
+                           args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"📝 Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+#  In-process catalog tree: category id -> subcategory id -> product ids
+#
+#  load_all() returns (id, category_id, category, subcategory_id, subcategory,
+#  name, price, stock) rows for the whole catalog, ordered the way the menus
+#  list it; load_products(ids) returns the same rows for a few ids.
+#  Structural changes (products added/removed) call invalidate(); stock
+#  changes call invalidate_products(ids) so only those rows are re-read.
+#
+#  ttl is in seconds, or a function returning it (read on every check, so
+#  it can follow a setting that is loaded later).
+#
+#  Loaders run outside the state lock, so invalidating from a thread that is
+#  holding a DB connection can never wait on a loader waiting for that
+#  connection.
+class CatalogCache:
+    def __init__(self, load_all, load_products, ttl=60.0, clock=time.monotonic):
+        self._load_all = load_all
+        self._load_products = load_products
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._tree = None
+        self._names = {}
+        self._products = {}
+        self._stale = set()
+        self._loaded_at = 0.0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "product_refreshes": 0,
+        }
+
+    def _fresh(self):
+        ttl = self.ttl() if callable(self.ttl) else self.ttl
+        return (self._tree is not None and ttl > 0
+                and self._clock() - self._loaded_at < ttl)
+
+    # Returns (tree, names) for the current catalog, loading it on a miss
+    def _snapshot(self):
+        with self._lock:
+            if self._fresh():
+                self._stats["hits"] += 1
+                return self._tree, self._names
+        with self._load_lock:
+            with self._lock:
+                if self._fresh():  # loaded by another thread meanwhile
+                    self._stats["hits"] += 1
+                    return self._tree, self._names
+                self._stats["misses"] += 1
+                generation = self._generation
+            tree, names, products = self._build(self._load_all())
+            with self._lock:
+                if generation == self._generation:
+                    self._tree = tree
+                    self._names = names
+                    self._products = products
+                    self._loaded_at = self._clock()
+                else:
+                    # Invalidated while loading: serve this read, keep nothing
+                    self._products = products
+        return tree, names
+
+    @staticmethod
+    def _build(rows):
+        tree = {}
+        names = {"categories": {}, "subcategories": {}}
+        products = {}
+        for pid, cat_id, category, sub_id, subcategory, name, price, stock in rows:
+            names["categories"][cat_id] = category
+            names["subcategories"][sub_id] = subcategory
+            tree.setdefault(cat_id, {}).setdefault(sub_id, []).append(pid)
+            products[pid] = (pid, name, price, stock)
+        return tree, names, products
+
+    # Re-read invalidated product rows among ids, then return the rows for ids
+    def _rows(self, ids):
+        with self._lock:
+            stale = [pid for pid in ids if pid in self._stale]
+            self._stale.difference_update(stale)
+            generation = self._generation
+        if stale:
+            found = {row[0]: row for row in self._load_products(stale)}
+            with self._lock:
+                self._stats["product_refreshes"] += 1
+                if generation == self._generation:
+                    for pid in stale:
+                        if pid in self._stale:
+                            continue  # changed again while we were reading it
+                        if pid in found:
+                            name, price, stock = found[pid][5:]
+                            self._products[pid] = (pid, name, price, stock)
+                        else:
+                            self._products.pop(pid, None)
+        with self._lock:
+            return [self._products[pid] for pid in ids if pid in self._products]
+
+    # (category_id, name) pairs of categories that have products
+    def categories(self):
+        tree, names = self._snapshot()
+        return [(cat_id, names["categories"][cat_id]) for cat_id in tree]
+
+    # (subcategory_id, name) pairs under one category
+    def subcategories(self, category_id):
+        tree, names = self._snapshot()
+        return [(sub_id, names["subcategories"][sub_id]) for sub_id in tree.get(category_id, {})]
+
+    # (id, name, price, stock) rows of one subcategory, ordered by id
+    def products(self, subcategory_id, in_stock_only=False):
+        tree, _ = self._snapshot()
+        ids = next((subcats[subcategory_id] for subcats in tree.values() if subcategory_id in subcats), [])
+        rows = self._rows(ids)
+        if in_stock_only:
+            rows = [row for row in rows if row[3] > 0]
+        return rows
+
+    def product(self, product_id):
+        self._snapshot()
+        rows = self._rows([product_id])
+        return rows[0] if rows else None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._tree = None
+            self._stale.clear()
+            self._stats["invalidations"] += 1
+
+    # Rows marked here stay stale across a reload already in flight
+    def invalidate_products(self, product_ids):
+        with self._lock:
+            self._stale.update(product_ids)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["categories"] = len(self._tree) if self._tree is not None else 0
+            snapshot["products"] = len(self._products) if self._tree is not None else 0
+        return snapshot
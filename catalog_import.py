@@ -0,0 +1,157 @@
+import argparse
+import csv
+import json
+import time
+from itertools import islice
+
+import database
+from database import borrow_connection, settings
+from services import upsert_products
+
+#  Streaming supplier catalog import
+#
+#  Reads CSV (header: name,category,subcategory,price,stock) or JSONL
+#  records in chunks and upserts them on the (subcategory_id, name) catalog
+#  key with multi-row INSERTs, committing every few batches so a single
+#  transaction never grows with the file. Category names are canonicalised
+#  and resolved to ids once per batch.
+#
+#    python catalog_import.py supplier.csv --batch-size 2000
+#    python catalog_import.py supplier.jsonl --on-duplicate skip
+
+
+class CatalogRowError(ValueError):
+    pass
+
+
+def _detect_format(path):
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path!r}; pass fmt='csv' or fmt='jsonl'")
+
+
+# Yields (line_number, record dict) without loading the file into memory
+def read_catalog(path, fmt=None):
+    fmt = fmt or _detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif fmt == "jsonl":
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as err:
+                        yield line_no, CatalogRowError(f"invalid JSON: {err}")
+        else:
+            raise ValueError(f"Unknown catalog format: {fmt!r}")
+
+
+def parse_row(record):
+    if isinstance(record, Exception):
+        raise record
+    try:
+        name = str(record["name"]).strip()
+        category = str(record["category"]).strip()
+        subcategory = str(record["subcategory"]).strip()
+        price = round(float(record["price"]), 2)
+        stock = int(record["stock"])
+    except KeyError as err:
+        raise CatalogRowError(f"missing column {err}") from None
+    except (TypeError, ValueError) as err:
+        raise CatalogRowError(f"invalid price/stock: {err}") from None
+    if not (name and category and subcategory):
+        raise CatalogRowError("name, category and subcategory are required")
+    if price < 0 or stock < 0:
+        raise CatalogRowError("price and stock must not be negative")
+    return name, category, subcategory, price, stock
+
+
+def import_catalog(path, fmt=None, batch_size=1000, batches_per_commit=10,
+                   on_duplicate="update", max_errors=100):
+    report = {
+        "rows_read": 0,
+        "rows_upserted": 0,
+        "rows_rejected": 0,
+        "batches": 0,
+        "commits": 0,
+        "errors": [],
+    }
+    started = time.perf_counter()
+    records = read_catalog(path, fmt)
+
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        try:
+            pending_batches = 0
+            while True:
+                chunk = list(islice(records, batch_size))
+                if not chunk:
+                    break
+                rows = []
+                for line_no, record in chunk:
+                    report["rows_read"] += 1
+                    try:
+                        rows.append(parse_row(record))
+                    except CatalogRowError as err:
+                        report["rows_rejected"] += 1
+                        if len(report["errors"]) < max_errors:
+                            report["errors"].append(f"line {line_no}: {err}")
+                report["rows_upserted"] += upsert_products(cursor, rows, on_duplicate)
+                report["batches"] += 1
+                pending_batches += 1
+                if pending_batches >= batches_per_commit:
+                    conn.commit()
+                    report["commits"] += 1
+                    pending_batches = 0
+            if pending_batches:
+                conn.commit()
+                report["commits"] += 1
+        except database.db_error():
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            database.catalog_cache.invalidate()
+            database.product_search.invalidate()
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 3)
+    report["rows_per_sec"] = round(report["rows_read"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a supplier product catalog")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per multi-row INSERT")
+    parser.add_argument("--batches-per-commit", type=int, default=10)
+    parser.add_argument("--on-duplicate", choices=["update", "skip"], default="update")
+    args = parser.parse_args(argv)
+
+    database.create_database()
+    database.apply_migrations()
+    report = import_catalog(
+        args.path,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        batches_per_commit=args.batches_per_commit,
+        on_duplicate=args.on_duplicate,
+    )
+    print(f"✅ Imported {report['rows_upserted']} of {report['rows_read']} rows "
+          f"in {report['elapsed_s']}s ({report['rows_per_sec']} rows/sec, {report['commits']} commits).")
+    if report["rows_rejected"]:
+        print(f"⚠️ {report['rows_rejected']} rows rejected:")
+        for error in report["errors"]:
+            print(f"   {error}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#  Canonical category / subcategory names and their id lookups
+
+# Spellings found in existing data (see ms.sql) that differ by more than
+# case or spacing, keyed by lower-case name with the spaces removed
+ALIASES = {
+    "personalcare": "Personal Care",
+    "healthcare": "Health Care",
+    "nutritions": "Nutrition",
+    "skincare": "Skin Care",
+}
+SMALL_WORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to"}
+
+
+# "  hand and foot care " -> "Hand and Foot Care"
+def canonical_name(raw):
+    words = str(raw).split()
+    if not words:
+        raise ValueError("category and subcategory names cannot be empty")
+    alias = ALIASES.get("".join(words).lower())
+    if alias:
+        return alias
+    canonical = []
+    for i, word in enumerate(words):
+        lower = word.lower()
+        if len(word) > 1 and word.isupper():
+            canonical.append(word)  # acronyms stay as written
+        elif i and lower in SMALL_WORDS:
+            canonical.append(lower)
+        else:
+            canonical.append(word[:1].upper() + word[1:].lower())
+    return " ".join(canonical)
+
+
+def _placeholders(count):
+    return ", ".join(["%s"] * count)
+
+
+# Maps (category, subcategory) name pairs to (category_id, subcategory_id),
+# creating the missing rows; four statements however many pairs are given
+def resolve_category_ids(cursor, backend, pairs):
+    pairs = set(pairs)
+    canonical = {pair: (canonical_name(pair[0]), canonical_name(pair[1])) for pair in pairs}
+    if not canonical:
+        return {}
+
+    category_names = sorted({cat for cat, _ in canonical.values()})
+    cursor.execute(backend.upsert_sql("categories", ("name",), ("name",), (), len(category_names)), category_names)
+    cursor.execute(f"SELECT id, name FROM categories WHERE name IN ({_placeholders(len(category_names))})",
+                   category_names)
+    category_ids = {name.casefold(): cid for cid, name in cursor.fetchall()}
+
+    sub_rows = sorted({(category_ids[cat.casefold()], sub) for cat, sub in canonical.values()})
+    cursor.execute(backend.upsert_sql("subcategories", ("category_id", "name"), ("category_id", "name"), (), len(sub_rows)),
+                   [value for row in sub_rows for value in row])
+    parent_ids = sorted({cid for cid, _ in sub_rows})
+    cursor.execute(f"SELECT id, category_id, name FROM subcategories WHERE category_id IN ({_placeholders(len(parent_ids))})",
+                   parent_ids)
+    sub_ids = {(cid, name.casefold()): sid for sid, cid, name in cursor.fetchall()}
+
+    resolved = {}
+    for pair, (cat, sub) in canonical.items():
+        cid = category_ids[cat.casefold()]
+        resolved[pair] = (cid, sub_ids[(cid, sub.casefold())])
+    return resolved
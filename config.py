@@ -0,0 +1,41 @@
+from pydantic_settings import BaseSettings
+
+
+#  Load DB settings from .env
+class Settings(BaseSettings):
+    db_backend: str = "mysql"  # "mysql" or "sqlite"
+    db_host: str = "localhost"
+    db_port: int = 3306
+    db_user: str = "root"
+    db_password: str = ""
+    db_name: str = "pharmacy"
+    sqlite_path: str = ":memory:"
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = True
+    catalog_cache_ttl: float = 60.0  # seconds; 0 disables the catalog cache
+    deadlock_retries: int = 3
+    order_page_size: int = 100
+    password_hash_iterations: int = 600_000  # PBKDF2-SHA256 cost of new and re-hashed passwords
+    session_ttl: float = 1800.0  # seconds a login token stays valid
+    session_max: int = 10000
+    group_commit: bool = False  # queue order writes and commit them in batches
+    group_commit_max_batch: int = 64
+    group_commit_max_delay_ms: float = 2.0  # how long a batch waits for company
+    metrics_enabled: bool = False  # time connects, statements and portal functions (metrics.py)
+    metrics_slow_query_ms: float = 100.0  # statements at least this slow go to the slow query log
+    metrics_slow_query_log: str = ""  # JSONL file for the slow query log; "" keeps it in memory
+    metrics_dump_path: str = ""  # write a JSON snapshot here every metrics_dump_interval seconds
+    metrics_dump_interval: float = 60.0
+    db_replicas: str = ""  # read replicas, comma-separated: host[:port] for mysql, file paths for sqlite
+    replica_retry_interval: float = 5.0  # seconds a failed replica sits out before it is tried again
+    replica_sticky_seconds: float = 5.0  # after a write, that user's reads stay on the primary this long
+    prepared_statements: bool = True  # keep the hot statements prepared per connection (statements.py)
+    archive_after_days: int = 180  # cancelled / delivered orders older than this move to the archive
+    archive_batch_size: int = 500  # orders moved per transaction
+    idempotency_cache_size: int = 10000  # recent idempotency keys answered from memory
+    idempotency_key_days: int = 7  # how long a client may retry with the same key
+
+    class Config:
+        env_file = ".env"
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import pytest
+
+import database
+import pharmacy_portal
+import services
+from passwords import hash_password
+from storage import SQLiteBackend
+
+
+# Cheap password hashes (the cost only matters to bench_auth.py) and no
+# sessions or idempotency keys carried over between tests
+@pytest.fixture(autouse=True)
+def fast_auth(monkeypatch):
+    monkeypatch.setattr(database.settings, "password_hash_iterations", 1000)
+    yield
+    services.session_cache.clear()
+    services.recent_keys.clear()
+
+
+# Sets up a store on backend (a fresh in-memory SQLite one by default):
+# schema, migrations and the seeded catalog, plus the given customers.
+# Returns the active backend; the backend is reset after the test.
+@pytest.fixture
+def make_store():
+    def make(backend=None, customers=()):
+        database.configure_backend(backend or SQLiteBackend(":memory:"))
+        services.bootstrap()
+        for user_id in customers:
+            add_customer(user_id)
+        return database.get_backend()
+
+    yield make
+    database.configure_backend(None)
+
+
+# Fresh in-memory SQLite store with the seeded catalog
+@pytest.fixture
+def sqlite_portal(make_store):
+    make_store()
+    return pharmacy_portal
+
+
+# Run SQL against the active backend and return all rows
+def query(sql, params=()):
+    with database.borrow_connection(database.settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description else []
+        conn.commit()
+        cursor.close()
+    return rows
+
+
+# (id, column) of the product called name; stock unless told otherwise
+def product(name, column="stock"):
+    return query(f"SELECT id, {column} FROM products WHERE name = %s", (name,))[0]
+
+
+def add_customer(user_id, city="Pune", state="MH", pincode="411001"):
+    query("""
+        INSERT INTO users (user_id, password, role, email, age, contact_number, city, state, pincode)
+        VALUES (%s, %s, 'Customer', 'c@example.com', 30, '9999999999', %s, %s, %s)
+    """, (user_id, hash_password("secret", 1000), city, state, pincode))
+
+
+# Runs a console function with input() answered from script and print()
+# captured; returns the printed lines. script is a list of answers in order,
+# or a dict of prompt prefix -> answer (lists are consumed in order,
+# callables are called).
+def run_scripted(func, script, *args, **kwargs):
+    if isinstance(script, dict):
+        def answer(prompt=""):
+            for prefix, value in script.items():
+                if prompt.strip().startswith(prefix):
+                    value = value.pop(0) if isinstance(value, list) else value
+                    return value() if callable(value) else value
+            raise AssertionError(f"unexpected prompt {prompt!r}")
+    else:
+        answers = iter(script)
+
+        def answer(prompt=""):
+            return next(answers)
+
+    with patch("builtins.input", answer), patch("builtins.print") as mock_print:
+        func(*args, **kwargs)
+    return [call.args[0] for call in mock_print.call_args_list if call.args]
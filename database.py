@@ -0,0 +1,250 @@
+import threading
+import time
+
+import metrics
+import migrations
+import reservations
+from catalog_cache import CatalogCache
+from db_pool import ConnectionPool
+from replicas import ReplicaRouter
+from search_index import ProductSearchIndex
+from storage import create_backend, create_replica_backends
+
+
+#  Database plumbing shared by the service layer and the tools: settings,
+#  the storage backend, connection pools, read replicas, transactions,
+#  schema and the cached catalog tree.
+
+#  Settings from .env, loaded on first use: pydantic_settings is by far the
+#  slowest import here, and plenty of imports of this module (the admin menu
+#  tests, a tool's --help) never read a setting
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                from config import Settings
+                _settings = Settings()
+    return _settings
+
+# Stands in for the Settings instance; reads and writes go to the real one
+class _LazySettings:
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+settings = _LazySettings()
+
+#  Storage backend (MySQL server or embedded SQLite)
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = _instrument(create_backend(settings))
+    return _backend
+
+# Swap the storage backend, e.g. SQLiteBackend(":memory:") for tests and benchmarks
+def configure_backend(backend):
+    global _backend
+    dispose_pools()
+    configure_replicas(None)
+    _backend = _instrument(backend) if backend is not None else None
+    catalog_cache.invalidate()
+    product_search.invalidate()
+
+# With settings.metrics_enabled, time everything the backend does
+def _instrument(backend):
+    if not settings.metrics_enabled:
+        return backend
+    registry = metrics.enable(
+        slow_query_ms=settings.metrics_slow_query_ms,
+        slow_query_log=settings.metrics_slow_query_log,
+        dump_path=settings.metrics_dump_path,
+        dump_interval=settings.metrics_dump_interval,
+    )
+    return metrics.InstrumentedBackend(backend, registry)
+
+# Driver error class of the active backend, for except clauses
+def db_error():
+    return get_backend().Error
+
+#  Connection pools, one per database
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _make_pool(backend, db):
+    size = settings.pool_size
+    max_overflow = settings.pool_max_overflow
+    if backend.max_connections:
+        size = min(size, backend.max_connections)
+        max_overflow = max(0, min(max_overflow, backend.max_connections - size))
+    return ConnectionPool(
+        lambda: backend.connect(db),
+        size=size,
+        max_overflow=max_overflow,
+        timeout=settings.pool_timeout,
+        pre_ping=settings.pool_pre_ping,
+    )
+
+def get_pool(db=None):
+    backend = get_backend()
+    if not backend.supports_databases:
+        db = None
+    with _pools_lock:
+        pool = _pools.get(db)
+        if pool is None:
+            pool = _make_pool(backend, db)
+            _pools[db] = pool
+        return pool
+
+# Connections a pool can have checked out at once
+def pool_capacity(db=None):
+    pool = get_pool(db)
+    return pool.size + pool.max_overflow
+
+def pool_stats():
+    with _pools_lock:
+        return {db: pool.stats() for db, pool in _pools.items()}
+
+def dispose_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.dispose()
+
+#  Read replicas (replicas.py): settings.db_replicas, or configure_replicas()
+_router = None
+_router_ready = False
+_router_lock = threading.Lock()
+
+def get_router():
+    global _router, _router_ready
+    if not _router_ready:
+        with _router_lock:
+            if not _router_ready:
+                backends = create_replica_backends(settings)
+                _router = _make_router(backends) if backends else None
+                _router_ready = True
+    return _router
+
+def _make_router(backends):
+    db = settings.db_name
+    return ReplicaRouter(
+        [(name, _make_pool(_instrument(backend), db if backend.supports_databases else None))
+         for name, backend in backends],
+        retry_interval=settings.replica_retry_interval,
+        sticky_seconds=settings.replica_sticky_seconds,
+    )
+
+# Route reads to [(name, backend)] replicas; None goes back to settings.db_replicas
+def configure_replicas(backends):
+    global _router, _router_ready
+    with _router_lock:
+        router, _router = _router, (_make_router(backends) if backends else None)
+        _router_ready = backends is not None
+    if router is not None:
+        router.dispose()
+
+def replica_stats():
+    router = get_router()
+    return router.stats() if router is not None else None
+
+# Call after a write so the writer's next reads see it (see replicas.py)
+def note_write(user_id=None):
+    router = get_router()
+    if router is not None:
+        router.note_write(user_id)
+
+# A replica connection for a read_only borrow, when there is one to use
+def _replica_connection(db, read_only, user_id):
+    if not read_only or db != settings.db_name:
+        return None
+    router = get_router()
+    return router.acquire(user_id) if router is not None else None
+
+# Borrow a pooled connection; close() hands it back to the pool. read_only
+# borrows may get a replica: pass user_id when the read is for one user.
+def get_connection(db=None, read_only=False, user_id=None):
+    conn = _replica_connection(db, read_only, user_id)
+    if conn is not None:
+        return conn
+    registry = metrics.registry()
+    if registry is None:
+        return get_pool(db).acquire()
+    started = time.perf_counter()
+    conn = get_pool(db).acquire()
+    registry.observe_checkout((time.perf_counter() - started) * 1000.0)
+    return conn
+
+def borrow_connection(db=None, read_only=False, user_id=None):
+    conn = _replica_connection(db, read_only, user_id)
+    if conn is not None:
+        return conn
+    registry = metrics.registry()
+    if registry is None:
+        return get_pool(db).connection()
+    return metrics.timed_checkout(registry, get_pool(db).connection())
+
+# Run work(cursor) as one transaction, re-running it on deadlocks
+def run_transaction(work):
+    with borrow_connection(settings.db_name) as conn:
+        return reservations.run_in_transaction(
+            conn, work, get_backend().is_retryable, retries=settings.deadlock_retries
+        )
+
+# Create database if not exists
+def create_database():
+    statements = get_backend().database_ddl(settings.db_name)
+    if not statements:
+        return
+    with borrow_connection() as conn:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        conn.commit()
+        cursor.close()
+
+# Bring the schema (tables, keys, indexes) up to date; only pending migrations run
+def apply_migrations():
+    with borrow_connection(settings.db_name) as conn:
+        return migrations.migrate(conn, get_backend())
+
+
+#  Cached catalog tree for browsing. Loaded from the primary: the cache is
+#  refreshed right after writes, and a lagging replica would pin the old
+#  stock in it.
+CATALOG_COLUMNS = """
+    p.id, c.id, c.name, s.id, s.name, p.name, p.price, p.stock
+    FROM products p
+    JOIN subcategories s ON s.id = p.subcategory_id
+    JOIN categories c ON c.id = s.category_id
+"""
+
+def _load_catalog():
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {CATALOG_COLUMNS} ORDER BY c.id, s.id, p.id")
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+def _load_catalog_products(product_ids):
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {CATALOG_COLUMNS} WHERE p.id IN ({placeholders})", tuple(product_ids))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+catalog_cache = CatalogCache(_load_catalog, _load_catalog_products, ttl=lambda: settings.catalog_cache_ttl)
+
+#  Product search index over the same rows (search_index.py)
+product_search = ProductSearchIndex(_load_catalog, _load_catalog_products)
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Raised when no connection becomes free within the checkout timeout
+class PoolTimeout(Exception):
+    pass
+
+
+# Connection handed out by the pool; close() gives it back instead of disconnecting
+class PooledConnection:
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+#  Thread-safe pool of reusable DB connections
+class ConnectionPool:
+    def __init__(self, creator, size=5, max_overflow=10, timeout=30.0,
+                 pre_ping=True, ping=None, reset=None):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self._ping = ping or (lambda raw: raw.is_connected())
+        self._reset = reset or (lambda raw: raw.rollback())
+        self._idle = deque()
+        self._open = 0
+        self._waiting = 0
+        self._disposed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "evictions": 0,
+            "created": 0,
+            "closed": 0,
+        }
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            raw = self._checkout(deadline)
+            if raw is None:
+                try:
+                    raw = self._creator()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+                    self._stats["checkouts"] += 1
+                return PooledConnection(self, raw)
+
+            # Health-check on borrow: drop dead connections and try again
+            if self.pre_ping and not self._is_alive(raw):
+                self._discard(raw, evicted=True)
+                continue
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return PooledConnection(self, raw)
+
+    # Returns an idle connection, or None when the caller may open a new one
+    def _checkout(self, deadline):
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"no connection available within {self.timeout}s "
+                        f"(size={self.size}, max_overflow={self.max_overflow})"
+                    )
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _is_alive(self, raw):
+        try:
+            return bool(self._ping(raw))
+        except Exception:
+            return False
+
+    def release(self, raw):
+        try:
+            self._reset(raw)
+        except Exception:
+            self._discard(raw, evicted=True)
+            return
+        with self._cond:
+            # Kept while the idle list has room or someone is waiting for it;
+            # overflow beyond that is closed once the load goes away
+            keep = not self._disposed and (len(self._idle) < self.size or self._waiting)
+            if keep:
+                self._idle.append(raw)
+            else:
+                self._open -= 1
+                self._stats["closed"] += 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(raw)
+
+    def _discard(self, raw, evicted=False):
+        with self._cond:
+            self._open -= 1
+            if evicted:
+                self._stats["evictions"] += 1
+            else:
+                self._stats["closed"] += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self.size
+            snapshot["max_overflow"] = self.max_overflow
+            snapshot["open"] = self._open
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._open - len(self._idle)
+        return snapshot
+
+    # Closes the idle connections; those checked out are closed when returned
+    def dispose(self):
+        with self._cond:
+            self._disposed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._stats["closed"] += len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            self._close_quietly(raw)
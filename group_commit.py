@@ -0,0 +1,193 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+#  Group commit for order writes
+#
+#  Callers submit work(cursor) and get a Future. One flusher thread drains
+#  the queue into batches of up to max_batch requests, waiting at most
+#  max_delay seconds after the first for company, and runs each batch as a
+#  single transaction: one commit (one fsync) instead of one per request.
+#
+#  Every request runs inside its own SAVEPOINT, so a request that raises
+#  (unknown customer, not enough stock, ...) is rolled back alone and its
+#  Future gets the exception; the rest of the batch still commits. Futures
+#  resolve only after the COMMIT. A deadlock rolls back the whole batch
+#  (the server discards the transaction), which is retried; once retries
+#  run out the batch falls back to one transaction per request.
+class GroupCommitWriter:
+    def __init__(self, borrow, backend, max_batch=64, max_delay=0.002, retries=3, backoff=0.005):
+        self._borrow = borrow  # () -> pooled connection context manager
+        self._backend = backend  # () -> storage backend (begin, is_retryable)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._batch_sizes = deque(maxlen=1000)
+        self._commit_ms = deque(maxlen=1000)
+        self._wait_ms = deque(maxlen=1000)
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "failed_requests": 0,
+            "failed_batches": 0,
+            "batch_retries": 0,
+            "fallback_batches": 0,
+        }
+
+    def submit(self, work):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("group commit writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+            self._queue.put((work, future, time.perf_counter()))
+        return future
+
+    # Submit and wait: the drop-in replacement for run_transaction(work)
+    def run(self, work):
+        return self.submit(work).result()
+
+    # Flush what is queued, then stop the flusher thread
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                now = time.perf_counter()
+                with self._lock:
+                    self._wait_ms.extend((now - queued) * 1000.0 for _, _, queued in batch)
+                self._flush(batch)
+            if stop:
+                return
+
+    # Blocks for the first request, then gathers more until the batch is
+    # full or the latency budget is spent; (batch, stop)
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, batch):
+        backend = self._backend()
+        attempt = 0
+        while True:
+            try:
+                outcomes, commit_ms = self._commit(batch, backend)
+                break
+            except Exception as err:
+                if attempt < self.retries and backend.is_retryable(err):
+                    attempt += 1
+                    self._bump("batch_retries")
+                    time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+                    continue
+                if backend.is_retryable(err) and len(batch) > 1:
+                    self._bump("fallback_batches")
+                    for item in batch:
+                        self._flush([item])
+                    return
+                self._bump("failed_batches")
+                for _, future, _ in batch:
+                    future.set_exception(err)
+                self._bump("failed_requests", len(batch))
+                return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._commit_ms.append(commit_ms)
+        for (_, future, _), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                self._bump("failed_requests")
+                future.set_exception(value)
+
+    # One transaction for the batch; [(ok, result or exception)] per request
+    def _commit(self, batch, backend):
+        with self._borrow() as conn:
+            cursor = conn.cursor()
+            try:
+                backend.begin(cursor)
+                outcomes = []
+                for work, _, _ in batch:
+                    cursor.execute("SAVEPOINT group_commit_request")
+                    try:
+                        result = work(cursor)
+                    except Exception as err:
+                        if backend.is_retryable(err):
+                            raise  # the whole transaction is gone
+                        cursor.execute("ROLLBACK TO SAVEPOINT group_commit_request")
+                        outcomes.append((False, err))
+                    else:
+                        cursor.execute("RELEASE SAVEPOINT group_commit_request")
+                        outcomes.append((True, result))
+                started = time.perf_counter()
+                conn.commit()
+                return outcomes, (time.perf_counter() - started) * 1000.0
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, queued=self._queue.qsize())
+            sizes = sorted(self._batch_sizes)
+            commits = sorted(self._commit_ms)
+            waits = sorted(self._wait_ms)
+        stats["mean_batch_size"] = round(sum(sizes) / len(sizes), 2) if sizes else 0.0
+        stats["max_batch_size"] = sizes[-1] if sizes else 0
+        for pct in (50, 95, 99):
+            stats[f"commit_p{pct}_ms"] = _percentile(commits, pct)
+        stats["queue_wait_p50_ms"] = _percentile(waits, 50)
+        stats["queue_wait_p95_ms"] = _percentile(waits, 95)
+        return stats
+
+
+# Over the recent samples kept in the stats windows
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return round(sorted_values[min(len(sorted_values) - 1, len(sorted_values) * pct // 100)], 3)
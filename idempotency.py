@@ -0,0 +1,126 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+#  Idempotency keys for order writes
+#
+#  A client that times out and retries sends the same key again. The first
+#  request claims (user_id, key) in idempotency_keys inside its own write
+#  transaction and stores its result there, so the claim commits or rolls
+#  back with the order itself: a request that failed leaves the key free for
+#  the retry. A retry finds the key taken (waiting on the primary key while
+#  the first is still in flight) and gets the stored result back, without
+#  checking stock or inserting anything. RecentKeys remembers the latest
+#  results in process, so most retries never borrow a connection at all.
+#
+#  A key names one request: reusing it for a different operation or cart
+#  raises IdempotencyKeyReused. Keys older than settings.idempotency_key_days
+#  are dropped by purge().
+
+MAX_KEY_LENGTH = 100
+
+
+class IdempotencyKeyReused(Exception):
+    def __init__(self, key):
+        super().__init__(f"idempotency key {key!r} was already used for a different request")
+        self.key = key
+
+
+# The key is taken but its row is not visible yet; the backends treat this as
+# retryable, so the whole transaction runs again and finds it
+class KeyInFlight(Exception):
+    retryable = True
+
+    def __init__(self, key):
+        super().__init__(f"idempotency key {key!r} is being used by another request")
+        self.key = key
+
+
+def check_key(key):
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH or not key.isascii():
+        raise ValueError(f"idempotency key must be 1-{MAX_KEY_LENGTH} ASCII characters")
+    return key
+
+
+# Hash of the operation and its arguments: what a retry has to repeat
+def fingerprint(operation, *args):
+    return hashlib.sha256(json.dumps([operation, *args], default=str).encode()).hexdigest()
+
+
+#  Bounded in-process map (user_id, key) -> (request hash, result), least
+#  recently used dropped first. max_keys may be a function returning it.
+class RecentKeys:
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    @staticmethod
+    def _slot(user_id, key):
+        return str(user_id).casefold(), key  # user ids compare like users.user_id
+
+    def get(self, user_id, key):
+        slot = self._slot(user_id, key)
+        with self._lock:
+            found = self._keys.get(slot)
+            if found is None:
+                self._stats["misses"] += 1
+                return None
+            self._keys.move_to_end(slot)
+            self._stats["hits"] += 1
+            return found
+
+    def put(self, user_id, key, request_hash, result):
+        max_keys = self.max_keys() if callable(self.max_keys) else self.max_keys
+        slot = self._slot(user_id, key)
+        with self._lock:
+            self._keys[slot] = (request_hash, result)
+            self._keys.move_to_end(slot)
+            while len(self._keys) > max_keys:
+                self._keys.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, keys=len(self._keys))
+
+
+# Claims key for user_id in the current transaction. Returns None when the
+# key was free (the caller goes on and record()s its result), else the
+# (request hash, result) stored by the request that took it.
+def claim(cursor, backend, user_id, key, request_hash):
+    try:
+        cursor.execute("""
+            INSERT INTO idempotency_keys (user_id, idem_key, request_hash, created_at)
+            VALUES (%s, %s, %s, %s)
+        """, (str(user_id), key, request_hash, datetime.now().replace(microsecond=0)))
+        return None
+    except backend.Error as err:
+        if not backend.is_duplicate_key(err):
+            raise
+    # A locking read: on MySQL a plain one would read the transaction's
+    # snapshot, which may predate the row that just collided
+    cursor.execute("SELECT request_hash, result FROM idempotency_keys WHERE user_id = %s AND idem_key = %s"
+                   + backend.share_lock_sql(), (str(user_id), key))
+    row = cursor.fetchone()
+    if row is None:
+        raise KeyInFlight(key)
+    return row[0], json.loads(row[1])
+
+
+def record(cursor, user_id, key, result):
+    cursor.execute("UPDATE idempotency_keys SET result = %s WHERE user_id = %s AND idem_key = %s",
+                   (json.dumps(result), str(user_id), key))
+
+
+# Drops keys created before before; returns how many
+def purge(cursor, before):
+    cursor.execute("DELETE FROM idempotency_keys WHERE created_at < %s", (before,))
+    return cursor.rowcount
@@ -0,0 +1,122 @@
+from datetime import datetime
+
+#  Low-stock watchlist
+#
+#  products.reorder_threshold says when a product needs reordering (0: never).
+#  low_stock holds exactly the products whose stock is below their threshold,
+#  and stock_alerts gets a 'low' row when one enters the list and a
+#  'restocked' row when it leaves. Every write that changes stock calls
+#  check() with the products it touched, inside its own transaction: one
+#  primary-key lookup per write, more only when a threshold is crossed. So
+#  the watchlist never needs a scan of products, and alerts commit (or roll
+#  back) with the stock change that caused them; stock_alerts.py turns them
+#  into a JSONL feed, marking each one delivered once it is written.
+
+WATCHLIST_COLUMNS = "w.product_id, p.name, p.stock, p.reorder_threshold, w.since"
+
+
+# Brings the watchlist up to date for product_ids after their stock or
+# threshold changed; returns the [(product_id, kind)] alerts raised
+def check(cursor, product_ids):
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    cursor.execute(f"""
+        SELECT p.id, p.stock, p.reorder_threshold, w.product_id
+        FROM products p LEFT JOIN low_stock w ON w.product_id = p.id
+        WHERE p.id IN ({placeholders})
+    """, product_ids)
+    entered, left = [], []
+    for product_id, stock, threshold, watched in cursor.fetchall():
+        low = stock < threshold
+        if low and watched is None:
+            entered.append((product_id, stock, threshold))
+        elif not low and watched is not None:
+            left.append((product_id, stock, threshold))
+    if not (entered or left):
+        return []
+
+    now = datetime.now().replace(microsecond=0)
+    if entered:
+        cursor.execute(
+            "INSERT INTO low_stock (product_id, since) VALUES " + ", ".join(["(%s, %s)"] * len(entered)),
+            [value for product_id, _, _ in entered for value in (product_id, now)],
+        )
+    if left:
+        cursor.execute(
+            f"DELETE FROM low_stock WHERE product_id IN ({', '.join(['%s'] * len(left))})",
+            [product_id for product_id, _, _ in left],
+        )
+    alerts = [(row, "low") for row in entered] + [(row, "restocked") for row in left]
+    cursor.execute(
+        "INSERT INTO stock_alerts (product_id, kind, stock, threshold, created_at) VALUES "
+        + ", ".join(["(%s, %s, %s, %s, %s)"] * len(alerts)),
+        [value for (product_id, stock, threshold), kind in alerts
+         for value in (product_id, kind, stock, threshold, now)],
+    )
+    return [(product_id, kind) for (product_id, _, _), kind in alerts]
+
+
+# A deleted product leaves the watchlist without an alert
+def forget(cursor, product_id):
+    cursor.execute("DELETE FROM low_stock WHERE product_id = %s", (product_id,))
+
+
+# [(product_id, name, stock, threshold, since)], furthest below threshold first
+def watchlist(cursor):
+    cursor.execute(f"""
+        SELECT {WATCHLIST_COLUMNS}
+        FROM low_stock w JOIN products p ON p.id = w.product_id
+        ORDER BY p.stock - p.reorder_threshold, w.product_id
+    """)
+    return cursor.fetchall()
+
+
+# The same list the naive way, scanning every product: for checks and the
+# benchmark only
+def scan(cursor):
+    cursor.execute("""
+        SELECT p.id, p.name, p.stock, p.reorder_threshold
+        FROM products p WHERE p.stock < p.reorder_threshold
+        ORDER BY p.stock - p.reorder_threshold, p.id
+    """)
+    return cursor.fetchall()
+
+
+# [(id, product_id, name, kind, stock, threshold, created_at)] after alert
+# after_id, oldest first
+def alerts_after(cursor, after_id=0, limit=1000):
+    cursor.execute("""
+        SELECT a.id, a.product_id, COALESCE(p.name, '(deleted)'), a.kind, a.stock, a.threshold, a.created_at
+        FROM stock_alerts a LEFT JOIN products p ON p.id = a.product_id
+        WHERE a.id > %s ORDER BY a.id LIMIT %s
+    """, (after_id, limit))
+    return cursor.fetchall()
+
+
+# Alerts not delivered yet, oldest first, same columns. Not "after the last
+# id delivered": ids are taken when a transaction inserts its alert but show
+# up when it commits, so a lower id can appear after a higher one was read.
+def undelivered_alerts(cursor, limit=1000):
+    cursor.execute("""
+        SELECT a.id, a.product_id, COALESCE(p.name, '(deleted)'), a.kind, a.stock, a.threshold, a.created_at
+        FROM stock_alerts a LEFT JOIN products p ON p.id = a.product_id
+        WHERE a.delivered_at IS NULL ORDER BY a.id LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def mark_delivered(cursor, alert_ids):
+    cursor.execute(f"UPDATE stock_alerts SET delivered_at = %s WHERE id IN ({', '.join(['%s'] * len(alert_ids))})",
+                   [datetime.now().replace(microsecond=0), *alert_ids])
+
+
+# Re-checks every product with a threshold, in chunks; for repairs
+def rebuild(cursor, chunk_size=500):
+    cursor.execute("SELECT id FROM products WHERE reorder_threshold > 0 UNION SELECT product_id FROM low_stock")
+    product_ids = [row[0] for row in cursor.fetchall()]
+    alerts = []
+    for start in range(0, len(product_ids), chunk_size):
+        alerts += check(cursor, product_ids[start:start + chunk_size])
+    return alerts
@@ -0,0 +1,467 @@
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+#  Latency instrumentation
+#
+#  Off unless settings.metrics_enabled: then database.py wraps the storage
+#  backend so every connect, statement, commit and rollback is timed, and
+#  functions marked @timed (the portal's menu actions and the service layer)
+#  record their own latency plus the round trips and rows of the statements
+#  they ran. Everything lands in histograms keyed by normalised SQL or
+#  function name; statements slower than the threshold also go to the slow
+#  query log. prometheus_text() and snapshot() export it, and a background
+#  thread can dump the snapshot as JSON every few seconds.
+#
+#  While off, nothing is wrapped and a @timed function costs one extra call
+#  and a global lookup.
+
+# Histogram bucket upper bounds, milliseconds
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_registry = None
+_enable_lock = threading.Lock()
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    # Upper bound of the bucket holding the pct-th percentile (max_ms past the last bound)
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 4) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 4),
+        }
+
+
+# One histogram plus the counters kept next to it
+class Series:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.rows = 0
+        self.round_trips = 0
+
+    def summary(self):
+        return dict(self.latency.summary(), errors=self.errors, rows=self.rows, round_trips=self.round_trips)
+
+
+_SPACES = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_ROW_LIST = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_CASE_ARMS = re.compile(r"(WHEN %s THEN %s)(?: WHEN %s THEN %s)+")
+
+
+# Statement text without the parts that only vary with the number of
+# rows/ids, so "IN (%s, %s)" and "IN (%s, %s, %s)" share one series
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    sql = _SPACES.sub(" ", sql).strip()
+    sql = _CASE_ARMS.sub(r"\1 ...", sql)
+    sql = _PLACEHOLDER_LIST.sub("(%s, ...)", sql)
+    sql = _ROW_LIST.sub(r"\1, ...", sql)
+    return sql
+
+
+class MetricsRegistry:
+    def __init__(self, slow_query_ms=100.0, slow_query_log="", slow_queries_kept=200):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log  # JSONL file, "" keeps them in memory only
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()  # the slow-query file, written outside _lock
+        self._statements = {}
+        self._operations = {}
+        self._connects = Histogram()
+        self._checkouts = Histogram()
+        self._slow = deque(maxlen=slow_queries_kept)
+        self._slow_total = 0
+        self.started = datetime.now()
+        self.dumper = None  # JsonDumper writing this registry, if any
+
+    def _series(self, table, key):
+        series = table.get(key)
+        if series is None:
+            series = table[key] = Series()
+        return series
+
+    # One statement (or commit/rollback) that took ms; returns its series so
+    # the cursor can add the rows it fetches later
+    def observe_statement(self, sql, ms, rows=0, error=False):
+        key = normalize_sql(sql)
+        frames = getattr(_local, "frames", None)
+        entry = None
+        with self._lock:
+            series = self._series(self._statements, key)
+            series.latency.observe(ms)
+            series.round_trips += 1
+            series.rows += rows
+            if error:
+                series.errors += 1
+            if frames:
+                for frame in frames:
+                    frame[0] += 1
+                    frame[1] += rows
+            if ms >= self.slow_query_ms:
+                self._slow_total += 1
+                entry = {
+                    "at": datetime.now().isoformat(timespec="milliseconds"),
+                    "ms": round(ms, 3),
+                    "sql": key,
+                    "operation": frames[-1][2] if frames else None,
+                    "error": error,
+                }
+                self._slow.append(entry)
+        if entry is not None and self.slow_query_log:
+            line = json.dumps(entry) + "\n"
+            with self._log_lock, open(self.slow_query_log, "a", encoding="utf-8") as f:
+                f.write(line)
+        return series
+
+    def add_rows(self, series, rows):
+        frames = getattr(_local, "frames", None)
+        with self._lock:
+            series.rows += rows
+            if frames:
+                for frame in frames:
+                    frame[1] += rows
+
+    def observe_connect(self, ms):
+        with self._lock:
+            self._connects.observe(ms)
+
+    def observe_checkout(self, ms):
+        with self._lock:
+            self._checkouts.observe(ms)
+
+    # Runs func, charging its latency and the statements it ran to name
+    def run_operation(self, name, func, args, kwargs):
+        frames = getattr(_local, "frames", None)
+        if frames is None:
+            frames = _local.frames = []
+        frame = [0, 0, name]  # round trips, rows, name
+        frames.append(frame)
+        error = False
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            ms = (time.perf_counter() - started) * 1000.0
+            frames.pop()
+            with self._lock:
+                series = self._series(self._operations, name)
+                series.latency.observe(ms)
+                series.round_trips += frame[0]
+                series.rows += frame[1]
+                if error:
+                    series.errors += 1
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._operations.clear()
+            self._connects = Histogram()
+            self._checkouts = Histogram()
+            self._slow.clear()
+            self._slow_total = 0
+            self.started = datetime.now()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "since": self.started.isoformat(timespec="seconds"),
+                "slow_query_ms": self.slow_query_ms,
+                "connects": self._connects.summary(),
+                "checkouts": self._checkouts.summary(),
+                "operations": {name: s.summary() for name, s in sorted(self._operations.items())},
+                "statements": {sql: s.summary() for sql, s in sorted(self._statements.items())},
+                "slow_queries_total": self._slow_total,
+                "slow_queries": list(self._slow),
+            }
+
+    # Prometheus text exposition format (0.0.4); latencies in seconds
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            _histogram_lines(lines, "portal_db_connect_seconds", "New database connections", [("", self._connects)])
+            _histogram_lines(lines, "portal_db_checkout_seconds", "Waiting for a pooled connection",
+                             [("", self._checkouts)])
+            operations = sorted(self._operations.items())
+            statements = sorted(self._statements.items())
+            _histogram_lines(lines, "portal_operation_seconds", "Portal and service function latency",
+                             [(_labels(operation=name), s.latency) for name, s in operations])
+            for metric, help_text, attr in (
+                ("portal_operation_round_trips_total", "Statements run by portal functions", "round_trips"),
+                ("portal_operation_rows_total", "Rows returned or changed under portal functions", "rows"),
+                ("portal_operation_errors_total", "Portal function calls that raised", "errors"),
+            ):
+                _counter_lines(lines, metric, help_text,
+                               [(_labels(operation=name), getattr(s, attr)) for name, s in operations])
+            _histogram_lines(lines, "portal_sql_seconds", "SQL statement latency",
+                             [(_labels(statement=sql), s.latency) for sql, s in statements])
+            _counter_lines(lines, "portal_sql_rows_total", "Rows returned or changed by SQL statements",
+                           [(_labels(statement=sql), s.rows) for sql, s in statements])
+            _counter_lines(lines, "portal_sql_errors_total", "SQL statements that failed",
+                           [(_labels(statement=sql), s.errors) for sql, s in statements])
+            _counter_lines(lines, "portal_slow_queries_total",
+                           f"Statements slower than {self.slow_query_ms} ms", [("", self._slow_total)])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _with(labels, extra):
+    return "{" + ",".join(part for part in (labels, extra) if part) + "}"
+
+
+def _histogram_lines(lines, metric, help_text, series):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for labels, histogram in series:
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS, histogram.counts):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_with(labels, _labels(le=f'{bound / 1000.0:g}'))} {cumulative}")
+        lines.append(f"{metric}_bucket{_with(labels, _labels(le='+Inf'))} {histogram.count}")
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{metric}_sum{suffix} {histogram.sum_ms / 1000.0:.6f}")
+        lines.append(f"{metric}_count{suffix} {histogram.count}")
+
+
+def _counter_lines(lines, metric, help_text, series):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} counter")
+    for labels, value in series:
+        lines.append(f"{metric}{'{' + labels + '}' if labels else ''} {value}")
+
+
+#  Backend wrappers, in the style of bench_orders' counting wrappers
+class InstrumentedCursor:
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._registry = registry
+        self._series = None
+
+    def _timed(self, method, sql, params):
+        started = time.perf_counter()
+        try:
+            result = method(sql, params)
+        except Exception:
+            self._series = self._registry.observe_statement(sql, (time.perf_counter() - started) * 1000.0,
+                                                            error=True)
+            raise
+        ms = (time.perf_counter() - started) * 1000.0
+        # Writes report the rows they changed; reads count rows as they are fetched
+        rows = self._cursor.rowcount if self._cursor.description is None and self._cursor.rowcount > 0 else 0
+        self._series = self._registry.observe_statement(sql, ms, rows)
+        return result
+
+    def execute(self, sql, params=()):
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(self._cursor.executemany, sql, seq_of_params)
+
+    def _fetched(self, rows):
+        if self._series is not None and rows:
+            self._registry.add_rows(self._series, rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._fetched(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._fetched(1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, registry):
+        self._conn = conn
+        self._registry = registry
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._registry)
+
+    def _timed(self, name, method):
+        started = time.perf_counter()
+        try:
+            return method()
+        finally:
+            self._registry.observe_statement(name, (time.perf_counter() - started) * 1000.0)
+
+    def commit(self):
+        return self._timed("COMMIT", self._conn.commit)
+
+    def rollback(self):
+        return self._timed("ROLLBACK", self._conn.rollback)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class InstrumentedBackend:
+    def __init__(self, backend, registry):
+        self._backend = backend
+        self._registry = registry
+
+    def connect(self, db=None):
+        started = time.perf_counter()
+        conn = self._backend.connect(db)
+        self._registry.observe_connect((time.perf_counter() - started) * 1000.0)
+        return InstrumentedConnection(conn, self._registry)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+
+# Times how long a pooled checkout (pool.connection()) waited
+@contextmanager
+def timed_checkout(registry, connection):
+    started = time.perf_counter()
+    with connection as conn:
+        registry.observe_checkout((time.perf_counter() - started) * 1000.0)
+        yield conn
+
+
+#  Switching on and off
+
+def registry():
+    return _registry
+
+
+# Starts recording (idempotent); dump_path gets snapshot() as JSON every
+# dump_interval seconds
+def enable(slow_query_ms=100.0, slow_query_log="", dump_path="", dump_interval=60.0):
+    global _registry
+    with _enable_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(slow_query_ms, slow_query_log)
+            if dump_path:
+                _registry.dumper = JsonDumper(_registry, dump_path, dump_interval)
+                _registry.dumper.start()
+                atexit.register(_registry.dumper.stop)  # the last interval too
+        else:
+            _registry.slow_query_ms = slow_query_ms
+            _registry.slow_query_log = slow_query_log
+        return _registry
+
+
+def disable():
+    global _registry
+    with _enable_lock:
+        registry, _registry = _registry, None
+    dumper = getattr(registry, "dumper", None)
+    if dumper is not None:
+        dumper.stop()
+
+
+# Decorator: record every call of func as an operation named after it
+def timed(func):
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        registry = _registry
+        if registry is None:
+            return func(*args, **kwargs)
+        return registry.run_operation(name, func, args, kwargs)
+
+    return wrapper
+
+
+# Writes the snapshot to path atomically (tmp file + rename)
+def dump(registry, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+class JsonDumper:
+    def __init__(self, registry, path, interval):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            dump(self.registry, self.path)
+
+    # Stops the thread and writes a last dump (once)
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        dump(self.registry, self.path)
@@ -0,0 +1,236 @@
+from datetime import datetime
+
+from categories import resolve_category_ids
+from passwords import hash_password, is_hashed
+from summaries import rebuild as rebuild_summaries
+
+#  Versioned schema migrations
+#
+#  Each migration is (version, name, apply(cursor, backend)) and runs once,
+#  in version order; schema_version records what a database already has.
+#  Steps are written to be safe on databases that were set up by hand
+#  before the runner existed (CREATE TABLE IF NOT EXISTS, ensure_index).
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+# Which version of the built-in data (the seeded catalog) a database has
+SEED_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS seed_version (
+        name VARCHAR(100) PRIMARY KEY,
+        version INT NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+def _baseline_tables(cursor, backend):
+    for table in ("users", "products", "orders"):
+        cursor.execute(backend.table_ddl(table))
+
+
+# Stores set up by hand may list a product twice; merge those first. The key
+# compares case- and trailing-space-insensitively on some collations, so
+# duplicates are matched the same way.
+def _catalog_unique_key(cursor, backend):
+    _merge_duplicate_products(cursor, ("LOWER(TRIM(name))", "LOWER(TRIM(category))", "LOWER(TRIM(subcategory))"))
+    backend.ensure_index(cursor, "products", "uq_products_catalog", ("name", "category", "subcategory"), unique=True)
+
+
+def _hot_path_indexes(cursor, backend):
+    # Active orders of a customer (update/cancel): user_id = ? AND status != 'Cancelled'
+    backend.ensure_index(cursor, "orders", "idx_orders_user_status", ("user_id", "status"))
+    # Keyset listing, admin and customer: ORDER BY requested_date DESC, id DESC
+    backend.ensure_index(cursor, "orders", "idx_orders_requested", ("requested_date", "id"))
+    backend.ensure_index(cursor, "orders", "idx_orders_user_requested", ("user_id", "requested_date", "id"))
+    # Browsing: category = ? AND subcategory = ? AND stock > 0
+    backend.ensure_index(cursor, "products", "idx_products_browse", ("category", "subcategory", "stock"))
+
+
+# Products equal on key (SQL expressions over products): keep the oldest
+# row, move orders and stock onto it
+def _merge_duplicate_products(cursor, key):
+    columns = ", ".join(key)
+    match = " AND ".join(f"{expression} = %s" for expression in key)
+    cursor.execute(f"SELECT {columns}, MIN(id) FROM products GROUP BY {columns} HAVING COUNT(*) > 1")
+    for *values, keeper in cursor.fetchall():
+        cursor.execute(f"SELECT id, stock FROM products WHERE {match} AND id != %s", (*values, keeper))
+        duplicates = cursor.fetchall()
+        ids = [row[0] for row in duplicates]
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"UPDATE orders SET product_id = %s WHERE product_id IN ({placeholders})", [keeper] + ids)
+        cursor.execute("UPDATE products SET stock = stock + %s WHERE id = %s",
+                       (sum(row[1] for row in duplicates), keeper))
+        cursor.execute(f"DELETE FROM products WHERE id IN ({placeholders})", ids)
+
+
+# Categories and subcategories move into their own tables with canonical
+# names; products keep only subcategory_id. Every step checks the current
+# state first, so a run interrupted half way (MySQL DDL commits as it goes)
+# can simply be re-run.
+def _category_tables(cursor, backend):
+    cursor.execute(backend.table_ddl("categories"))
+    cursor.execute(backend.table_ddl("subcategories"))
+    if not backend.column_exists(cursor, "products", "subcategory_id"):
+        cursor.execute("ALTER TABLE products ADD COLUMN subcategory_id INT NULL")
+    backend.add_foreign_key(cursor, "products", "subcategory_id", "subcategories", "fk_products_subcategory")
+
+    if backend.column_exists(cursor, "products", "category"):
+        # Trimming can make two rows equal on the old catalog key; they are
+        # merged below, so the key has to go first
+        backend.drop_index(cursor, "products", "uq_products_catalog")
+        cursor.execute("UPDATE products SET name = TRIM(name)")
+        cursor.execute("SELECT DISTINCT category, subcategory FROM products")
+        pairs = cursor.fetchall()
+        ids = resolve_category_ids(cursor, backend, pairs)
+        for category, subcategory in pairs:
+            cursor.execute(
+                "UPDATE products SET subcategory_id = %s WHERE category = %s AND subcategory = %s",
+                (ids[(category, subcategory)][1], category, subcategory),
+            )
+        _merge_duplicate_products(cursor, ("subcategory_id", "LOWER(name)"))
+        backend.drop_index(cursor, "products", "idx_products_browse")
+        cursor.execute("ALTER TABLE products DROP COLUMN category")
+        cursor.execute("ALTER TABLE products DROP COLUMN subcategory")
+    backend.set_not_null(cursor, "products", "subcategory_id", "INT")
+
+    backend.ensure_index(cursor, "products", "uq_products_subcategory_name", ("subcategory_id", "name"), unique=True)
+    backend.ensure_index(cursor, "products", "idx_products_subcategory_stock", ("subcategory_id", "stock"))
+
+
+# Orders become a header (customer, status, shipping) with one order_lines
+# row per product. Existing orders turn into single-line orders priced at
+# the product's current price; re-runnable like the step above.
+def _order_lines(cursor, backend):
+    cursor.execute(backend.table_ddl("order_lines"))
+    if backend.column_exists(cursor, "orders", "product_id"):
+        cursor.execute("""
+            INSERT INTO order_lines (order_id, product_id, quantity, unit_price)
+            SELECT o.id, o.product_id, o.quantity, COALESCE(p.price, 0)
+            FROM orders o LEFT JOIN products p ON p.id = o.product_id
+            WHERE NOT EXISTS (SELECT 1 FROM order_lines l WHERE l.order_id = o.id)
+        """)
+        backend.drop_columns(cursor, "orders", ("product_id", "quantity"))
+    # Stock ledger and delete_product look lines up by product
+    backend.ensure_index(cursor, "order_lines", "idx_order_lines_product", ("product_id",))
+
+
+# Plaintext passwords become salted hashes at the default cost; logins
+# re-hash them at the configured cost. Rows already hashed are skipped, so
+# an interrupted run can be re-run.
+def _hashed_passwords(cursor, backend):
+    cursor.execute("SELECT id, password FROM users")
+    for user_pk, password in cursor.fetchall():
+        if not is_hashed(password):
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hash_password(password), user_pk))
+
+
+def _seed_version_table(cursor, backend):
+    cursor.execute(SEED_VERSION_DDL)
+
+
+# Sales / status summaries, filled from the orders already there (the
+# archive tables only come with version 10)
+def _summary_tables(cursor, backend):
+    cursor.execute(backend.table_ddl("sales_daily"))
+    cursor.execute(backend.table_ddl("order_status_counts"))
+    rebuild_summaries(cursor, archived=False)
+
+
+# Per-product reorder thresholds (0: never reorder) and the low-stock
+# watchlist; nothing has a threshold yet, so the list starts empty
+def _low_stock_watchlist(cursor, backend):
+    if not backend.column_exists(cursor, "products", "reorder_threshold"):
+        cursor.execute("ALTER TABLE products ADD COLUMN reorder_threshold INT NOT NULL DEFAULT 0")
+    cursor.execute(backend.table_ddl("low_stock"))
+    cursor.execute(backend.table_ddl("stock_alerts"))
+
+
+# Old cancelled / delivered orders move here (order_archive.py); listings
+# that include history read them newest first, per customer or overall
+def _order_archive(cursor, backend):
+    cursor.execute(backend.table_ddl("orders_archive"))
+    cursor.execute(backend.table_ddl("order_lines_archive"))
+    backend.ensure_index(cursor, "orders_archive", "idx_orders_archive_requested", ("requested_date", "id"))
+    backend.ensure_index(cursor, "orders_archive", "idx_orders_archive_user_requested",
+                         ("user_id", "requested_date", "id"))
+    backend.ensure_index(cursor, "order_lines_archive", "idx_order_lines_archive_order", ("order_id",))
+
+
+# Stock alerts are delivered from an outbox flag rather than an id cursor,
+# which skipped alerts committed after a higher id. Alerts already there
+# were read by that cursor: they count as delivered.
+def _stock_alert_delivery(cursor, backend):
+    if not backend.column_exists(cursor, "stock_alerts", "delivered_at"):
+        cursor.execute("ALTER TABLE stock_alerts ADD COLUMN delivered_at DATETIME NULL")
+    cursor.execute("UPDATE stock_alerts SET delivered_at = created_at WHERE delivered_at IS NULL")
+    backend.ensure_index(cursor, "stock_alerts", "idx_stock_alerts_delivered", ("delivered_at", "id"))
+
+
+# Idempotency keys of order writes (idempotency.py); purged by age
+def _idempotency_keys(cursor, backend):
+    cursor.execute(backend.table_ddl("idempotency_keys"))
+    backend.ensure_index(cursor, "idempotency_keys", "idx_idempotency_keys_created", ("created_at",))
+
+
+MIGRATIONS = [
+    (1, "baseline tables", _baseline_tables),
+    (2, "products catalog unique key", _catalog_unique_key),
+    (3, "hot path indexes", _hot_path_indexes),
+    (4, "category and subcategory tables", _category_tables),
+    (5, "order lines", _order_lines),
+    (6, "hashed passwords", _hashed_passwords),
+    (7, "seed version table", _seed_version_table),
+    (8, "sales summary tables", _summary_tables),
+    (9, "low stock watchlist", _low_stock_watchlist),
+    (10, "order archive", _order_archive),
+    (11, "idempotency keys", _idempotency_keys),
+    (12, "stock alert delivery", _stock_alert_delivery),
+]
+
+
+def latest_version(migrations=None):
+    return max(number for number, _, _ in migrations or MIGRATIONS)
+
+
+def current_version(cursor):
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    row = cursor.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+# Applies pending migrations on conn; returns the (version, name) pairs applied
+def migrate(conn, backend, migrations=None):
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m[0])
+    cursor = conn.cursor()
+    applied = []
+    try:
+        backend.acquire_migration_lock(cursor)
+        try:
+            cursor.execute(SCHEMA_VERSION_DDL)
+            conn.commit()
+            version = current_version(cursor)
+            for number, name, apply in migrations:
+                if number <= version:
+                    continue
+                apply(cursor, backend)
+                # MySQL commits DDL implicitly, so record each step as it lands
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (%s, %s, %s)",
+                    (number, name, datetime.now().replace(microsecond=0)),
+                )
+                conn.commit()
+                applied.append((number, name))
+        finally:
+            backend.release_migration_lock(cursor)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return applied
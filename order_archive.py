@@ -0,0 +1,132 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import database
+from database import run_transaction, settings
+
+#  Order archival
+#
+#  Cancelled and delivered orders older than settings.archive_after_days
+#  move, with their lines, from orders / order_lines to orders_archive /
+#  order_lines_archive, keeping their ids. Every batch of batch_size orders
+#  is one short transaction (copy, then delete, the oldest first), so the
+#  live tables are never locked for long and an interrupted run simply
+#  carries on where it stopped the next time.
+#
+#  Those statuses are final: nothing writes the orders once they have one,
+#  so the rows copied are the rows deleted. The summaries already count
+#  them and keep doing so (summaries.py reads the archive too); listings
+#  leave them out unless asked (services.fetch_orders_page(include_archived=True)).
+#
+#    python order_archive.py
+#    python order_archive.py --days 365 --batch-size 1000 --pause 0.05
+
+ARCHIVED_STATUSES = ("Cancelled", "Delivered")
+
+ORDER_COLUMNS = "id, user_id, status, requested_date, shipping_city, shipping_state, shipping_pincode"
+LINE_COLUMNS = "id, order_id, product_id, quantity, unit_price"
+
+
+# Moves up to batch_size archivable orders placed before cutoff, starting
+# past the (requested_date, id) key after; returns (orders moved, lines
+# moved, key of the last one). Seeking past the previous batch keeps the
+# old orders that stay (still live) from being scanned again every batch.
+def archive_batch(cursor, cutoff, batch_size, after=None, archived_at=None):
+    statuses = ", ".join(["%s"] * len(ARCHIVED_STATUSES))
+    where = [f"requested_date < %s AND status IN ({statuses})"]
+    params = [cutoff, *ARCHIVED_STATUSES]
+    if after is not None:
+        # The plain >= is what the index range starts from
+        where.append("requested_date >= %s AND (requested_date > %s OR id > %s)")
+        params.extend([after[0], after[0], after[1]])
+    cursor.execute(f"""
+        SELECT id, requested_date FROM orders
+        WHERE {" AND ".join(where)}
+        ORDER BY requested_date, id
+        LIMIT %s
+    """, (*params, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0, 0, after
+    order_ids = [row[0] for row in rows]
+    ids = ", ".join(["%s"] * len(order_ids))
+    archived_at = archived_at or datetime.now().replace(microsecond=0)
+
+    cursor.execute(f"""
+        INSERT INTO orders_archive ({ORDER_COLUMNS}, archived_at)
+        SELECT {ORDER_COLUMNS}, %s FROM orders WHERE id IN ({ids})
+    """, (archived_at, *order_ids))
+    cursor.execute(f"""
+        INSERT INTO order_lines_archive ({LINE_COLUMNS})
+        SELECT {LINE_COLUMNS} FROM order_lines WHERE order_id IN ({ids})
+    """, order_ids)
+    lines = cursor.rowcount
+    cursor.execute(f"DELETE FROM order_lines WHERE order_id IN ({ids})", order_ids)
+    cursor.execute(f"DELETE FROM orders WHERE id IN ({ids})", order_ids)
+    return len(order_ids), lines, (rows[-1][1], rows[-1][0])
+
+
+# Archives everything due, batch by batch; pause seconds between batches
+# let other writers in. max_batches stops early (the rest waits for the next
+# run); progress(orders archived, elapsed_s), if given, follows every batch.
+def archive_orders(days=None, batch_size=None, pause=0.0, max_batches=None, now=None, progress=None):
+    days = settings.archive_after_days if days is None else days
+    batch_size = batch_size or settings.archive_batch_size
+    if days < 0 or batch_size <= 0:
+        raise ValueError("days must not be negative and batch_size must be positive")
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    report = {"cutoff": cutoff, "orders_archived": 0, "lines_archived": 0, "batches": 0}
+    started = time.perf_counter()
+    after = None
+
+    while max_batches is None or report["batches"] < max_batches:
+        orders, lines, after = run_transaction(lambda cursor: archive_batch(cursor, cutoff, batch_size, after))
+        if not orders:
+            break
+        report["batches"] += 1
+        report["orders_archived"] += orders
+        report["lines_archived"] += lines
+        if progress is not None:
+            progress(report["orders_archived"], time.perf_counter() - started)
+        if orders < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    report["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+# Orders in the live and archive tables
+def table_sizes():
+    sizes = {}
+    with database.borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        for table in ("orders", "order_lines", "orders_archive", "order_lines_archive"):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            sizes[table] = cursor.fetchone()[0]
+        cursor.close()
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old cancelled and delivered orders to the archive tables")
+    parser.add_argument("--days", type=int, help="retention window (default: settings.archive_after_days)")
+    parser.add_argument("--batch-size", type=int, help="orders per transaction (default: settings.archive_batch_size)")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    args = parser.parse_args(argv)
+
+    database.create_database()
+    database.apply_migrations()
+    report = archive_orders(args.days, args.batch_size, args.pause, args.max_batches)
+    print(f"✅ Archived {report['orders_archived']} orders ({report['lines_archived']} lines) placed before "
+          f"{report['cutoff']:%Y-%m-%d %H:%M} in {report['batches']} batches, {report['elapsed_s']}s.")
+    sizes = table_sizes()
+    print(f"📝 Live orders: {sizes['orders']}, archived: {sizes['orders_archive']}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
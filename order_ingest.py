@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import time
+from itertools import islice
+
+import database
+import low_stock
+import reservations
+import services
+import summaries
+from database import catalog_cache, get_backend, product_search, run_transaction
+from reservations import ReservationConflict
+
+#  Batch order ingestion from JSONL
+#
+#  Each line of the input is one order request:
+#
+#    {"user_id": "101", "product_id": 7, "quantity": 2}
+#    {"user_id": "102", "product_id": 9, "quantity": 1, "shipping_city": "Pune"}
+#
+#  shipping_city / shipping_state / shipping_pincode override the customer's
+#  address on file. Requests are taken chunk_size at a time, and each chunk
+#  is one transaction: customers and products are looked up once per chunk,
+#  every request reserves its stock with the same conditional UPDATE as
+#  checkout (so one that cannot be covered fails alone, nothing to roll
+#  back), and the lines and summary rows of all its orders go in with one
+#  statement each. Every input line gets a line in the results file, in
+#  input order: its order id, or why it was rejected.
+#
+#    python order_ingest.py orders.jsonl
+#    python order_ingest.py orders.jsonl --results placed.jsonl --chunk-size 1000
+
+SHIPPING_FIELDS = (("shipping_city", 100), ("shipping_state", 100), ("shipping_pincode", 20))
+
+
+class OrderRequestError(ValueError):
+    pass
+
+
+# Yields (line_number, record dict or the error reading it)
+def read_requests(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as err:
+                    yield line_no, OrderRequestError(f"invalid JSON: {err}")
+
+
+def _positive_int(record, key):
+    value = record.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise OrderRequestError(f"{key} must be a positive integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise OrderRequestError(f"{key} must be a positive integer") from None
+    if value <= 0:
+        raise OrderRequestError(f"{key} must be a positive integer")
+    return value
+
+
+# (user_id, product_id, quantity, {shipping overrides})
+def parse_request(record):
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise OrderRequestError("expected a JSON object")
+    user_id = record.get("user_id")
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        user_id = str(user_id)
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise OrderRequestError("user_id is required")
+    shipping = {}
+    for field, max_length in SHIPPING_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, (str, int)) or isinstance(value, bool) or not str(value).strip():
+            raise OrderRequestError(f"{field} must be a non-empty string")
+        if len(str(value).strip()) > max_length:
+            raise OrderRequestError(f"{field} is longer than {max_length} characters")
+        shipping[field] = str(value).strip()
+    return user_id.strip(), _positive_int(record, "product_id"), _positive_int(record, "quantity"), shipping
+
+
+def _lookup(cursor, sql, keys):
+    keys = sorted(set(keys))
+    if not keys:
+        return []
+    cursor.execute(sql.format(placeholders=", ".join(["%s"] * len(keys))), keys)
+    return cursor.fetchall()
+
+
+# Places the parsed requests [(index, user_id, product_id, quantity,
+# shipping)] of one chunk in the transaction of cursor; returns {index:
+# order id or error message}. Re-run from scratch if the transaction is.
+def place_chunk(cursor, requests):
+    customers = {
+        user_id.casefold(): (user_id, city, state, pincode)
+        for user_id, city, state, pincode in _lookup(
+            cursor, "SELECT user_id, city, state, pincode FROM users WHERE user_id IN ({placeholders})",
+            [request[1] for request in requests])
+    }
+    prices = dict(_lookup(cursor, "SELECT id, price FROM products WHERE id IN ({placeholders})",
+                          [request[2] for request in requests]))
+
+    outcomes = {}
+    lines = []
+    for index, user_id, product_id, quantity, shipping in requests:
+        customer = customers.get(user_id.casefold())
+        if customer is None:
+            outcomes[index] = "customer not found"
+            continue
+        if product_id not in prices:
+            outcomes[index] = "product not found"
+            continue
+        try:
+            reservations.reserve(cursor, product_id, quantity)
+        except ReservationConflict as conflict:
+            outcomes[index] = (f"only {conflict.available} in stock" if conflict.available is not None
+                               else "product not found")
+            continue
+        cursor.execute("""
+            INSERT INTO orders (user_id, status, shipping_city, shipping_state, shipping_pincode)
+            VALUES (%s, 'Placed', %s, %s, %s)
+        """, (customer[0], shipping.get("shipping_city", customer[1]), shipping.get("shipping_state", customer[2]),
+              shipping.get("shipping_pincode", customer[3])))
+        outcomes[index] = cursor.lastrowid
+        lines.append((cursor.lastrowid, product_id, quantity, prices[product_id]))
+
+    if lines:
+        cursor.execute(
+            "INSERT INTO order_lines (order_id, product_id, quantity, unit_price) VALUES "
+            + ", ".join(["(%s, %s, %s, %s)"] * len(lines)),
+            [value for line in lines for value in line],
+        )
+        order_ids = [line[0] for line in lines]
+        summaries.add_orders_sales(cursor, get_backend(), order_ids)
+        summaries.count_new_orders(cursor, get_backend(), order_ids)
+        low_stock.check(cursor, [line[1] for line in lines])
+    return outcomes
+
+
+def _results_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.results{ext or '.jsonl'}"
+
+
+def ingest_orders(path, results_path=None, chunk_size=500):
+    results_path = results_path or _results_path(path)
+    report = {
+        "lines_read": 0,
+        "orders_placed": 0,
+        "lines_rejected": 0,
+        "chunks": 0,
+        "results_path": results_path,
+    }
+    started = time.perf_counter()
+    records = read_requests(path)
+
+    with open(results_path, "w", encoding="utf-8") as out:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            report["lines_read"] += len(chunk)
+            outcomes = {}
+            requests = []
+            for index, (line_no, record) in enumerate(chunk):
+                try:
+                    requests.append((index, *parse_request(record)))
+                except OrderRequestError as err:
+                    outcomes[index] = str(err)
+            if requests:
+                try:
+                    outcomes.update(run_transaction(lambda cursor: place_chunk(cursor, requests)))
+                except database.db_error() as err:
+                    outcomes.update((request[0], f"database error: {err}") for request in requests)
+                product_ids = [request[2] for request in requests]
+                catalog_cache.invalidate_products(product_ids)
+                product_search.invalidate_products(product_ids)
+                database.note_write()
+            report["chunks"] += 1
+
+            for index, (line_no, record) in enumerate(chunk):
+                outcome = outcomes[index]
+                result = {"line": line_no}
+                if isinstance(record, dict):
+                    result.update((key, record.get(key)) for key in ("user_id", "product_id", "quantity"))
+                if isinstance(outcome, int):
+                    result.update(status="placed", order_id=outcome)
+                    report["orders_placed"] += 1
+                else:
+                    result.update(status="rejected", error=outcome)
+                    report["lines_rejected"] += 1
+                out.write(json.dumps(result) + "\n")
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 3)
+    report["orders_per_min"] = round(report["orders_placed"] / elapsed * 60, 1) if elapsed else 0.0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Place orders in bulk from a JSONL file of order requests")
+    parser.add_argument("path")
+    parser.add_argument("--results", help="per-line results file (default: <path>.results.jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="requests per transaction")
+    args = parser.parse_args(argv)
+
+    services.bootstrap()
+    report = ingest_orders(args.path, args.results, args.chunk_size)
+    print(f"✅ Placed {report['orders_placed']} of {report['lines_read']} orders "
+          f"in {report['elapsed_s']}s ({report['orders_per_min']:,} orders/min, {report['chunks']} transactions).")
+    if report["lines_rejected"]:
+        print(f"⚠️ {report['lines_rejected']} rejected; see {report['results_path']}")
+    else:
+        print(f"📝 Results written to {report['results_path']}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+import secrets
+
+#  Password hashing
+#
+#  Stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>" so the cost
+#  travels with every hash: raising the configured iteration count upgrades
+#  each user's hash the next time they log in (see needs_rehash).
+
+SCHEME = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 600_000
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS):
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1")
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+# (iterations, salt, digest), or None for anything that is not one of our hashes
+def _parse(encoded):
+    parts = str(encoded).split("$")
+    if len(parts) != 4 or parts[0] != SCHEME:
+        return None
+    try:
+        return int(parts[1]), bytes.fromhex(parts[2]), bytes.fromhex(parts[3])
+    except ValueError:
+        return None
+
+
+def is_hashed(encoded):
+    return _parse(encoded) is not None
+
+
+def verify_password(password, encoded):
+    parsed = _parse(encoded)
+    if parsed is None:
+        return False
+    iterations, salt, digest = parsed
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return hmac.compare_digest(candidate, digest)
+
+
+def needs_rehash(encoded, iterations=DEFAULT_ITERATIONS):
+    parsed = _parse(encoded)
+    return parsed is None or parsed[0] != iterations
+
+
+# Verified against when the user does not exist, so an unknown user id
+# costs as much as a wrong password
+_DUMMY = {}
+
+def dummy_hash(iterations=DEFAULT_ITERATIONS):
+    if iterations not in _DUMMY:
+        _DUMMY[iterations] = hash_password(secrets.token_hex(8), iterations)
+    return _DUMMY[iterations]
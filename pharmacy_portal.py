@@ -1,188 +1,13 @@
-from pydantic_settings import BaseSettings
-import mysql.connector
-from enum import Enum
-from datetime import datetime
-
-
-#  Load DB settings from .env
-class Settings(BaseSettings):
-    db_host: str
-    db_port: int
-    db_user: str
-    db_password: str 
-    db_name: str
-
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
-
-#  User roles
-class Role(str, Enum):
-    admin = "Admin"
-    customer = "Customer"
-
-#  MySQL connection 
-def get_connection(db=None):
-    config = {
-        "host": settings.db_host,
-        "port": settings.db_port,
-        "user": settings.db_user,
-        "password": settings.db_password,
-    }
-    if db:
-        config["database"] = db
-    return mysql.connector.connect(**config)
-
-# Create database if not exists
-def create_database():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {settings.db_name}")
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-# Create users table
-def create_users_table():
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id VARCHAR(50) NOT NULL UNIQUE,
-            password VARCHAR(255) NOT NULL,
-            role ENUM('Admin', 'Customer') NOT NULL,
-            email VARCHAR(100),
-            age INT,
-            contact_number VARCHAR(15),
-            city VARCHAR(50),
-            state VARCHAR(50),
-            pincode VARCHAR(10)
-        )
-    """)
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-#  Create products table
-def create_products_table():
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            category VARCHAR(50) NOT NULL,
-            subcategory VARCHAR(50) NOT NULL,
-            price DECIMAL(10,2) NOT NULL,
-            stock INT NOT NULL
-        )
-    """)
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-#  Create orders table
-def create_orders_table():
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT NOT NULL,
-            product_id INT NOT NULL,
-            quantity INT NOT NULL,
-            status VARCHAR(20) DEFAULT 'Placed',
-            requested_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-            shipping_city VARCHAR(100),
-            shipping_state VARCHAR(100),
-            shipping_pincode VARCHAR(20),
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (product_id) REFERENCES products(id)
-        )
-    """)
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-#  products into DB
-def populate_products():
-    # Define products grouped by category & subcategory
-    product_data = {
-        "Personal Care": {
-            "Skin Care": [
-                ("Aloe Vera Gel", 199.00, 50),
-                ("Face Wash", 149.00, 40),
-                ("Moisturizer", 299.00, 30),
-            ],
-            "Hand and Foot care": [
-                ("Hand Cream", 250.00, 25),
-                ("Foot Scrub", 270.00, 20),
-            ],
-            "Oral Care": [
-                ("Toothpaste", 99.00, 60),
-                ("Mouthwash", 199.00, 45),
-            ],
-            "Hair care": [
-                ("Shampoo", 350.00, 35),
-                ("Conditioner", 320.00, 30),
-            ],
-        },
-        "Nutrition": {
-            "Special Nutrition Needs": [
-                ("Gluten-Free Protein Bar", 120.00, 50),
-                ("Infant Formula", 450.00, 25),
-            ],
-            "Sports Nutrition": [
-                ("Whey Protein", 1500.00, 40),
-                ("Energy Drink", 99.00, 70),
-            ],
-            "Vitamins and Supplements": [
-                ("Vitamin C Tablets", 350.00, 60),
-                ("Omega 3 Capsules", 400.00, 55),
-            ],
-            "Weight Management": [
-                ("Fat Burner Capsules", 999.00, 30),
-                ("Meal Replacement Shake", 850.00, 20),
-            ],
-        },
-        "Health Care": {
-            "Diabetes Management": [
-                ("Glucometer", 1200.00, 15),
-                ("Insulin Pen", 2000.00, 10),
-            ],
-            "Health Accessories": [
-                ("Digital Thermometer", 800.00, 25),
-                ("Blood Pressure Monitor", 2500.00, 10),
-            ],
-            "Home Testing Kit": [
-                ("COVID-19 Rapid Test Kit", 500.00, 35),
-                ("Pregnancy Test Kit", 300.00, 50),
-            ],
-        },
-    }
-
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-
-    # Insert products if not already present
-    for category, subcats in product_data.items():
-        for subcat, items in subcats.items():
-            for name, price, stock in items:
-                cursor.execute("""
-                    SELECT id FROM products WHERE name=%s AND category=%s AND subcategory=%s
-                """, (name, category, subcat))
-                if cursor.fetchone():
-                    continue  # Product exists
-                cursor.execute("""
-                    INSERT INTO products (name, category, subcategory, price, stock)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (name, category, subcat, price, stock))
-    conn.commit()
-    cursor.close()
-    conn.close()
+import metrics
+import services
+from database import db_error, settings
+from reservations import CartConflict, ReservationConflict
+from services import CustomerNotFound, OrderUnavailable, ProductExists, ProductNotFound, Role
+
+#  Terminal client: prompts, menus and messages. The operations themselves
+#  live in services.py.
+
+@metrics.timed
 def add_new_product():
     print("\n🆕 Add New Product")
     name = input("Enter product name: ").strip()
@@ -192,34 +17,27 @@ def add_new_product():
     try:
         price = float(input("Enter price (e.g., 199.99): ").strip())
         stock = int(input("Enter initial stock quantity: ").strip())
+        threshold = int(input("Enter reorder threshold (0 for none): ").strip() or 0)
     except ValueError:
-        print("❌ Invalid price or stock input.")
+        print("❌ Invalid price, stock or threshold input.")
         return
 
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
+    if not (name and category and subcategory):
+        print("❌ Name, category and subcategory are required.")
+        return
 
     try:
-        # Check if product already exists
-        cursor.execute("""
-            SELECT id FROM products WHERE name = %s AND category = %s AND subcategory = %s
-        """, (name, category, subcategory))
-        if cursor.fetchone():
-            print("⚠️ Product already exists in this category/subcategory.")
-        else:
-            cursor.execute("""
-                INSERT INTO products (name, category, subcategory, price, stock)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (name, category, subcategory, price, stock))
-            conn.commit()
-            print("✅ Product added successfully.")
-    except mysql.connector.Error as err:
+        services.add_product(name, category, subcategory, price, stock, threshold)
+        print("✅ Product added successfully.")
+    except ProductExists:
+        print("⚠️ Product already exists in this category/subcategory.")
+    except ValueError as err:
+        print(f"❌ {str(err).capitalize()}.")
+    except db_error() as err:
         print(f"❌ Error adding product: {err}")
-    finally:
-        cursor.close()
-        conn.close()
 
 # Register
+@metrics.timed
 def register():
     print("\n📋 Register New User")
     role_input = input("Role (Admin/Customer): ").capitalize()
@@ -238,20 +56,11 @@ def register():
     city = input("City: ")
     state = input("State: ")
     pincode = input("Pincode: ")
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO users (user_id, password, role, email, age, contact_number, city, state, pincode)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, password, role_input, email, age, contact, city, state, pincode))
-        conn.commit()
+        services.register_user(user_id, password, role_input, email, age, contact, city, state, pincode)
         print("✅ Registered successfully.")
-    except mysql.connector.Error as err:
+    except db_error() as err:
         print(f"❌ Registration error: {err}")
-    finally:
-        cursor.close()
-        conn.close()
 
 #  Login and redirect
 def login():
@@ -259,71 +68,72 @@ def login():
     role_input = input("Role (Admin/Customer): ").capitalize()
     user_id = input("User ID: ")
     password = input("Password: ")
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM users WHERE user_id = %s AND password = %s AND role = %s
-    """, (user_id, password, role_input))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if user:
+    try:
+        token = services.login(user_id, password, role_input)
+    except db_error() as err:
+        print(f"❌ Login error: {err}")
+        return
+    if token:
+        user_id, _ = services.session_user(token)  # as registered, whatever the case typed
         print(f"✅ Login successful! Welcome {role_input} {user_id}.")
-        if role_input == Role.customer.value:
-            customer_menu(user_id)
-        else:
-            admin_menu()
+        try:
+            if role_input == Role.customer.value:
+                customer_menu(user_id, token)
+            else:
+                admin_menu(token)
+        finally:
+            services.logout(token)
     else:
         print("❌ Invalid credentials.")
 
+# Menus re-check their session token (in memory) before every choice
+def _session_expired(token):
+    if token is not None and services.session_user(token) is None:
+        print("⚠️ Session expired, please log in again.")
+        return True
+    return False
+
 #  View products by category/subcategory
+@metrics.timed
 def view_products():
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-
     # Get all unique categories
-    cursor.execute("SELECT DISTINCT LOWER(TRIM(category)) FROM products")
-    categories = [row[0] for row in cursor.fetchall()]
+    categories = services.list_categories()
 
     if not categories:
         print("⚠️ No categories available.")
         return []
 
     print("\n🛒 Categories:")
-    for i, cat in enumerate(categories, 1):
+    for i, (_, cat) in enumerate(categories, 1):
         print(f"{i}. {cat}")
+    choice = input("Select category number (or type a product name to search): ").strip()
+    if choice and not choice.isdigit():
+        return search_products(choice)
     try:
-        cat_index = int(input("Select category number: ")) - 1
-        selected_cat = categories[cat_index]
+        cat_index = int(choice) - 1
+        selected_cat_id, selected_cat = categories[cat_index]
     except (ValueError, IndexError):
         print("❌ Invalid category choice.")
         return []
 
     # Get subcategories for selected category
-    cursor.execute("SELECT DISTINCT subcategory FROM products WHERE category = %s", (selected_cat,))
-    subcategories = [row[0] for row in cursor.fetchall()]
+    subcategories = services.list_subcategories(selected_cat_id)
     if not subcategories:
         print("⚠️ No subcategories found.")
         return []
 
     print(f"\nSubcategories under {selected_cat}:")
-    for i, subcat in enumerate(subcategories, 1):
+    for i, (_, subcat) in enumerate(subcategories, 1):
         print(f"{i}. {subcat}")
     try:
         subcat_index = int(input("Select subcategory number: ")) - 1
-        selected_subcat = subcategories[subcat_index]
+        selected_subcat_id, selected_subcat = subcategories[subcat_index]
     except (ValueError, IndexError):
         print("❌ Invalid subcategory choice.")
         return []
 
     # Show products in that category & subcategory
-    cursor.execute("""
-        SELECT id, name, price, stock FROM products
-        WHERE category = %s AND subcategory = %s AND stock > 0
-    """, (selected_cat, selected_subcat))
-    products = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    products = services.list_products(selected_subcat_id, in_stock_only=True)
 
     if not products:
         print("⚠️ No products found in this category/subcategory.")
@@ -336,8 +146,23 @@ def view_products():
 
     return products
 
-# Place order
-def place_order(user_id=None):
+# In-stock products with name, category or subcategory words starting with
+# each word of text ("vit c"); returns the rows listed
+@metrics.timed
+def search_products(text):
+    products = services.search_products(text)
+    if not products:
+        print(f"⚠️ No products in stock match '{text}'.")
+        return []
+
+    print("\nMatching Products:")
+    print(f"{'ID':<5} {'Name':<30} {'Price':<10} {'Stock':<5}")
+    for prod in products:
+        print(f"{prod[0]:<5} {prod[1]:<30} {prod[2]:<10} {prod[3]:<5}")
+    return products
+
+# Add one product to the cart (product_id -> quantity) after browsing
+def _add_to_cart(cart):
     products = view_products()
     if not products:
         return
@@ -353,97 +178,85 @@ def place_order(user_id=None):
         print("⚠️ Invalid input.")
         return
 
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
-    result = cursor.fetchone()
-    if not result:
+    try:
+        product = services.add_to_cart(cart, product_id, quantity)
+        print(f"🛒 Added {quantity} x {product[1]} to cart.")
+    except ProductNotFound:
         print("❌ Product not found.")
-        cursor.close()
-        conn.close()
-        return
-    stock = result[0]
-    if stock < quantity:
-        print(f"❌ Only {stock} items in stock.")
-        cursor.close()
-        conn.close()
+    except ReservationConflict as conflict:
+        print(f"❌ Only {conflict.available} items in stock.")
+
+# Place order: fill a cart, then check it out as one transaction
+@metrics.timed
+def place_order(user_id=None):
+    cart = {}
+    while True:
+        _add_to_cart(cart)
+        if not cart or input("Add another product? (y/n): ").strip().lower() != "y":
+            break
+    if not cart:
         return
 
-    # If admin placing order, ask for customer user_id and shipping address
+    # If admin placing order, ask for customer user_id
     if user_id is None:
         user_id = input("Enter Customer User ID for placing order: ").strip()
-        # Fetch customer shipping info
-        cursor.execute("SELECT city, state, pincode FROM users WHERE user_id = %s", (user_id,))
-        cust_info = cursor.fetchone()
-        if not cust_info:
-            print("❌ Customer not found.")
-            cursor.close()
-            conn.close()
-            return
-        shipping_city, shipping_state, shipping_pincode = cust_info
-    else:
-        # For customer placing order, use their own address
-        cursor.execute("SELECT city, state, pincode FROM users WHERE user_id = %s", (user_id,))
-        shipping_city, shipping_state, shipping_pincode = cursor.fetchone()
 
     try:
-        cursor.execute("""
-            INSERT INTO orders (user_id, product_id, quantity, status, shipping_city, shipping_state, shipping_pincode)
-            VALUES (%s, %s, %s, 'Placed', %s, %s, %s)
-        """, (user_id, product_id, quantity, shipping_city, shipping_state, shipping_pincode))
-        cursor.execute("UPDATE products SET stock = stock - %s WHERE id = %s", (quantity, product_id))
-        conn.commit()
-        print("✅ Order placed successfully.")
-    except mysql.connector.Error as err:
+        order_id = services.place_order(user_id, cart)
+        print(f"✅ Order placed successfully. Order ID: {order_id}")
+    except CustomerNotFound:
+        print("❌ Customer not found.")
+    except CartConflict:
+        # Nothing was reserved; say which lines fell short
+        for product_id, product in services.shortages(cart):
+            if not product:
+                print(f"❌ Product {product_id} not found.")
+            else:
+                print(f"❌ Only {product[3]} items of {product[1]} in stock.")
+    except ReservationConflict as conflict:
+        if conflict.available is None:
+            print("❌ Product not found.")
+        else:
+            print(f"❌ Only {conflict.available} items in stock.")
+    except db_error() as err:
         print(f"❌ Error placing order: {err}")
-    finally:
-        cursor.close()
-        conn.close()
-def delete_product():
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
 
+@metrics.timed
+def delete_product():
     # Step 1: Fetch and show categories
-    cursor.execute("SELECT DISTINCT category FROM products")
-    categories = [row[0] for row in cursor.fetchall()]
+    categories = services.list_categories()
     if not categories:
         print("⚠️ No categories found.")
         return
         
     print("\n🗃️ Categories:")
-    for i, cat in enumerate(categories, 1):
+    for i, (_, cat) in enumerate(categories, 1):
         print(f"{i}. {cat}")
     try:
         cat_choice = int(input("Select category number: ")) - 1
-        selected_cat = categories[cat_choice]
+        selected_cat_id, selected_cat = categories[cat_choice]
     except (ValueError, IndexError):
         print("❌ Invalid choice.")
         return
 
     # Step 2: Fetch and show subcategories
-    cursor.execute("SELECT DISTINCT subcategory FROM products WHERE category = %s", (selected_cat,))
-    subcategories = [row[0] for row in cursor.fetchall()]
+    subcategories = services.list_subcategories(selected_cat_id)
     if not subcategories:
         print("⚠️ No subcategories found.")
         return
 
     print(f"\nSubcategories under {selected_cat}:")
-    for i, subcat in enumerate(subcategories, 1):
+    for i, (_, subcat) in enumerate(subcategories, 1):
         print(f"{i}. {subcat}")
     try:
         subcat_choice = int(input("Select subcategory number: ")) - 1
-        selected_subcat = subcategories[subcat_choice]
+        selected_subcat_id, selected_subcat = subcategories[subcat_choice]
     except (ValueError, IndexError):
         print("❌ Invalid choice.")
         return
 
     # Step 3: Fetch and show products
-    cursor.execute("""
-        SELECT id, name, price, stock FROM products
-        WHERE category = %s AND subcategory = %s
-    """, (selected_cat, selected_subcat))
-    products = cursor.fetchall()
+    products = services.list_products(selected_subcat_id)
     if not products:
         print("⚠️ No products found.")
         return
@@ -460,43 +273,32 @@ def delete_product():
         return
 
     # Confirm deletion
-    cursor.execute("SELECT name FROM products WHERE id = %s", (prod_id,))
-    product = cursor.fetchone()
+    product = services.get_product(prod_id)
     if not product:
         print("❌ Product not found.")
         return
 
-    confirm = input(f"Are you sure you want to delete '{product[0]}'? (yes/no): ").strip().lower()
+    confirm = input(f"Are you sure you want to delete '{product[1]}'? (yes/no): ").strip().lower()
     if confirm != "yes":
         print("❎ Deletion cancelled.")
         return
 
     # Delete product
     try:
-        cursor.execute("DELETE FROM products WHERE id = %s", (prod_id,))
-        conn.commit()
+        services.delete_product(prod_id)
         print("✅ Product deleted successfully.")
-    except mysql.connector.Error as err:
+    except ProductNotFound:
+        print("❌ Product not found.")
+    except db_error() as err:
         print(f"❌ Error deleting product: {err}")
-    finally:
-        cursor.close()
-        conn.close()
 
 # Update order (customer only)
+@metrics.timed
 def update_order(user_id):
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT o.id, p.name, o.quantity, o.status
-        FROM orders o JOIN products p ON o.product_id = p.id
-        WHERE o.user_id = %s AND o.status != 'Cancelled'
-    """, (user_id,))
-    orders = cursor.fetchall()
+    orders = services.active_order_lines(user_id)
 
     if not orders:
         print("You have no active orders to update.")
-        cursor.close()
-        conn.close()
         return
 
     print("\nYour Active Orders:")
@@ -508,73 +310,53 @@ def update_order(user_id):
         order_id = int(input("Enter Order ID to update: "))
     except ValueError:
         print("⚠️ Invalid Order ID.")
-        cursor.close()
-        conn.close()
         return
 
-    # Check order belongs to user and is not cancelled
-    cursor.execute("SELECT product_id, quantity, status FROM orders WHERE id = %s AND user_id = %s AND status != 'Cancelled'", (order_id, user_id))
-    order = cursor.fetchone()
-    if not order:
+    lines = [order for order in orders if order[0] == order_id]
+    if not lines:
         print("❌ Order not found or cannot be updated.")
-        cursor.close()
-        conn.close()
         return
+    if len(lines) > 1:
+        print(f"\nLines of order {order_id}:")
+        for i, line in enumerate(lines, 1):
+            print(f"{i}. {line[1]} (quantity {line[2]})")
+        try:
+            line = lines[int(input("Select line number: ")) - 1]
+        except (ValueError, IndexError):
+            print("❌ Invalid line choice.")
+            return
+    else:
+        line = lines[0]
 
-    product_id, old_quantity, status = order
+    _, _, old_quantity, _, product_id = line
     print(f"Current quantity: {old_quantity}")
     try:
         new_quantity = int(input("Enter new quantity: "))
         if new_quantity <= 0:
             print("⚠️ Quantity must be positive.")
-            cursor.close()
-            conn.close()
             return
     except ValueError:
         print("⚠️ Invalid quantity.")
-        cursor.close()
-        conn.close()
         return
 
-    # Check stock availability difference
-    diff = new_quantity - old_quantity
-    if diff > 0:
-        cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
-        stock = cursor.fetchone()[0]
-        if stock < diff:
-            print(f"❌ Only {stock} items left in stock.")
-            cursor.close()
-            conn.close()
-            return
-
     try:
-        # Update order quantity
-        cursor.execute("UPDATE orders SET quantity = %s, status = 'Updated' WHERE id = %s", (new_quantity, order_id))
-        # Update stock accordingly
-        cursor.execute("UPDATE products SET stock = stock - %s WHERE id = %s", (diff, product_id))
-        conn.commit()
+        # Rejected if the line changed since it was listed above
+        services.update_order_line(user_id, order_id, product_id, new_quantity, expected_quantity=old_quantity)
         print("✅ Order updated successfully.")
-    except mysql.connector.Error as err:
+    except OrderUnavailable:
+        print("❌ Order not found or cannot be updated.")
+    except ReservationConflict as conflict:
+        print(f"❌ Only {conflict.available} items left in stock.")
+    except db_error() as err:
         print(f"❌ Error updating order: {err}")
-    finally:
-        cursor.close()
-        conn.close()
 
 # Cancel order (customer only)
+@metrics.timed
 def cancel_order(user_id):
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT o.id, p.name, o.quantity, o.status
-        FROM orders o JOIN products p ON o.product_id = p.id
-        WHERE o.user_id = %s AND o.status != 'Cancelled'
-    """, (user_id,))
-    orders = cursor.fetchall()
+    orders = services.active_order_lines(user_id)
 
     if not orders:
         print("You have no active orders to cancel.")
-        cursor.close()
-        conn.close()
         return
 
     print("\nYour Active Orders:")
@@ -586,67 +368,138 @@ def cancel_order(user_id):
         order_id = int(input("Enter Order ID to cancel: "))
     except ValueError:
         print("⚠️ Invalid Order ID.")
-        cursor.close()
-        conn.close()
-        return
-
-    cursor.execute("SELECT product_id, quantity, status FROM orders WHERE id = %s AND user_id = %s AND status != 'Cancelled'", (order_id, user_id))
-    order = cursor.fetchone()
-    if not order:
-        print("❌ Order not found or already cancelled.")
-        cursor.close()
-        conn.close()
         return
 
-    product_id, quantity, status = order
     try:
-        cursor.execute("UPDATE orders SET status = 'Cancelled' WHERE id = %s", (order_id,))
-        cursor.execute("UPDATE products SET stock = stock + %s WHERE id = %s", (quantity, product_id))
-        conn.commit()
+        services.cancel_order(user_id, order_id)
         print("✅ Order cancelled successfully.")
-    except mysql.connector.Error as err:
+    except OrderUnavailable:
+        print("❌ Order not found or already cancelled.")
+    except db_error() as err:
         print(f"❌ Error cancelling order: {err}")
-    finally:
-        cursor.close()
-        conn.close()
-
-# View orders (both customer & admin)
-def view_orders(user_id=None, admin=False):
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
 
+# View orders (both customer & admin); include_archived adds the archived
+# history (order_archive.py)
+@metrics.timed
+def view_orders(user_id=None, admin=False, status=None, since=None, until=None, include_archived=False):
+    # Orders with several lines print the rest of them on rows of their own
     if admin:
-        cursor.execute("""
-            SELECT o.id, o.user_id, p.name, o.quantity, o.status, o.requested_date, o.shipping_city, o.shipping_state, o.shipping_pincode
-            FROM orders o JOIN products p ON o.product_id = p.id
-            ORDER BY o.requested_date DESC
-        """)
-        orders = cursor.fetchall()
         print("\nAll Orders:")
         print(f"{'Order ID':<10} {'User ID':<15} {'Product':<30} {'Qty':<5} {'Status':<10} {'Date':<20} {'Shipping Address':<30}")
-        for order in orders:
+        for order in services.iter_orders(None, status, since, until, include_archived=include_archived):
             shipping = f"{order[6]}, {order[7]}, {order[8]}"
-            print(f"{order[0]:<10} {order[1]:<15} {order[2]:<30} {order[3]:<5} {order[4]:<10} {order[5].strftime('%Y-%m-%d %H:%M'):<20} {shipping:<30}")
+            (product, quantity), *more = order[2] or [("", 0)]
+            print(f"{order[0]:<10} {order[1]:<15} {product:<30} {quantity:<5} {order[4]:<10} {order[5].strftime('%Y-%m-%d %H:%M'):<20} {shipping:<30}")
+            for product, quantity in more:
+                print(f"{'':<10} {'':<15} {product:<30} {quantity:<5}")
     else:
-        cursor.execute("""
-            SELECT o.id, p.name, o.quantity, o.status, o.requested_date, o.shipping_city, o.shipping_state, o.shipping_pincode
-            FROM orders o JOIN products p ON o.product_id = p.id
-            WHERE o.user_id = %s
-            ORDER BY o.requested_date DESC
-        """, (user_id,))
-        orders = cursor.fetchall()
-        print("\nYour Orders:")
+        print("\nYour Order History:" if include_archived else "\nYour Orders:")
         print(f"{'Order ID':<10} {'Product':<30} {'Qty':<5} {'Status':<10} {'Date':<20} {'Shipping Address':<30}")
-        for order in orders:
-            shipping = f"{order[5]}, {order[6]}, {order[7]}"
-            print(f"{order[0]:<10} {order[1]:<30} {order[2]:<5} {order[3]:<10} {order[4].strftime('%Y-%m-%d %H:%M'):<20} {shipping:<30}")
+        for order in services.iter_orders(user_id, status, since, until, include_archived=include_archived):
+            shipping = f"{order[6]}, {order[7]}, {order[8]}"
+            (product, quantity), *more = order[2] or [("", 0)]
+            print(f"{order[0]:<10} {product:<30} {quantity:<5} {order[4]:<10} {order[5].strftime('%Y-%m-%d %H:%M'):<20} {shipping:<30}")
+            for product, quantity in more:
+                print(f"{'':<10} {product:<30} {quantity:<5}")
+
+# Sales report (admin only), from the summary tables
+@metrics.timed
+def sales_report():
+    try:
+        days = int(input("Days to report (default 7): ").strip() or 7)
+        if days <= 0:
+            print("⚠️ Days must be positive.")
+            return
+    except ValueError:
+        print("⚠️ Invalid number of days.")
+        return
 
-    cursor.close()
-    conn.close()
+    try:
+        report = services.sales_report(days)
+    except db_error() as err:
+        print(f"❌ Error reading sales report: {err}")
+        return
+
+    print("\nOrders by Status:")
+    for status, count in report["statuses"]:
+        print(f"{status:<12} {count}")
+    print(f"\n📈 Sales by Category since {report['since']}:")
+    print(f"{'Day':<12} {'Category':<30} {'Units':<8} {'Revenue':<12}")
+    for day, category, units, revenue in report["categories"]:
+        print(f"{str(day)[:10]:<12} {category:<30} {units:<8} {float(revenue):<12.2f}")
+    print(f"\nTop Products since {report['since']}:")
+    print(f"{'ID':<5} {'Product':<30} {'Units':<8} {'Revenue':<12}")
+    for product_id, name, units, revenue in report["products"]:
+        print(f"{product_id:<5} {name:<30} {units:<8} {float(revenue):<12.2f}")
+
+# Low-stock watchlist (admin only), then optionally change a threshold
+@metrics.timed
+def view_low_stock():
+    try:
+        rows = services.low_stock_watchlist()
+    except db_error() as err:
+        print(f"❌ Error reading low stock: {err}")
+        return
+
+    if rows:
+        print("\n📉 Below Reorder Threshold:")
+        print(f"{'ID':<5} {'Product':<30} {'Stock':<7} {'Threshold':<10} {'Since':<20}")
+        for product_id, name, stock, threshold, since in rows:
+            print(f"{product_id:<5} {name:<30} {stock:<7} {threshold:<10} {str(since)[:16]:<20}")
+    else:
+        print("✅ No product is below its reorder threshold.")
+
+    choice = input("Product ID to set a reorder threshold for (Enter to go back): ").strip()
+    if not choice:
+        return
+    try:
+        product_id = int(choice)
+        threshold = int(input("New reorder threshold (0 for none): ").strip())
+    except ValueError:
+        print("⚠️ Invalid number.")
+        return
+
+    try:
+        alerts = services.set_reorder_threshold(product_id, threshold)
+        print("✅ Reorder threshold updated.")
+        for _, kind in alerts:
+            print("⚠️ Product is now below its threshold." if kind == "low" else "✅ Product left the watchlist.")
+    except ProductNotFound:
+        print("❌ Product not found.")
+    except ValueError as err:
+        print(f"❌ {str(err).capitalize()}.")
+    except db_error() as err:
+        print(f"❌ Error updating threshold: {err}")
+
+# Move old cancelled / delivered orders to the archive (admin only)
+@metrics.timed
+def archive_orders():
+    default = settings.archive_after_days
+    try:
+        days = int(input(f"Archive cancelled/delivered orders older than how many days (default {default}): ").strip()
+                   or default)
+        if days < 0:
+            print("⚠️ Days must not be negative.")
+            return
+    except ValueError:
+        print("⚠️ Invalid number of days.")
+        return
+
+    try:
+        report = services.archive_orders(days)
+    except db_error() as err:
+        print(f"❌ Error archiving orders: {err}")
+        return
+    if report["orders_archived"]:
+        print(f"✅ Archived {report['orders_archived']} orders placed before {report['cutoff']:%Y-%m-%d}.")
+    else:
+        print(f"✅ No orders to archive from before {report['cutoff']:%Y-%m-%d}.")
 
 # Customer menu
-def customer_menu(user_id):
+def customer_menu(user_id, token=None):
     while True:
+        if _session_expired(token):
+            break
         print("""
 Customer Menu:
 1. 🔎👀 View Products
@@ -654,7 +507,8 @@ Customer Menu:
 3. ⏩ Update Order
 4. ❎ Cancel Order
 5. 👁‍🗨 View My Orders
-6. 🔒👋 Logout
+6. 📜 Order History (incl. archived)
+7. 🔒👋 Logout
         """)
         choice = input("Enter choice: ").strip()
         if choice == "1":
@@ -668,50 +522,46 @@ Customer Menu:
         elif choice == "5":
             view_orders(user_id)
         elif choice == "6":
+            view_orders(user_id, include_archived=True)
+        elif choice == "7":
             print("Logging out...")
             break
         else:
             print("Invalid choice, try again.")
+@metrics.timed
 def admin_view_order_by_id():
     order_id = input("Enter the Order ID to view: ").strip()
-    
-    conn = get_connection(settings.db_name)
-    cursor = conn.cursor()
-    
+
     try:
-        cursor.execute("""
-            SELECT o.id, o.user_id, p.name, o.quantity, o.status, o.requested_date, o.shipping_city, o.shipping_state, o.shipping_pincode
-            FROM orders o JOIN products p ON o.product_id = p.id
-            WHERE o.id = %s
-        """, (order_id,))
-        
-        order = cursor.fetchone()
-        
-        if order:
-            (order_id, user_id, product_name, quantity, status, 
-             requested_date, shipping_city, shipping_state, shipping_pincode) = order
-             
-            print("\nOrder Details:")
-            print(f"Order ID        : {order_id}")
-            print(f"User ID         : {user_id}")
+        found = services.get_order(order_id)
+    except db_error() as err:
+        print(f"❌ Error fetching order details: {err}")
+        return
+
+    if found:
+        order, lines = found
+        (order_id, user_id, status,
+         requested_date, shipping_city, shipping_state, shipping_pincode) = order
+
+        print("\nOrder Details:")
+        print(f"Order ID        : {order_id}")
+        print(f"User ID         : {user_id}")
+        for product_name, quantity in lines:
             print(f"Product Name    : {product_name}")
             print(f"Quantity        : {quantity}")
-            print(f"Status          : {status}")
-            print(f"Requested Date  : {requested_date.strftime('%Y-%m-%d %H:%M:%S') if requested_date else 'N/A'}")
-            print(f"Shipping City   : {shipping_city if shipping_city else 'N/A'}")
-            print(f"Shipping State  : {shipping_state if shipping_state else 'N/A'}")
-            print(f"Shipping Pincode: {shipping_pincode if shipping_pincode else 'N/A'}")
-        else:
-            print("❌ No order found with that Order ID.")
-    except mysql.connector.Error as err:
-        print(f"❌ Error fetching order details: {err}")
-    finally:
-        cursor.close()
-        conn.close()
+        print(f"Status          : {status}")
+        print(f"Requested Date  : {requested_date.strftime('%Y-%m-%d %H:%M:%S') if requested_date else 'N/A'}")
+        print(f"Shipping City   : {shipping_city if shipping_city else 'N/A'}")
+        print(f"Shipping State  : {shipping_state if shipping_state else 'N/A'}")
+        print(f"Shipping Pincode: {shipping_pincode if shipping_pincode else 'N/A'}")
+    else:
+        print("❌ No order found with that Order ID.")
 
 # Admin menu
-def admin_menu():
+def admin_menu(token=None):
     while True:
+        if _session_expired(token):
+            break
         print("""
 Admin Menu:
 1. 🕵🏼🔎 View Products
@@ -720,7 +570,10 @@ Admin Menu:
 4. 👩🏻‍💻 Register New User
 5. 📩 Add New Product
 6. 🗑 Delete Product
-7. 🔒 Logout
+7. 📊 Sales Report
+8. 📉 Low Stock
+9. 🗄 Archive Old Orders
+10. 🔒 Logout
         """)
         choice = input("Enter choice: ").strip()
         if choice == "1":
@@ -736,6 +589,12 @@ Admin Menu:
         elif choice == "6":
             delete_product()
         elif choice == "7":
+            sales_report()
+        elif choice == "8":
+            view_low_stock()
+        elif choice == "9":
+            archive_orders()
+        elif choice == "10":
             print("Logging out...")
             break
         else:
@@ -744,11 +603,8 @@ Admin Menu:
 # Initial setup and main loop
 def main():
     print("***WELCOME TO 💊 PHARMACY 🧬 STORE ***")
-    create_database()
-    create_users_table()
-    create_products_table()
-    create_orders_table()
-    populate_products()
+    services.bootstrap()
+    services.warm_search_index()
 
     while True:
         print("""
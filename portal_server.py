@@ -0,0 +1,421 @@
+import argparse
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import database
+import metrics
+import services
+from db_pool import PoolTimeout
+from idempotency import IdempotencyKeyReused
+from reservations import ReservationConflict
+from services import CustomerNotFound, OrderUnavailable, ProductNotFound, Role
+
+#  JSON-over-HTTP front end for kiosks
+#
+#  Standard library only. Requests are served by a fixed pool of worker
+#  threads (sized to the connection pool by default) over HTTP/1.1
+#  keep-alive; every response carries Server-Timing / X-Response-Time-Ms.
+#
+#  Orders need "Authorization: Bearer <token>" from POST /sessions.
+#  Customers read and change their own orders only; admins name the
+#  customer in user_id, and may list everyone's orders or fetch any one.
+#  With an "Idempotency-Key: <key>" header, a retried order change answers
+#  what the first attempt did instead of doing it again.
+#
+#    POST   /sessions              {"user_id", "password", "role"}
+#    DELETE /sessions
+#    GET    /categories
+#    GET    /categories/<id>/subcategories
+#    GET    /subcategories/<id>/products[?in_stock=1]
+#    GET    /products?q=<words>[&limit=&in_stock=]
+#    GET    /products/<id>
+#    POST   /orders                {["user_id",] "items": [{"product_id", "quantity"}]}
+#    GET    /orders[?user_id=&status=&since=&until=&after=&limit=&archived=1]
+#    GET    /orders/<id>
+#    PATCH  /orders/<id>           {["user_id",] "product_id", "quantity"[, "expected_quantity"]}
+#    POST   /orders/<id>/cancel    {["user_id"]}
+#    GET    /metrics               Prometheus text, with settings.metrics_enabled
+#
+#    python portal_server.py --port 8080 --workers 16
+
+log = logging.getLogger("portal_server")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, **details):
+        self.status = status
+        self.body = {"error": message, **details}
+        super().__init__(message)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _product(row):
+    return {"id": row[0], "name": row[1], "price": row[2], "stock": row[3]}
+
+
+def _order(row):
+    order_id, user_id, lines, quantity, status, requested_date, city, state, pincode = row
+    return {
+        "id": order_id,
+        "user_id": user_id,
+        "items": [{"product": name, "quantity": qty} for name, qty in lines],
+        "quantity": quantity,
+        "status": status,
+        "requested_date": requested_date,
+        "shipping": {"city": city, "state": state, "pincode": pincode},
+    }
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer") from None
+
+
+def _datetime(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an ISO date/time") from None
+
+
+def _required(body, name):
+    if name not in body:
+        raise HTTPError(400, f"missing field {name!r}")
+    return body[name]
+
+
+# The customer an order change acts for: the session's own user, or the
+# user_id an admin session names
+def _acting_user(session, body):
+    if session is None:
+        raise HTTPError(401, "login required")
+    _, user_id, role = session
+    if role == Role.admin.value:
+        return str(_required(body, "user_id"))
+    if str(body.get("user_id", user_id)) != user_id:
+        raise HTTPError(403, "customers can only change their own orders")
+    return user_id
+
+
+# Whose orders a read may see: the session's own user for customers; for
+# admins the user_id they name, or None for everyone's
+def _viewing_user(session, query):
+    if session is None:
+        raise HTTPError(401, "login required")
+    _, user_id, role = session
+    if role == Role.admin.value:
+        return query.get("user_id")
+    if query.get("user_id", user_id) != user_id:
+        raise HTTPError(403, "customers can only see their own orders")
+    return user_id
+
+
+#  Route handlers: (path params, query dict, JSON body, session) -> (status, payload);
+#  session is (token, user_id, role) or None
+def create_session(query, body, session):
+    token = services.login(str(_required(body, "user_id")), str(_required(body, "password")),
+                           str(_required(body, "role")).capitalize())
+    if token is None:
+        raise HTTPError(401, "invalid credentials")
+    return 201, {"token": token, "expires_in": database.settings.session_ttl}
+
+
+def delete_session(query, body, session):
+    if session is not None:
+        services.logout(session[0])
+    return 200, {}
+
+
+# Plain text rather than JSON: the response body is this string as-is
+def get_metrics(query, body, session):
+    registry = metrics.registry()
+    if registry is None:
+        raise HTTPError(404, "metrics are off (settings.metrics_enabled)")
+    return 200, registry.prometheus_text()
+
+
+def list_categories(query, body, session):
+    return 200, [{"id": cid, "name": name} for cid, name in services.list_categories()]
+
+
+def list_subcategories(category_id, query, body, session):
+    return 200, [{"id": sid, "name": name} for sid, name in services.list_subcategories(_int(category_id, "id"))]
+
+
+def list_products(subcategory_id, query, body, session):
+    in_stock = query.get("in_stock", "0") not in ("0", "false", "")
+    return 200, [_product(row) for row in services.list_products(_int(subcategory_id, "id"), in_stock)]
+
+
+def search_products(query, body, session):
+    text = query.get("q", "").strip()
+    if not text:
+        raise HTTPError(400, "q is required")
+    limit = _int(query.get("limit", 20), "limit")
+    if not 0 < limit <= 100:
+        raise HTTPError(400, "limit must be between 1 and 100")
+    in_stock = query.get("in_stock", "1") not in ("0", "false", "")
+    return 200, [_product(row) for row in services.search_products(text, limit, in_stock)]
+
+
+def get_product(product_id, query, body, session):
+    product = services.get_product(_int(product_id, "id"))
+    if not product:
+        raise HTTPError(404, "product not found")
+    return 200, _product(product)
+
+
+def place_order(query, body, session):
+    user_id = _acting_user(session, body)
+    items = _required(body, "items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPError(400, "items must be a list of objects")
+    cart = [(_int(item.get("product_id"), "product_id"), _int(item.get("quantity"), "quantity")) for item in items]
+    try:
+        order_id = services.place_order(user_id, cart, idempotency_key=body.get("idempotency_key"))
+    except ReservationConflict:  # CartConflict too: re-read which lines are short
+        short = [{"product_id": pid, "available": product[3] if product else None}
+                 for pid, product in services.shortages(cart)]
+        raise HTTPError(409, "not enough stock", shortages=short) from None
+    return 201, {"order_id": order_id}
+
+
+def list_orders(query, body, session):
+    after = None
+    if "after" in query:
+        after_date, _, after_id = query["after"].rpartition(",")
+        after = (_datetime(after_date, "after"), _int(after_id, "after"))
+    rows, next_after = services.fetch_orders_page(
+        user_id=_viewing_user(session, query),
+        status=query.get("status"),
+        since=_datetime(query["since"], "since") if "since" in query else None,
+        until=_datetime(query["until"], "until") if "until" in query else None,
+        after=after,
+        limit=min(_int(query.get("limit", database.settings.order_page_size), "limit"), 1000),
+        include_archived=query.get("archived", "0") not in ("0", "false", ""),
+    )
+    token = f"{next_after[0].isoformat()},{next_after[1]}" if next_after else None
+    return 200, {"orders": [_order(row) for row in rows], "next_after": token}
+
+
+def get_order(order_id, query, body, session):
+    viewer = _viewing_user(session, {})
+    found = services.get_order(_int(order_id, "id"), user_id=viewer)
+    # Another customer's order looks like no order at all
+    if not found or (viewer is not None and str(found[0][1]) != viewer):
+        raise HTTPError(404, "order not found")
+    (order_id, user_id, status, requested_date, city, state, pincode), lines = found
+    return 200, _order((order_id, user_id, lines, sum(q for _, q in lines), status, requested_date,
+                        city, state, pincode))
+
+
+def update_order(order_id, query, body, session):
+    expected = body.get("expected_quantity")
+    services.update_order_line(
+        _acting_user(session, body),
+        _int(order_id, "id"),
+        _int(_required(body, "product_id"), "product_id"),
+        _int(_required(body, "quantity"), "quantity"),
+        expected_quantity=None if expected is None else _int(expected, "expected_quantity"),
+        idempotency_key=body.get("idempotency_key"),
+    )
+    return 200, {"order_id": int(order_id)}
+
+
+def cancel_order(order_id, query, body, session):
+    product_ids = services.cancel_order(_acting_user(session, body), _int(order_id, "id"),
+                                        idempotency_key=body.get("idempotency_key"))
+    return 200, {"order_id": int(order_id), "released_products": product_ids}
+
+
+ROUTES = [
+    ("POST", re.compile(r"^/sessions$"), create_session),
+    ("DELETE", re.compile(r"^/sessions$"), delete_session),
+    ("GET", re.compile(r"^/metrics$"), get_metrics),
+    ("GET", re.compile(r"^/categories$"), list_categories),
+    ("GET", re.compile(r"^/categories/([^/]+)/subcategories$"), list_subcategories),
+    ("GET", re.compile(r"^/subcategories/([^/]+)/products$"), list_products),
+    ("GET", re.compile(r"^/products$"), search_products),
+    ("GET", re.compile(r"^/products/([^/]+)$"), get_product),
+    ("POST", re.compile(r"^/orders$"), place_order),
+    ("GET", re.compile(r"^/orders$"), list_orders),
+    ("GET", re.compile(r"^/orders/([^/]+)$"), get_order),
+    ("PATCH", re.compile(r"^/orders/([^/]+)$"), update_order),
+    ("POST", re.compile(r"^/orders/([^/]+)/cancel$"), cancel_order),
+]
+
+
+def dispatch(method, path, query, body, token=None, idempotency_key=None):
+    if idempotency_key is not None:
+        body = dict(body, idempotency_key=idempotency_key)
+    session = None
+    if token is not None:
+        user = services.session_user(token)
+        if user is None:
+            raise HTTPError(401, "session expired or unknown, log in again")
+        session = (token, *user)
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if not match:
+            continue
+        if route_method != method:
+            allowed = True
+            continue
+        try:
+            return handler(*match.groups(), query, body, session)
+        except HTTPError:
+            raise
+        except (CustomerNotFound, ProductNotFound) as err:
+            raise HTTPError(404, f"{type(err).__name__}: {err}") from None
+        except OrderUnavailable:
+            raise HTTPError(409, "order not found, cancelled or changed meanwhile") from None
+        except IdempotencyKeyReused as err:
+            raise HTTPError(422, str(err)) from None
+        except ReservationConflict as conflict:
+            raise HTTPError(409, "not enough stock", product_id=conflict.product_id,
+                            requested=conflict.requested, available=conflict.available) from None
+        except ValueError as err:
+            raise HTTPError(400, str(err)) from None
+        except PoolTimeout:
+            raise HTTPError(503, "server busy, try again") from None
+        except database.db_error() as err:
+            raise HTTPError(500, f"database error: {err}") from None
+    if allowed:
+        raise HTTPError(405, f"{method} not allowed on {path}")
+    raise HTTPError(404, f"no route for {path}")
+
+
+class PortalRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive by default
+    server_version = "PharmacyPortal/1.0"
+    timeout = 5  # an idle keep-alive connection gives its worker back after this
+    disable_nagle_algorithm = True  # headers and body are separate writes: no delayed-ACK stall
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            status, payload = dispatch(method, url.path, query, self._read_body(), self._token(),
+                                       self.headers.get("Idempotency-Key"))
+        except HTTPError as err:
+            status, payload = err.status, err.body
+        except Exception:
+            # Still a response: the client must not see the connection drop
+            log.exception("%s %s failed", method, url.path)
+            status, payload = 500, {"error": "internal server error"}
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            data, content_type = json.dumps(payload, default=_json_default).encode(), "application/json"
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Server-Timing", f"app;dur={elapsed_ms:.2f}")
+        self.send_header("X-Response-Time-Ms", f"{elapsed_ms:.2f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _token(self):
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # no telling where this request's body ends
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+        return body
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# HTTPServer whose connections are handled by a bounded worker pool
+class PortalHTTPServer(HTTPServer):
+    def __init__(self, address, workers=None, verbose=False):
+        super().__init__(address, PortalRequestHandler)
+        self.workers = workers or database.pool_capacity(database.settings.db_name)
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pharmacy portal JSON/HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, help="worker threads (default: connection pool capacity)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    services.bootstrap()
+    services.warm_search_index()
+    server = PortalHTTPServer((args.host, args.port), workers=args.workers, verbose=args.verbose)
+    print(f"✅ Serving on http://{args.host}:{server.server_address[1]} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(" 🙏 Shutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
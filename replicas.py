@@ -0,0 +1,109 @@
+import threading
+import time
+
+#  Read replica routing
+#
+#  Reads that can tolerate replication lag borrow from one of the replicas,
+#  round-robin; everything else stays on the primary. A replica whose
+#  connection fails (connect error, failed pre-ping, pool timeout) is skipped
+#  for retry_interval seconds and then tried again on its turn; with none
+#  available reads fall back to the primary.
+#
+#  Read-your-own-writes: after a write, reads for the same user_id go to the
+#  primary for sticky_seconds, long enough for the replicas to catch up. Reads
+#  that are not for one user (admin listings, reports) look at the writing
+#  thread instead, which covers a console session and its admin.
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, retry_interval=5.0, sticky_seconds=5.0, max_writers=10000, clock=time.monotonic):
+        if not replicas:
+            raise ValueError("a replica router needs at least one replica")
+        self._replicas = [Replica(name, pool) for name, pool in replicas]
+        self.retry_interval = retry_interval
+        self.sticky_seconds = sticky_seconds
+        self.max_writers = max_writers
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next = 0
+        self._writers = {}  # user_id -> until when their reads stay on the primary
+        self._stats = {"sticky_reads": 0, "fallbacks": 0}
+
+    # Someone just wrote: this thread's reads, and user_id's, go to the primary
+    # for sticky_seconds
+    def note_write(self, user_id=None):
+        until = self._clock() + self.sticky_seconds
+        self._local.until = until
+        if user_id is None:
+            return
+        with self._lock:
+            self._writers[str(user_id).casefold()] = until
+            if len(self._writers) > self.max_writers:
+                now = self._clock()
+                self._writers = {key: value for key, value in self._writers.items() if value > now}
+
+    def _sticky(self, user_id):
+        now = self._clock()
+        if user_id is None:
+            return getattr(self._local, "until", 0.0) > now
+        with self._lock:
+            return self._writers.get(str(user_id).casefold(), 0.0) > now
+
+    # The next healthy replica in turn, or None
+    def _pick(self):
+        now = self._clock()
+        with self._lock:
+            for _ in range(len(self._replicas)):
+                replica = self._replicas[self._next]
+                self._next = (self._next + 1) % len(self._replicas)
+                if replica.down_until <= now:
+                    return replica
+        return None
+
+    # A pooled replica connection for a read on behalf of user_id, or None
+    # when it has to go to the primary
+    def acquire(self, user_id=None):
+        if self._sticky(user_id):
+            with self._lock:
+                self._stats["sticky_reads"] += 1
+            return None
+        for _ in range(len(self._replicas)):
+            replica = self._pick()
+            if replica is None:
+                break
+            try:
+                conn = replica.pool.acquire()
+            except Exception:
+                with self._lock:
+                    replica.failures += 1
+                    replica.down_until = self._clock() + self.retry_interval
+                continue
+            with self._lock:
+                replica.reads += 1
+            return conn
+        with self._lock:
+            self._stats["fallbacks"] += 1
+        return None
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["replicas"] = [
+                {"name": r.name, "reads": r.reads, "failures": r.failures, "healthy": r.down_until <= now}
+                for r in self._replicas
+            ]
+        return snapshot
+
+    def dispose(self):
+        for replica in self._replicas:
+            replica.pool.dispose()
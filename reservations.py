@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+
+from statements import hot
+
+#  Stock reservation engine
+#
+#  Stock is only ever decremented by a conditional UPDATE that succeeds when
+#  enough units remain, so the check and the decrement are one atomic
+#  statement and concurrent buyers cannot oversell. The caller writes the
+#  order row in the same transaction; run_in_transaction() commits it, or
+#  rolls back and retries when the server reports a deadlock.
+
+_stats_lock = threading.Lock()
+_stats = {
+    "reserved": 0,
+    "conflicts": 0,
+    "released": 0,
+    "retries": 0,
+    "failed_transactions": 0,
+}
+
+
+def _bump(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+# Not enough stock (available is None when the product does not exist)
+class ReservationConflict(Exception):
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"product {product_id}: requested {requested}, available {available}")
+
+
+# Not enough stock for one or more lines of a multi-line reservation. The
+# statement cannot say which line fell short, and the caller rolls back
+# anyway, so callers re-read stock afterwards to explain it.
+class CartConflict(ReservationConflict):
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__(None, sum(quantity for _, quantity in lines), None)
+
+
+# "CASE id WHEN %s THEN %s ... END" and its parameters, for per-row quantities
+def quantity_case(lines):
+    sql = "CASE id " + " ".join(["WHEN %s THEN %s"] * len(lines)) + " END"
+    return sql, [value for line in lines for value in line]
+
+
+RESERVE_STOCK = hot("reserve_stock", "UPDATE products SET stock = stock - %s WHERE id = %s AND stock >= %s")
+STOCK_BY_ID = hot("stock_by_id", "SELECT stock FROM products WHERE id = %s")
+RELEASE_STOCK = hot("release_stock", "UPDATE products SET stock = stock + %s WHERE id = %s")
+
+
+def reserve(cursor, product_id, quantity):
+    cursor.execute(RESERVE_STOCK, (quantity, product_id, quantity))
+    if cursor.rowcount == 1:
+        _bump("reserved")
+        return
+    # Only the losing path pays for a second round trip, to explain why
+    _bump("conflicts")
+    cursor.execute(STOCK_BY_ID, (product_id,))
+    row = cursor.fetchone()
+    raise ReservationConflict(product_id, quantity, row[0] if row else None)
+
+
+def release(cursor, product_id, quantity):
+    cursor.execute(RELEASE_STOCK, (quantity, product_id))
+    _bump("released")
+
+
+# Reserves every (product_id, quantity) line with one statement, all or
+# nothing. Rows are locked in primary key order, so two carts sharing
+# products queue behind each other instead of deadlocking.
+def reserve_many(cursor, lines):
+    lines = sorted(lines)
+    if len(lines) == 1:
+        return reserve(cursor, *lines[0])
+    case, case_params = quantity_case(lines)
+    ids = [product_id for product_id, _ in lines]
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(
+        f"UPDATE products SET stock = stock - {case} WHERE id IN ({placeholders}) AND stock >= {case}",
+        case_params + ids + case_params,
+    )
+    if cursor.rowcount == len(lines):
+        _bump("reserved", len(lines))
+        return
+    _bump("conflicts")
+    raise CartConflict(lines)
+
+
+def release_many(cursor, lines):
+    lines = sorted(lines)
+    case, case_params = quantity_case(lines)
+    placeholders = ", ".join(["%s"] * len(lines))
+    cursor.execute(f"UPDATE products SET stock = stock + {case} WHERE id IN ({placeholders})",
+                   case_params + [product_id for product_id, _ in lines])
+    _bump("released", len(lines))
+
+
+# Runs work(cursor) and commits; retries the whole unit on deadlocks
+def run_in_transaction(conn, work, is_retryable, retries=3, backoff=0.005):
+    attempt = 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            result = work(cursor)
+            conn.commit()
+            return result
+        except Exception as err:
+            conn.rollback()
+            if attempt < retries and is_retryable(err):
+                attempt += 1
+                _bump("retries")
+                time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+                continue
+            if not isinstance(err, ReservationConflict):
+                _bump("failed_transactions")
+            raise
+        finally:
+            cursor.close()
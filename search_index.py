@@ -0,0 +1,200 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+#  In-memory product search: token and prefix match on name, category and
+#  subcategory
+#
+#  load_all() and load_products(ids) return the catalog cache's rows, (id,
+#  category_id, category, subcategory_id, subcategory, name, price, stock).
+#  The index keeps, per token, the ascending ids of the products that have
+#  it, plus the sorted list of all tokens so a prefix is a bisect away.
+#  A query matches products that have, for every one of its words, some
+#  token starting with that word ("vit c" finds "Vitamin C Tablets"); they
+#  come back in id order, so a search stops as soon as it has limit rows,
+#  and intersecting the words' lists skips by bisect rather than visiting
+#  every product one word matches.
+#
+#  Like the catalog cache, writes only mark ids stale (stock changed, added,
+#  deleted); the next search re-reads those rows, one query per 500.
+#  invalidate() drops the whole index, rebuilt on next use (or by warm()).
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.casefold())
+
+
+# The smallest id at or after pid in any of lists (a word's posting lists),
+# moving positions up to it; None when they have no more
+def _next_id(lists, positions, pid):
+    best = None
+    for n, ids in enumerate(lists):
+        i = positions[n] = bisect_left(ids, pid, positions[n])
+        if i < len(ids) and (best is None or ids[i] < best):
+            best = ids[i]
+    return best
+
+
+class ProductSearchIndex:
+    def __init__(self, load_all, load_products):
+        self._load_all = load_all
+        self._load_products = load_products
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._built = False
+        self._postings = {}  # token -> ascending product ids
+        self._tokens = []  # every token, sorted
+        self._docs = {}  # product id -> [name, price, stock, tokens]
+        self._stale = set()
+        self._stats = {
+            "builds": 0,
+            "searches": 0,
+            "refreshes": 0,
+            "refreshed_products": 0,
+        }
+
+    # (postings, tokens, docs) for rows
+    @staticmethod
+    def _build(rows):
+        postings = {}
+        docs = {}
+        for pid, _, category, _, subcategory, name, price, stock in rows:
+            tokens = tuple(dict.fromkeys(tokenize(f"{name} {category} {subcategory}")))
+            docs[pid] = [name, price, stock, tokens]
+            for token in tokens:
+                postings.setdefault(token, []).append(pid)
+        for ids in postings.values():
+            ids.sort()
+        return postings, sorted(postings), docs
+
+    # Builds the index if it isn't, then re-reads stale products
+    def _ensure(self):
+        if not self._built:
+            with self._load_lock:
+                with self._lock:
+                    built = self._built
+                    generation = self._generation
+                    if not built:
+                        self._stale.clear()  # the build reads them fresh; later marks stay
+                if not built:
+                    postings, tokens, docs = self._build(self._load_all())
+                    with self._lock:
+                        if generation == self._generation:
+                            self._postings, self._tokens, self._docs = postings, tokens, docs
+                            self._built = True
+                            self._stats["builds"] += 1
+                    if generation != self._generation:
+                        return self._ensure()  # invalidated while loading
+        with self._lock:
+            if not self._stale:
+                return
+            stale = sorted(self._stale)
+            self._stale.clear()
+            generation = self._generation
+        found = {}
+        for start in range(0, len(stale), 500):
+            found.update((row[0], row) for row in self._load_products(stale[start:start + 500]))
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._stats["refreshes"] += 1
+            self._stats["refreshed_products"] += len(stale)
+            for pid in stale:
+                if pid in self._stale:
+                    continue  # changed again while we were reading it
+                self._reindex(pid, found.get(pid))
+
+    # Called with the lock held; row None removes the product
+    def _reindex(self, pid, row):
+        doc = self._docs.get(pid)
+        tokens = ()
+        if row is not None:
+            _, _, category, _, subcategory, name, price, stock = row
+            tokens = tuple(dict.fromkeys(tokenize(f"{name} {category} {subcategory}")))
+            if doc is not None and doc[3] == tokens:
+                doc[0], doc[1], doc[2] = name, price, stock  # the usual case: stock moved
+                return
+        if doc is not None:
+            for token in doc[3]:
+                ids = self._postings[token]
+                del ids[bisect_left(ids, pid)]
+                if not ids:
+                    del self._postings[token]
+                    del self._tokens[bisect_left(self._tokens, token)]
+            del self._docs[pid]
+        if row is not None:
+            self._docs[pid] = [name, price, stock, tokens]
+            for token in tokens:
+                ids = self._postings.get(token)
+                if ids is None:
+                    self._postings[token] = [pid]
+                    insort(self._tokens, token)
+                else:
+                    insort(ids, pid)
+
+    # Posting lists of every token starting with word
+    def _matching(self, word):
+        tokens = self._tokens
+        i = bisect_left(tokens, word)
+        lists = []
+        while i < len(tokens) and tokens[i].startswith(word):
+            lists.append(self._postings[tokens[i]])
+            i += 1
+        return lists
+
+    # (id, name, price, stock) rows matching every word of text, by id
+    def search(self, text, limit=20, in_stock_only=True):
+        words = list(dict.fromkeys(tokenize(text)))
+        if not words or limit <= 0:
+            return []
+        self._ensure()
+        with self._lock:
+            self._stats["searches"] += 1
+            matches = [self._matching(word) for word in words]
+            if not all(matches):
+                return []
+            # Leapfrog: each word in turn skips (by bisect) to the first of its
+            # ids at or after the current candidate; a product matches once
+            # every word lands on it. Rarest word first.
+            matches.sort(key=lambda lists: sum(len(ids) for ids in lists))
+            cursors = [(lists, [0] * len(lists)) for lists in matches]
+            rows = []
+            pid = -1  # below every id
+            while len(rows) < limit:
+                k = agreed = 0  # agreed: words in a row that have pid
+                while agreed < len(cursors):
+                    found = _next_id(*cursors[k], pid)
+                    if found is None:
+                        return rows
+                    if found != pid:
+                        pid, agreed = found, 0
+                    agreed += 1
+                    k = (k + 1) % len(cursors)
+                name, price, stock, _ = self._docs[pid]
+                if not (in_stock_only and stock <= 0):
+                    rows.append((pid, name, price, stock))
+                pid += 1
+            return rows
+
+    # Build now rather than on the first search
+    def warm(self):
+        self._ensure()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._built = False
+            self._postings, self._tokens, self._docs = {}, [], {}
+            self._stale.clear()
+
+    # Marks made while a build is loading survive it
+    def invalidate_products(self, product_ids):
+        with self._lock:
+            self._stale.update(product_ids)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, products=len(self._docs), tokens=len(self._tokens), stale=len(self._stale))
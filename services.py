@@ -0,0 +1,795 @@
+import threading
+from datetime import date, datetime, timedelta
+from enum import Enum
+
+import idempotency
+import low_stock
+import metrics
+import order_archive
+import reservations
+import summaries
+from categories import resolve_category_ids
+from database import (apply_migrations, borrow_connection, catalog_cache, create_database, db_error, get_backend,
+                      note_write, product_search, run_transaction, settings)
+from group_commit import GroupCommitWriter
+from idempotency import IdempotencyKeyReused, RecentKeys
+from migrations import latest_version
+from passwords import dummy_hash, hash_password, needs_rehash, verify_password
+from reservations import ReservationConflict
+from sessions import SessionCache
+from statements import hot
+
+#  Portal operations without a console
+#
+#  Every function takes plain arguments and returns plain results; problems
+#  come back as the exceptions below (or ReservationConflict / CartConflict
+#  from reservations, IdempotencyKeyReused, or the backend's db_error()). pharmacy_portal.py is the
+#  terminal client and async_portal.py serves the same calls to asyncio code.
+
+
+#  User roles
+class Role(str, Enum):
+    admin = "Admin"
+    customer = "Customer"
+
+class CustomerNotFound(Exception):
+    pass
+
+# Order is missing, cancelled, or was changed by a concurrent request
+class OrderUnavailable(Exception):
+    pass
+
+class ProductNotFound(Exception):
+    pass
+
+class ProductExists(Exception):
+    pass
+
+
+#  Catalog
+PRODUCT_COLUMNS = ("name", "subcategory_id", "price", "stock")
+PRODUCT_KEY = ("subcategory_id", "name")
+
+# Insert or update many (name, category, subcategory, price, stock) rows with
+# one multi-row statement, creating missing categories/subcategories on the way.
+# on_duplicate="update" refreshes price and stock, "skip" keeps the stored row.
+def upsert_products(cursor, rows, on_duplicate="update"):
+    if on_duplicate not in ("update", "skip"):
+        raise ValueError(f"on_duplicate must be 'update' or 'skip', not {on_duplicate!r}")
+    if not rows:
+        return 0
+    backend = get_backend()
+    ids = resolve_category_ids(cursor, backend, {(row[1], row[2]) for row in rows})
+    # Last row wins for keys repeated within the batch (names compare case-insensitively)
+    unique = {}
+    for name, category, subcategory, price, stock in rows:
+        subcategory_id = ids[(category, subcategory)][1]
+        unique[(subcategory_id, name.casefold())] = (name, subcategory_id, price, stock)
+    rows = list(unique.values())
+    update_columns = ("price", "stock") if on_duplicate == "update" else ()
+    sql = backend.upsert_sql("products", PRODUCT_COLUMNS, PRODUCT_KEY, update_columns, len(rows))
+    cursor.execute(sql, [value for row in rows for value in row])
+    if update_columns:
+        # Restocked (or run down) products may cross their reorder threshold;
+        # new ones have none yet
+        names = {}
+        for name, subcategory_id, _, _ in rows:
+            names.setdefault(subcategory_id, []).append(name)
+        keys = " OR ".join(f"(subcategory_id = %s AND name IN ({', '.join(['%s'] * len(group))}))"
+                           for group in names.values())
+        cursor.execute(f"SELECT id FROM products WHERE reorder_threshold > 0 AND ({keys})",
+                       [value for subcategory_id, group in names.items() for value in (subcategory_id, *group)])
+        low_stock.check(cursor, [row[0] for row in cursor.fetchall()])
+    return len(rows)
+
+#  products into DB
+CATALOG_SEED_VERSION = 1  # bump when the built-in catalog below changes
+
+@metrics.timed
+def populate_products():
+    # Define products grouped by category & subcategory
+    product_data = {
+        "Personal Care": {
+            "Skin Care": [
+                ("Aloe Vera Gel", 199.00, 50),
+                ("Face Wash", 149.00, 40),
+                ("Moisturizer", 299.00, 30),
+            ],
+            "Hand and Foot care": [
+                ("Hand Cream", 250.00, 25),
+                ("Foot Scrub", 270.00, 20),
+            ],
+            "Oral Care": [
+                ("Toothpaste", 99.00, 60),
+                ("Mouthwash", 199.00, 45),
+            ],
+            "Hair care": [
+                ("Shampoo", 350.00, 35),
+                ("Conditioner", 320.00, 30),
+            ],
+        },
+        "Nutrition": {
+            "Special Nutrition Needs": [
+                ("Gluten-Free Protein Bar", 120.00, 50),
+                ("Infant Formula", 450.00, 25),
+            ],
+            "Sports Nutrition": [
+                ("Whey Protein", 1500.00, 40),
+                ("Energy Drink", 99.00, 70),
+            ],
+            "Vitamins and Supplements": [
+                ("Vitamin C Tablets", 350.00, 60),
+                ("Omega 3 Capsules", 400.00, 55),
+            ],
+            "Weight Management": [
+                ("Fat Burner Capsules", 999.00, 30),
+                ("Meal Replacement Shake", 850.00, 20),
+            ],
+        },
+        "Health Care": {
+            "Diabetes Management": [
+                ("Glucometer", 1200.00, 15),
+                ("Insulin Pen", 2000.00, 10),
+            ],
+            "Health Accessories": [
+                ("Digital Thermometer", 800.00, 25),
+                ("Blood Pressure Monitor", 2500.00, 10),
+            ],
+            "Home Testing Kit": [
+                ("COVID-19 Rapid Test Kit", 500.00, 35),
+                ("Pregnancy Test Kit", 300.00, 50),
+            ],
+        },
+    }
+
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+
+        # Insert products if not already present, in one multi-row statement
+        rows = [
+            (name, category, subcat, price, stock)
+            for category, subcats in product_data.items()
+            for subcat, items in subcats.items()
+            for name, price, stock in items
+        ]
+        upsert_products(cursor, rows, on_duplicate="skip")
+        cursor.execute(
+            get_backend().upsert_sql("seed_version", ("name", "version", "applied_at"), ("name",),
+                                     ("version", "applied_at"), 1),
+            ("catalog", CATALOG_SEED_VERSION, datetime.now().replace(microsecond=0)),
+        )
+        conn.commit()
+        cursor.close()
+    catalog_cache.invalidate()
+    product_search.invalidate()
+
+#  Startup
+# Schema version and catalog seed version of the store, in one query;
+# (None, None) while the database or its version tables don't exist yet
+def stored_versions():
+    try:
+        with borrow_connection(settings.db_name) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT (SELECT MAX(version) FROM schema_version),
+                           (SELECT MAX(version) FROM seed_version WHERE name = 'catalog')
+                """)
+                return tuple(cursor.fetchone())
+            finally:
+                cursor.close()
+    except db_error():
+        return None, None
+
+# Creates, migrates and seeds the store only as far as the stored versions
+# say is needed: a store that is up to date costs one query. Returns the
+# steps that ran.
+@metrics.timed
+def bootstrap():
+    schema, seed = stored_versions()
+    steps = []
+    if schema is None:
+        create_database()
+        steps.append("create_database")
+    if schema is None or schema < latest_version():
+        apply_migrations()
+        steps.append("migrations")
+    if seed is None or seed < CATALOG_SEED_VERSION:
+        populate_products()
+        steps.append("seed")
+    return steps
+
+@metrics.timed
+def add_product(name, category, subcategory, price, stock, reorder_threshold=0):
+    name, category, subcategory = name.strip(), category.strip(), subcategory.strip()
+    if not (name and category and subcategory):
+        raise ValueError("name, category and subcategory are required")
+    if price < 0 or stock < 0 or reorder_threshold < 0:
+        raise ValueError("price, stock and reorder threshold must not be negative")
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        try:
+            # Look up (or create) the canonical category/subcategory ids
+            ids = resolve_category_ids(cursor, get_backend(), [(category, subcategory)])
+            subcategory_id = ids[(category, subcategory)][1]
+            cursor.execute("""
+                SELECT id FROM products WHERE subcategory_id = %s AND name = %s
+            """, (subcategory_id, name))
+            if cursor.fetchone():
+                raise ProductExists(name)
+            cursor.execute("""
+                INSERT INTO products (name, subcategory_id, price, stock, reorder_threshold)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (name, subcategory_id, price, stock, reorder_threshold))
+            product_id = cursor.lastrowid
+            low_stock.check(cursor, [product_id])
+            conn.commit()
+        finally:
+            cursor.close()
+    catalog_cache.invalidate()
+    product_search.invalidate_products([product_id])
+    note_write()
+    return product_id
+
+@metrics.timed
+def delete_product(product_id):
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+            if cursor.rowcount != 1:
+                raise ProductNotFound(product_id)
+            low_stock.forget(cursor, product_id)
+            conn.commit()
+        finally:
+            cursor.close()
+    catalog_cache.invalidate()
+    product_search.invalidate_products([product_id])
+    note_write()
+
+# Sets when a product needs reordering (0: never); it joins or leaves the
+# low-stock watchlist right away if its stock is on the other side now
+@metrics.timed
+def set_reorder_threshold(product_id, threshold):
+    if threshold < 0:
+        raise ValueError("reorder threshold must not be negative")
+
+    def update(cursor):
+        cursor.execute("SELECT id FROM products WHERE id = %s", (product_id,))
+        if not cursor.fetchone():
+            raise ProductNotFound(product_id)
+        cursor.execute("UPDATE products SET reorder_threshold = %s WHERE id = %s", (threshold, product_id))
+        return low_stock.check(cursor, [product_id])
+
+    alerts = run_transaction(update)
+    note_write()
+    return alerts
+
+# Products below their reorder threshold, read from the watchlist:
+# (product_id, name, stock, threshold, since), most urgent first
+@metrics.timed
+def low_stock_watchlist():
+    with borrow_connection(settings.db_name, read_only=True) as conn:
+        cursor = conn.cursor()
+        rows = low_stock.watchlist(cursor)
+        cursor.close()
+    return rows
+
+# (id, product_id, name, kind, stock, threshold, created_at) alerts after after_id
+@metrics.timed
+def stock_alerts(after_id=0, limit=1000):
+    with borrow_connection(settings.db_name, read_only=True) as conn:
+        cursor = conn.cursor()
+        rows = low_stock.alerts_after(cursor, after_id, limit)
+        cursor.close()
+    return rows
+
+# Alerts the feed has not delivered yet; read on the primary, so one marked
+# delivered is never served again by a lagging replica
+@metrics.timed
+def pending_stock_alerts(limit=1000):
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        rows = low_stock.undelivered_alerts(cursor, limit)
+        cursor.close()
+    return rows
+
+@metrics.timed
+def mark_stock_alerts_delivered(alert_ids):
+    if alert_ids:
+        run_transaction(lambda cursor: low_stock.mark_delivered(cursor, alert_ids))
+
+# (category_id, name) pairs
+@metrics.timed
+def list_categories():
+    return catalog_cache.categories()
+
+# (subcategory_id, name) pairs
+@metrics.timed
+def list_subcategories(category_id):
+    return catalog_cache.subcategories(category_id)
+
+# (id, name, price, stock) rows
+@metrics.timed
+def list_products(subcategory_id, in_stock_only=False):
+    return catalog_cache.products(subcategory_id, in_stock_only=in_stock_only)
+
+@metrics.timed
+def get_product(product_id):
+    return catalog_cache.product(product_id)
+
+# In-stock (id, name, price, stock) rows whose name, category or subcategory
+# has a word starting with each word of text, from the in-memory index
+@metrics.timed
+def search_products(text, limit=20, in_stock_only=True):
+    return product_search.search(text, limit, in_stock_only)
+
+# Builds the search index now instead of on the first search
+def warm_search_index():
+    product_search.warm()
+
+
+#  Users
+@metrics.timed
+def register_user(user_id, password, role, email, age, contact_number, city, state, pincode):
+    if role not in [r.value for r in Role]:
+        raise ValueError(f"invalid role: {role!r}")
+    hashed = hash_password(password, settings.password_hash_iterations)
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO users (user_id, password, role, email, age, contact_number, city, state, pincode)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (user_id, hashed, role, email, age, contact_number, city, state, pincode))
+            conn.commit()
+        finally:
+            cursor.close()
+    note_write(user_id)
+
+# The user id as registered when the user exists with this password and role,
+# None otherwise. A hash made at
+# another cost than the configured one is replaced while we have the password.
+@metrics.timed
+def authenticate(user_id, password, role):
+    iterations = settings.password_hash_iterations
+    with borrow_connection(settings.db_name, read_only=True, user_id=user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, user_id, password FROM users WHERE user_id = %s AND role = %s",
+                       (user_id, role))
+        user = cursor.fetchone()
+        cursor.close()
+    if user is None:
+        verify_password(password, dummy_hash(iterations))
+        return None
+    user_pk, canonical_id, stored = user
+    if not verify_password(password, stored):
+        return None
+    if needs_rehash(stored, iterations):
+        # Conditional: a concurrent login may have re-hashed it already
+        with borrow_connection(settings.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                           (hash_password(password, iterations), user_pk, stored))
+            conn.commit()
+            cursor.close()
+    return canonical_id
+
+
+#  Sessions: one password check per login, then token lookups in memory
+session_cache = SessionCache(ttl=lambda: settings.session_ttl, max_sessions=lambda: settings.session_max)
+
+# Session token for valid credentials, None otherwise
+@metrics.timed
+def login(user_id, password, role):
+    canonical_id = authenticate(user_id, password, role)
+    if canonical_id is None:
+        return None
+    return session_cache.issue(canonical_id, role)
+
+# (user_id, role) of a live session, None when the token is unknown or expired
+@metrics.timed
+def session_user(token):
+    return session_cache.get(token)
+
+@metrics.timed
+def logout(token):
+    session_cache.revoke(token)
+
+
+#  Orders
+#
+#  Writes run as one transaction each, or, with settings.group_commit, are
+#  queued and committed together by the group commit writer.
+_order_writer = None
+_order_writer_lock = threading.Lock()
+
+def order_writer():
+    global _order_writer
+    with _order_writer_lock:
+        if _order_writer is None:
+            _order_writer = GroupCommitWriter(
+                lambda: borrow_connection(settings.db_name),
+                get_backend,
+                max_batch=settings.group_commit_max_batch,
+                max_delay=settings.group_commit_max_delay_ms / 1000.0,
+                retries=settings.deadlock_retries,
+            )
+        return _order_writer
+
+# Flushes queued writes and stops the writer; the next write starts a new one
+def close_order_writer():
+    global _order_writer
+    with _order_writer_lock:
+        writer, _order_writer = _order_writer, None
+    if writer is not None:
+        writer.close()
+
+def _write(work):
+    if settings.group_commit:
+        return order_writer().run(work)
+    return run_transaction(work)
+
+#  Idempotency keys: the latest results stay in memory (idempotency.py)
+recent_keys = RecentKeys(max_keys=lambda: settings.idempotency_cache_size)
+
+# _write(work) at most once per (user_id, key): a retry with the same key and
+# arguments gets the first run's result back, from memory or from its row,
+# without running work again. No key: a plain _write.
+def _write_once(user_id, key, operation, args, work):
+    if key is None:
+        return _write(work)
+    request_hash = idempotency.fingerprint(operation, *args)
+    found = recent_keys.get(user_id, idempotency.check_key(key))
+    if found is None:
+        def once(cursor):
+            stored = idempotency.claim(cursor, get_backend(), user_id, key, request_hash)
+            if stored is not None:
+                return stored
+            result = work(cursor)
+            idempotency.record(cursor, user_id, key, result)
+            return request_hash, result
+
+        found = _write(once)
+        recent_keys.put(user_id, key, *found)
+    if found[0] != request_hash:
+        raise IdempotencyKeyReused(key)
+    return found[1]
+
+# Advisory check of one more line against the cached catalog, then add it to
+# cart (product_id -> quantity); the reservation at checkout is authoritative
+@metrics.timed
+def add_to_cart(cart, product_id, quantity):
+    if quantity <= 0:
+        raise ValueError("quantity must be positive")
+    product = catalog_cache.product(product_id)
+    if not product:
+        raise ProductNotFound(product_id)
+    in_cart = cart.get(product_id, 0)
+    if product[3] < in_cart + quantity:
+        raise ReservationConflict(product_id, in_cart + quantity, product[3])
+    cart[product_id] = in_cart + quantity
+    return product
+
+# Order header shipping to the customer's address on file, under the user id
+# as registered rather than as the caller spelled it
+INSERT_ORDER = hot("insert_order", """
+    INSERT INTO orders (user_id, status, shipping_city, shipping_state, shipping_pincode)
+    SELECT user_id, 'Placed', city, state, pincode FROM users WHERE user_id = %s
+""")
+
+# Write one order: header, stock for every line, then the lines at the price
+# they were reserved at. Three statements whatever the cart size; returns the
+# new order id.
+@metrics.timed
+def checkout(cursor, user_id, lines):
+    cursor.execute(INSERT_ORDER, (user_id,))
+    if cursor.rowcount != 1:
+        raise CustomerNotFound(user_id)
+    order_id = cursor.lastrowid
+    reservations.reserve_many(cursor, lines)
+    case, case_params = reservations.quantity_case(lines)
+    placeholders = ", ".join(["%s"] * len(lines))
+    cursor.execute(f"""
+        INSERT INTO order_lines (order_id, product_id, quantity, unit_price)
+        SELECT %s, id, {case}, price FROM products WHERE id IN ({placeholders})
+    """, [order_id] + case_params + [product_id for product_id, _ in lines])
+    summaries.add_order_sales(cursor, get_backend(), order_id)
+    summaries.count_status(cursor, get_backend(), order_id, "Placed")
+    low_stock.check(cursor, [product_id for product_id, _ in lines])
+    return order_id
+
+def _cart_lines(cart):
+    return cart.items() if isinstance(cart, dict) else cart
+
+# Places one order for a cart ({product_id: quantity} or (product_id,
+# quantity) pairs) in a single transaction; returns the order id. Retries
+# with the same idempotency_key return the first order's id.
+@metrics.timed
+def place_order(user_id, cart, idempotency_key=None):
+    lines = {}
+    for product_id, quantity in _cart_lines(cart):
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    if not lines:
+        raise ValueError("cart is empty")
+    lines = sorted(lines.items())
+    try:
+        return _write_once(user_id, idempotency_key, "place_order", lines,
+                           lambda cursor: checkout(cursor, user_id, lines))
+    finally:
+        catalog_cache.invalidate_products([product_id for product_id, _ in lines])
+        product_search.invalidate_products([product_id for product_id, _ in lines])
+        note_write(user_id)
+
+# After a CartConflict: (product_id, product or None) for each line that
+# current stock cannot cover
+@metrics.timed
+def shortages(cart):
+    lines = sorted(_cart_lines(cart))
+    catalog_cache.invalidate_products([product_id for product_id, _ in lines])
+    short = []
+    for product_id, quantity in lines:
+        product = catalog_cache.product(product_id)
+        if not product or product[3] < quantity:
+            short.append((product_id, product))
+    return short
+
+# A customer's order lines that are not cancelled:
+# (order_id, product, quantity, status, product_id)
+ACTIVE_ORDER_LINES = hot("active_order_lines", """
+    SELECT o.id, p.name, l.quantity, o.status, l.product_id
+    FROM orders o
+    JOIN order_lines l ON l.order_id = o.id
+    JOIN products p ON p.id = l.product_id
+    WHERE o.user_id = %s AND o.status != 'Cancelled'
+    ORDER BY o.id, l.id
+""")
+
+@metrics.timed
+def active_order_lines(user_id):
+    with borrow_connection(settings.db_name, read_only=True, user_id=user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(ACTIVE_ORDER_LINES, (user_id,))
+        lines = cursor.fetchall()
+        cursor.close()
+    return lines
+
+# Statuses an order can still be changed or cancelled from
+LIVE_STATUSES = ("Placed", "Updated")
+
+# Moves a live order of user_id to new_status and returns the status it had.
+# One conditional UPDATE per candidate: each takes the row lock like a
+# single UPDATE would, and the summaries need to know what was left.
+def _change_status(cursor, order_id, user_id, new_status):
+    for old_status in LIVE_STATUSES:
+        cursor.execute(
+            "UPDATE orders SET status = %s WHERE id = %s AND user_id = %s AND status = %s",
+            (new_status, order_id, user_id, old_status),
+        )
+        if cursor.rowcount == 1:
+            return old_status
+    raise OrderUnavailable(order_id)
+
+# Changes the quantity of one product in an order. With expected_quantity the
+# change only applies if the line still holds that quantity.
+@metrics.timed
+def update_order_line(user_id, order_id, product_id, new_quantity, expected_quantity=None, idempotency_key=None):
+    if new_quantity <= 0:
+        raise ValueError("quantity must be positive")
+
+    def update(cursor):
+        # Header first: it takes the order's row lock, so a concurrent cancel
+        # of the same order waits for us (or we see it cancelled)
+        old_status = _change_status(cursor, order_id, user_id, "Updated")
+        old_quantity = expected_quantity
+        if old_quantity is None:
+            cursor.execute("SELECT quantity FROM order_lines WHERE order_id = %s AND product_id = %s",
+                           (order_id, product_id))
+            row = cursor.fetchone()
+            if not row:
+                raise OrderUnavailable(order_id)
+            old_quantity = row[0]
+        # Only applies if nobody changed the line since it was read
+        cursor.execute("""
+            UPDATE order_lines SET quantity = %s
+            WHERE order_id = %s AND product_id = %s AND quantity = %s
+        """, (new_quantity, order_id, product_id, old_quantity))
+        if cursor.rowcount != 1:
+            raise OrderUnavailable(order_id)
+        # Update stock accordingly
+        diff = new_quantity - old_quantity
+        if diff > 0:
+            reservations.reserve(cursor, product_id, diff)
+        elif diff < 0:
+            reservations.release(cursor, product_id, -diff)
+        summaries.add_line_sales(cursor, get_backend(), order_id, product_id, diff)
+        summaries.count_status(cursor, get_backend(), order_id, "Updated", old_status)
+        if diff:
+            low_stock.check(cursor, [product_id])
+
+    try:
+        _write_once(user_id, idempotency_key, "update_order_line",
+                    (order_id, product_id, new_quantity, expected_quantity), update)
+    finally:
+        catalog_cache.invalidate_products([product_id])
+        product_search.invalidate_products([product_id])
+        note_write(user_id)
+
+# Cancels an order and puts every line back in stock; returns the product ids
+@metrics.timed
+def cancel_order(user_id, order_id, idempotency_key=None):
+    def cancel(cursor):
+        # A concurrent cancel of the same order matches nothing here
+        old_status = _change_status(cursor, order_id, user_id, "Cancelled")
+        # Read under the header lock, so these are the quantities being cancelled
+        cursor.execute("SELECT product_id, quantity FROM order_lines WHERE order_id = %s", (order_id,))
+        lines = cursor.fetchall()
+        if lines:
+            reservations.release_many(cursor, lines)
+        summaries.add_order_sales(cursor, get_backend(), order_id, sign=-1)
+        summaries.count_status(cursor, get_backend(), order_id, "Cancelled", old_status)
+        low_stock.check(cursor, [product_id for product_id, _ in lines])
+        return [product_id for product_id, _ in lines]
+
+    product_ids = _write_once(user_id, idempotency_key, "cancel_order", (order_id,), cancel)
+    catalog_cache.invalidate_products(product_ids)
+    product_search.invalidate_products(product_ids)
+    note_write(user_id)
+    return product_ids
+
+#  Keyset-paginated order listing, newest first
+ORDER_LISTING_COLUMNS = """
+    o.id, o.user_id, o.status, o.requested_date, o.shipping_city, o.shipping_state, o.shipping_pincode
+"""
+
+# (product, quantity) lines of each order id, in the order they were added;
+# with archived, lines of archived orders too (their product may be gone)
+def _fetch_order_lines(cursor, order_ids, archived=False):
+    lines = {order_id: [] for order_id in order_ids}
+    if order_ids:
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        cursor.execute(f"""
+            SELECT l.order_id, p.name, l.quantity FROM order_lines l JOIN products p ON p.id = l.product_id
+            WHERE l.order_id IN ({placeholders}) ORDER BY l.order_id, l.id
+        """, tuple(order_ids))
+        for order_id, name, quantity in cursor.fetchall():
+            lines[order_id].append((name, quantity))
+    if order_ids and archived:
+        cursor.execute(f"""
+            SELECT l.order_id, COALESCE(p.name, '(deleted)'), l.quantity
+            FROM order_lines_archive l LEFT JOIN products p ON p.id = l.product_id
+            WHERE l.order_id IN ({placeholders}) ORDER BY l.order_id, l.id
+        """, tuple(order_ids))
+        for order_id, name, quantity in cursor.fetchall():
+            lines[order_id].append((name, quantity))
+    return lines
+
+# One page of orders plus the keyset cursor for the next page (None at the end).
+# Rows: (id, user_id, [(product, quantity), ...], total quantity, status,
+#        requested_date, city, state, pincode)
+# include_archived merges in the archived orders (order_archive.py): each
+# table gives its own first page and the two are merged.
+@metrics.timed
+def fetch_orders_page(user_id=None, status=None, since=None, until=None, after=None, limit=None,
+                      include_archived=False):
+    limit = limit or settings.order_page_size
+    where = []
+    params = []
+    if user_id is not None:
+        where.append("o.user_id = %s")
+        params.append(user_id)
+    if status is not None:
+        where.append("o.status = %s")
+        params.append(status)
+    if since is not None:
+        where.append("o.requested_date >= %s")
+        params.append(since)
+    if until is not None:
+        where.append("o.requested_date < %s")
+        params.append(until)
+    if after is not None:
+        # Seek past the last row of the previous page on (requested_date, id)
+        after_date, after_id = after
+        where.append("(o.requested_date < %s OR (o.requested_date = %s AND o.id < %s))")
+        params.extend([after_date, after_date, after_id])
+    def page(table):
+        sql = f"SELECT {ORDER_LISTING_COLUMNS} FROM {table} o"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql + " ORDER BY o.requested_date DESC, o.id DESC LIMIT %s"
+
+    sql = page("orders")
+    params.append(limit)
+    if include_archived:
+        sql = f"""
+            SELECT * FROM ({sql}) live UNION ALL SELECT * FROM ({page("orders_archive")}) archived
+            ORDER BY requested_date DESC, id DESC LIMIT %s
+        """
+        params = params * 2 + [limit]
+
+    with borrow_connection(settings.db_name, read_only=True, user_id=user_id) as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql, tuple(params))
+        headers = [row for row in cursor]
+        lines = _fetch_order_lines(cursor, [row[0] for row in headers], include_archived)
+        cursor.close()
+    rows = [
+        (order_id, order_user, lines[order_id], sum(q for _, q in lines[order_id]), *rest)
+        for order_id, order_user, *rest in headers
+    ]
+    next_after = (rows[-1][5], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_after
+
+# Streams every matching order; memory stays at one page whatever the table size
+def iter_orders(user_id=None, status=None, since=None, until=None, page_size=None, include_archived=False):
+    after = None
+    while True:
+        rows, after = fetch_orders_page(user_id, status, since, until, after, page_size, include_archived)
+        yield from rows
+        if after is None:
+            return
+
+# (id, user_id, status, requested_date, city, state, pincode) and the
+# [(product, quantity), ...] lines of one order, or None. Archived orders
+# are found too. user_id, the customer asking, reads their own writes.
+@metrics.timed
+def get_order(order_id, user_id=None):
+    with borrow_connection(settings.db_name, read_only=True, user_id=user_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {ORDER_LISTING_COLUMNS} FROM orders o WHERE o.id = %s", (order_id,))
+        order = cursor.fetchone()
+        archived = order is None
+        if archived:
+            cursor.execute(f"SELECT {ORDER_LISTING_COLUMNS} FROM orders_archive o WHERE o.id = %s", (order_id,))
+            order = cursor.fetchone()
+        lines = _fetch_order_lines(cursor, [order[0]], archived)[order[0]] if order else None
+        cursor.close()
+    return (order, lines) if order else None
+
+#  Sales reports: read the summary tables only, whatever the number of orders
+
+# Order counts per status, units/revenue per day and category over the last
+# days days (today included), and the top best-selling products of that window
+@metrics.timed
+def sales_report(days=7, top=10):
+    since = date.today() - timedelta(days=days - 1)
+    with borrow_connection(settings.db_name, read_only=True) as conn:
+        cursor = conn.cursor()
+        report = {
+            "since": since,
+            "statuses": summaries.status_totals(cursor),
+            "categories": summaries.category_sales(cursor, since),
+            "products": summaries.product_sales(cursor, since, top),
+        }
+        cursor.close()
+    return report
+
+# Moves cancelled / delivered orders older than days (default
+# settings.archive_after_days) to the archive tables; see order_archive.py
+@metrics.timed
+def archive_orders(days=None):
+    return order_archive.archive_orders(days)
+
+# Forgets idempotency keys older than days (default
+# settings.idempotency_key_days); returns how many
+@metrics.timed
+def purge_idempotency_keys(days=None):
+    days = settings.idempotency_key_days if days is None else days
+    before = datetime.now() - timedelta(days=days)
+    return run_transaction(lambda cursor: idempotency.purge(cursor, before))
+
+# Recomputes the summaries from the orders in one transaction
+@metrics.timed
+def rebuild_summaries():
+    run_transaction(summaries.rebuild)
+
+# [(table, key, stored, recomputed)] for summary rows that disagree with orders
+@metrics.timed
+def summary_drift():
+    with borrow_connection(settings.db_name) as conn:
+        cursor = conn.cursor()
+        differences = summaries.drift(cursor)
+        cursor.close()
+    return differences
@@ -0,0 +1,86 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+#  Login sessions: token -> (user id, role), expiring
+#
+#  A login pays for one password hash; every later request of that session
+#  is a dictionary lookup. Sessions live in this process only, so a restart
+#  logs everybody out. Entries expire after ttl seconds and the oldest are
+#  dropped beyond max_sessions; either may be a function returning the value,
+#  read when a session is issued.
+class SessionCache:
+    def __init__(self, ttl=1800.0, max_sessions=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> (user_id, role, expires_at), oldest first
+        self._stats = {
+            "issued": 0,
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evicted": 0,
+            "revoked": 0,
+        }
+
+    def issue(self, user_id, role):
+        token = secrets.token_urlsafe(32)
+        ttl = self.ttl() if callable(self.ttl) else self.ttl
+        max_sessions = self.max_sessions() if callable(self.max_sessions) else self.max_sessions
+        with self._lock:
+            self._sessions[token] = (user_id, role, self._clock() + ttl)
+            self._stats["issued"] += 1
+            while len(self._sessions) > max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evicted"] += 1
+        return token
+
+    # (user_id, role) for a live session, None for an unknown or expired token
+    def get(self, token):
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                self._stats["misses"] += 1
+                return None
+            if session[2] <= self._clock():
+                del self._sessions[token]
+                self._stats["expired"] += 1
+                return None
+            self._stats["hits"] += 1
+            return session[0], session[1]
+
+    def revoke(self, token):
+        with self._lock:
+            if self._sessions.pop(token, None) is not None:
+                self._stats["revoked"] += 1
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            tokens = [t for t, session in self._sessions.items() if session[0] == user_id]
+            for token in tokens:
+                del self._sessions[token]
+            self._stats["revoked"] += len(tokens)
+
+    # Drop expired sessions; get() also expires them lazily
+    def purge(self):
+        now = self._clock()
+        with self._lock:
+            # Sessions share one ttl, so insertion order is expiry order (unless
+            # the ttl changed meanwhile; get() still expires any left behind)
+            while self._sessions:
+                token, session = next(iter(self._sessions.items()))
+                if session[2] > now:
+                    break
+                del self._sessions[token]
+                self._stats["expired"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, active=len(self._sessions))
@@ -0,0 +1,154 @@
+import threading
+from collections import deque
+
+#  Prepared statements for the hot portal queries
+#
+#  Checkout, stock reservations and the order pages run the same few
+#  statements over and over. Each is registered here with hot(); every
+#  connection then keeps one prepared cursor per hot statement, made the
+#  first time the statement runs on it, so the server parses and plans it
+#  once per connection instead of once per call. Everything else runs as
+#  text on the caller's own cursor, as before.
+#
+#  MySQLBackend wraps its connections in PreparingConnection when
+#  settings.prepared_statements is on, with server-side prepared cursors
+#  (cursor(prepared=True)); off, the hot statements go as text too. SQLite
+#  needs no wrapper: sqlite3 already keeps compiled statements per connection,
+#  and the setting switches that cache on or off (see SQLiteBackend.connect).
+
+_hot = {}  # sql -> name
+_stats_lock = threading.Lock()
+_stats = {}  # name -> {"prepared": connections it was prepared on, "executions": n}
+
+
+# Registers sql as a hot statement and returns it; callers execute the
+# returned string unchanged
+def hot(name, sql):
+    _hot[sql] = name
+    return sql
+
+
+def _bump(name, key):
+    with _stats_lock:
+        counts = _stats.setdefault(name, {"prepared": 0, "executions": 0})
+        counts[key] += 1
+
+
+def stats():
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# One connection's prepared cursors, by statement
+class StatementCache:
+    def __init__(self, conn, make_cursor):
+        self._conn = conn
+        self._make_cursor = make_cursor
+        self._cursors = {}
+
+    def cursor(self, sql):
+        cursor = self._cursors.get(sql)
+        if cursor is None:
+            cursor = self._cursors[sql] = self._make_cursor(self._conn)
+            _bump(_hot[sql], "prepared")
+        _bump(_hot[sql], "executions")
+        return cursor
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def close(self):
+        cursors, self._cursors = list(self._cursors.values()), {}
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+# The caller's cursor; hot statements run on the connection's prepared cursor
+# for them instead, and their results are read from there
+class PreparingCursor:
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+        self._result = cursor
+        self._rows = None
+
+    def execute(self, sql, params=()):
+        if sql not in _hot:
+            self._result, self._rows = self._cursor, None
+            return self._cursor.execute(sql, params)
+        cursor = self._statements.cursor(sql)
+        cursor.execute(sql, params)
+        self._result = cursor
+        # Read the rows right away: a prepared statement with unread rows
+        # would hold up the connection. The hot reads return a few rows.
+        self._rows = deque(cursor.fetchall()) if cursor.description else None
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._result, self._rows = self._cursor, None
+        return self._cursor.executemany(sql, seq_of_params)
+
+    def fetchone(self):
+        if self._rows is None:
+            return self._cursor.fetchone()
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size=1):
+        if self._rows is None:
+            return self._cursor.fetchmany(size)
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._cursor.fetchall()
+        rows, self._rows = list(self._rows), deque()
+        return rows
+
+    def __iter__(self):
+        if self._rows is None:
+            return iter(self._cursor)
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._result.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._result.lastrowid
+
+    @property
+    def description(self):
+        return self._result.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# Connection wrapper holding its StatementCache; make_cursor(conn) opens a
+# prepared cursor on the wrapped connection
+class PreparingConnection:
+    def __init__(self, conn, make_cursor):
+        self._conn = conn
+        self.statements = StatementCache(conn, make_cursor)
+
+    def cursor(self, *args, **kwargs):
+        return PreparingCursor(self._conn.cursor(*args, **kwargs), self.statements)
+
+    def close(self):
+        self.statements.close()
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import time
+
+import services
+
+#  Low-stock alert feed
+#
+#  Appends the alerts not delivered yet to a JSONL file, one object per line
+#  ({"id", "product_id", "product", "kind", "stock", "threshold", "at"},
+#  kind "low" or "restocked"), then marks them delivered. An alert whose
+#  transaction commits late is still picked up by the next run; ids are in
+#  the order they were raised, not always in file order. A run stopped
+#  between writing and marking finds its alerts in the file's tail and
+#  skips them, so the feed can be re-run or followed without repeats.
+#
+#    python stock_alerts.py low_stock_alerts.jsonl
+#    python stock_alerts.py low_stock_alerts.jsonl --follow --interval 5
+
+
+# Ids of (at least) the last count alerts in the feed. Only the tail is
+# read: records are short, and the feed only grows. A line a crashed run
+# left half written is skipped rather than failing every run after it.
+def recent_alert_ids(path, count, record_bytes=512):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        start = max(0, f.tell() - count * record_bytes)
+        f.seek(start)
+        lines = f.read().split(b"\n")[:-1]  # the last piece has no newline yet
+    if start and lines:
+        lines = lines[1:]  # cut somewhere inside
+    ids = set()
+    for line in lines:
+        try:
+            ids.add(json.loads(line)["id"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return ids
+
+
+def _ends_mid_line(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def alert_record(row):
+    alert_id, product_id, name, kind, stock, threshold, created_at = row
+    return {
+        "id": alert_id,
+        "product_id": product_id,
+        "product": name,
+        "kind": kind,
+        "stock": stock,
+        "threshold": threshold,
+        "at": created_at.isoformat(timespec="seconds") if hasattr(created_at, "isoformat") else str(created_at),
+    }
+
+
+# Appends every undelivered alert; returns how many were written
+def append_alerts(path, batch_size=1000):
+    # Written by a run that stopped before marking them: at most one batch
+    written_before = recent_alert_ids(path, batch_size)
+    written = 0
+    # Records start on a line of their own, after any half-written one
+    broken_tail = os.path.exists(path) and _ends_mid_line(path)
+    with open(path, "a", encoding="utf-8") as f:
+        if broken_tail:
+            f.write("\n")
+        while True:
+            rows = services.pending_stock_alerts(batch_size)
+            new = [row for row in rows if row[0] not in written_before]
+            for row in new:
+                f.write(json.dumps(alert_record(row)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())  # on disk before the outbox forgets them
+            services.mark_stock_alerts_delivered([row[0] for row in rows])
+            written += len(new)
+            if len(rows) < batch_size:
+                return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new low-stock alerts to a JSONL feed")
+    parser.add_argument("feed", nargs="?", default="low_stock_alerts.jsonl")
+    parser.add_argument("--follow", action="store_true", help="keep polling for new alerts")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls with --follow")
+    args = parser.parse_args(argv)
+
+    services.bootstrap()
+    while True:
+        written = append_alerts(args.feed)
+        if written or not args.follow:
+            print(f"📝 {written} alerts appended to {args.feed}")
+        if not args.follow:
+            return written
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
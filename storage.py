@@ -0,0 +1,677 @@
+import re
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+from statements import PreparingConnection
+
+
+#  MySQL DDL. Tables are created by the migrations in migrations.py; this
+#  is each table as first created, later migrations alter it from there.
+MYSQL_TABLES = {
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL,
+            role ENUM('Admin', 'Customer') NOT NULL,
+            email VARCHAR(100),
+            age INT,
+            contact_number VARCHAR(15),
+            city VARCHAR(50),
+            state VARCHAR(50),
+            pincode VARCHAR(10)
+        )
+    """,
+    "products": """
+        CREATE TABLE IF NOT EXISTS products (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            subcategory VARCHAR(50) NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            stock INT NOT NULL
+        )
+    """,
+    "orders": """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            status VARCHAR(20) DEFAULT 'Placed',
+            requested_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            shipping_city VARCHAR(100),
+            shipping_state VARCHAR(100),
+            shipping_pincode VARCHAR(20),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    """,
+    "categories": """
+        CREATE TABLE IF NOT EXISTS categories (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) NOT NULL UNIQUE
+        )
+    """,
+    "subcategories": """
+        CREATE TABLE IF NOT EXISTS subcategories (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            category_id INT NOT NULL,
+            name VARCHAR(50) NOT NULL,
+            UNIQUE KEY uq_subcategories_name (category_id, name),
+            FOREIGN KEY (category_id) REFERENCES categories(id)
+        )
+    """,
+    "order_lines": """
+        CREATE TABLE IF NOT EXISTS order_lines (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            order_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL,
+            UNIQUE KEY uq_order_lines_product (order_id, product_id),
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    """,
+    # Summaries (summaries.py); no foreign keys, history outlives products
+    "sales_daily": """
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            units INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id)
+        )
+    """,
+    "order_status_counts": """
+        CREATE TABLE IF NOT EXISTS order_status_counts (
+            status VARCHAR(20) NOT NULL,
+            slot INT NOT NULL,
+            orders INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, slot)
+        )
+    """,
+    # Low-stock watchlist and its alert outbox (low_stock.py)
+    "low_stock": """
+        CREATE TABLE IF NOT EXISTS low_stock (
+            product_id INT PRIMARY KEY,
+            since DATETIME NOT NULL
+        )
+    """,
+    "stock_alerts": """
+        CREATE TABLE IF NOT EXISTS stock_alerts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            product_id INT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            stock INT NOT NULL,
+            threshold INT NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+    """,
+    # Archived orders (order_archive.py): the rows keep their ids; no
+    # foreign keys, history outlives products
+    "orders_archive": """
+        CREATE TABLE IF NOT EXISTS orders_archive (
+            id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            requested_date DATETIME,
+            shipping_city VARCHAR(100),
+            shipping_state VARCHAR(100),
+            shipping_pincode VARCHAR(20),
+            archived_at DATETIME NOT NULL
+        )
+    """,
+    "order_lines_archive": """
+        CREATE TABLE IF NOT EXISTS order_lines_archive (
+            id INT PRIMARY KEY,
+            order_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL
+        )
+    """,
+    # Client idempotency keys of order writes and what each returned
+    # (idempotency.py); keys compare exactly, user ids like users.user_id
+    "idempotency_keys": """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id VARCHAR(50) NOT NULL,
+            idem_key VARCHAR(100) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            result TEXT,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (user_id, idem_key)
+        )
+    """,
+}
+
+#  SQLite DDL: same columns, SQLite spelling of AUTO_INCREMENT / ENUM, and
+#  NOCASE text keys to match MySQL's case-insensitive default collation
+SQLITE_TABLES = {
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id VARCHAR(50) NOT NULL UNIQUE COLLATE NOCASE,
+            password VARCHAR(255) NOT NULL,
+            role VARCHAR(10) NOT NULL CHECK (role IN ('Admin', 'Customer')),
+            email VARCHAR(100),
+            age INT,
+            contact_number VARCHAR(15),
+            city VARCHAR(50),
+            state VARCHAR(50),
+            pincode VARCHAR(10)
+        )
+    """,
+    "products": """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(100) NOT NULL COLLATE NOCASE,
+            category VARCHAR(50) NOT NULL COLLATE NOCASE,
+            subcategory VARCHAR(50) NOT NULL COLLATE NOCASE,
+            price DECIMAL(10,2) NOT NULL,
+            stock INT NOT NULL
+        )
+    """,
+    "orders": """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            status VARCHAR(20) DEFAULT 'Placed',
+            requested_date DATETIME DEFAULT (datetime('now', 'localtime')),
+            shipping_city VARCHAR(100),
+            shipping_state VARCHAR(100),
+            shipping_pincode VARCHAR(20),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    """,
+    "categories": """
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(50) NOT NULL UNIQUE COLLATE NOCASE
+        )
+    """,
+    "subcategories": """
+        CREATE TABLE IF NOT EXISTS subcategories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INT NOT NULL REFERENCES categories(id),
+            name VARCHAR(50) NOT NULL COLLATE NOCASE,
+            UNIQUE (category_id, name)
+        )
+    """,
+    "order_lines": """
+        CREATE TABLE IF NOT EXISTS order_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INT NOT NULL REFERENCES orders(id),
+            product_id INT NOT NULL REFERENCES products(id),
+            quantity INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL,
+            UNIQUE (order_id, product_id)
+        )
+    """,
+    "sales_daily": """
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            units INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id)
+        )
+    """,
+    "order_status_counts": """
+        CREATE TABLE IF NOT EXISTS order_status_counts (
+            status VARCHAR(20) NOT NULL COLLATE NOCASE,
+            slot INT NOT NULL,
+            orders INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, slot)
+        )
+    """,
+    "low_stock": """
+        CREATE TABLE IF NOT EXISTS low_stock (
+            product_id INTEGER PRIMARY KEY,
+            since DATETIME NOT NULL
+        )
+    """,
+    "stock_alerts": """
+        CREATE TABLE IF NOT EXISTS stock_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            stock INT NOT NULL,
+            threshold INT NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+    """,
+    "orders_archive": """
+        CREATE TABLE IF NOT EXISTS orders_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            requested_date DATETIME,
+            shipping_city VARCHAR(100),
+            shipping_state VARCHAR(100),
+            shipping_pincode VARCHAR(20),
+            archived_at DATETIME NOT NULL
+        )
+    """,
+    "order_lines_archive": """
+        CREATE TABLE IF NOT EXISTS order_lines_archive (
+            id INTEGER PRIMARY KEY,
+            order_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL
+        )
+    """,
+    "idempotency_keys": """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id VARCHAR(50) NOT NULL COLLATE NOCASE,
+            idem_key VARCHAR(100) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            result TEXT,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (user_id, idem_key)
+        )
+    """,
+}
+
+
+#  MySQL server backend
+class MySQLBackend:
+    name = "mysql"
+    supports_databases = True
+    max_connections = None
+
+    def __init__(self, host, port, user, password, prepared_statements=True):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.prepared_statements = prepared_statements
+
+    @property
+    def Error(self):
+        import mysql.connector
+        return mysql.connector.Error
+
+    def connect(self, db=None):
+        import mysql.connector
+        config = {
+            "host": self.host,
+            "port": self.port,
+            "user": self.user,
+            "password": self.password,
+        }
+        if db:
+            config["database"] = db
+        # rowcount reports matched rows, so conditional UPDATEs can be checked
+        config["client_flags"] = [mysql.connector.ClientFlag.FOUND_ROWS]
+        conn = mysql.connector.connect(**config)
+        if not self.prepared_statements:
+            return conn
+        # Hot statements (statements.py) get server-side prepared cursors
+        return PreparingConnection(conn, lambda raw: raw.cursor(prepared=True))
+
+    # Serialises migration runs of concurrently starting processes
+    def acquire_migration_lock(self, cursor, timeout=60):
+        cursor.execute("SELECT GET_LOCK('pharmacy_schema_migrations', %s)", (timeout,))
+        if cursor.fetchone()[0] != 1:
+            raise TimeoutError("timed out waiting for the schema migration lock")
+
+    def release_migration_lock(self, cursor):
+        cursor.execute("SELECT RELEASE_LOCK('pharmacy_schema_migrations')")
+        cursor.fetchone()
+
+    # Deadlock / lock wait timeout, or an error of ours marked retryable:
+    # the transaction can simply be re-run
+    def is_retryable(self, err):
+        return getattr(err, "retryable", False) or getattr(err, "errno", None) in (1205, 1213)
+
+    # Appended to a SELECT that must see the latest committed row, not the
+    # transaction's snapshot
+    def share_lock_sql(self):
+        return " LOCK IN SHARE MODE"
+
+    # ER_DUP_ENTRY: the row's unique key is taken
+    def is_duplicate_key(self, err):
+        return getattr(err, "errno", None) == 1062
+
+    # With autocommit off a transaction is already open; savepoints nest in it
+    def begin(self, cursor):
+        pass
+
+    def database_ddl(self, db_name):
+        return [f"CREATE DATABASE IF NOT EXISTS {db_name}"]
+
+    def table_ddl(self, table):
+        return MYSQL_TABLES[table]
+
+    def ensure_index(self, cursor, table, name, columns, unique=False):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, name))
+        if cursor.fetchone():
+            return False
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+        return True
+
+    def drop_index(self, cursor, table, name):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, name))
+        if cursor.fetchone():
+            cursor.execute(f"DROP INDEX {name} ON {table}")
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone() is not None
+
+    def add_foreign_key(self, cursor, table, column, ref_table, name):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.table_constraints
+            WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = %s
+        """, (table, name))
+        if not cursor.fetchone():
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {ref_table}(id)")
+
+    def set_not_null(self, cursor, table, column, column_type):
+        cursor.execute(f"ALTER TABLE {table} MODIFY {column} {column_type} NOT NULL")
+
+    # Foreign keys on the columns go first; MySQL refuses to drop them otherwise
+    def drop_columns(self, cursor, table, columns):
+        placeholders = ", ".join(["%s"] * len(columns))
+        cursor.execute(f"""
+            SELECT DISTINCT constraint_name FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE() AND table_name = %s
+            AND column_name IN ({placeholders}) AND referenced_table_name IS NOT NULL
+        """, (table, *columns))
+        for (name,) in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {name}")
+        cursor.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP COLUMN {column}" for column in columns))
+
+    # Multi-row INSERT that updates (or keeps) rows colliding on a unique key
+    def upsert_sql(self, table, columns, key_columns, update_columns, row_count):
+        row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row] * row_count)
+        if update_columns:
+            assignments = ", ".join(f"{col} = VALUES({col})" for col in update_columns)
+        else:
+            assignments = f"{key_columns[0]} = {key_columns[0]}"
+        return f"{sql} ON DUPLICATE KEY UPDATE {assignments}"
+
+    # INSERT the rows of source (a VALUES list or a SELECT), adding the
+    # counter columns onto rows whose key already exists
+    def accumulate_sql(self, table, columns, counter_columns, source):
+        assignments = ", ".join(f"{col} = {col} + VALUES({col})" for col in counter_columns)
+        return f"INSERT INTO {table} ({', '.join(columns)}) {source} ON DUPLICATE KEY UPDATE {assignments}"
+
+
+# MySQL-style "%s" placeholders -> sqlite3 "?" placeholders
+@lru_cache(maxsize=512)
+def _qmark(sql):
+    return sql.replace("%s", "?")
+
+
+# Column definitions and constraints of a CREATE TABLE body, split on
+# top-level commas
+def _table_elements(body):
+    elements = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            elements.append(body[start:i].strip())
+            start = i + 1
+    elements.append(body[start:].strip())
+    return elements
+
+
+# Column an element defines or constrains: "quantity INT", "FOREIGN KEY (product_id) ..."
+_ELEMENT_COLUMN_RE = re.compile(r"(?:FOREIGN\s+KEY\s*\(\s*)?[\"`]?(\w+)", re.IGNORECASE)
+
+
+def _convert_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+
+# sqlite3 cursor that accepts the portal's %s-style SQL
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_qmark(sql), params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(_qmark(sql), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._cursor.fetchmany()
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+# sqlite3 connection with the subset of the mysql.connector API the portal uses
+class SQLiteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, **kwargs):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+#  Embedded SQLite backend (file or :memory:)
+class SQLiteBackend:
+    name = "sqlite"
+    supports_databases = False
+    Error = sqlite3.Error
+
+    def __init__(self, path=":memory:", busy_timeout=30.0, prepared_statements=True):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.prepared_statements = prepared_statements
+        # An in-memory database lives inside one connection, so the pool
+        # hands that single connection out to one borrower at a time
+        self.max_connections = 1 if self.in_memory else None
+
+    @property
+    def in_memory(self):
+        return self.path == ":memory:" or "mode=memory" in self.path
+
+    def connect(self, db=None):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            uri=self.path.startswith("file:"),
+            # Take the write lock when a transaction starts so concurrent
+            # writers queue on busy_timeout instead of failing to upgrade
+            isolation_level="IMMEDIATE",
+            # sqlite3's per-connection statement cache is SQLite's prepared
+            # statement registry: in process, a PreparingConnection on top
+            # would cost more than it saves. Off, every call compiles its SQL.
+            cached_statements=128 if self.prepared_statements else 0,
+        )
+        if not self.in_memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return SQLiteConnection(conn)
+
+    # Schema changes already serialise on SQLite's database write lock
+    def acquire_migration_lock(self, cursor, timeout=60):
+        pass
+
+    def release_migration_lock(self, cursor):
+        pass
+
+    def is_retryable(self, err):
+        return getattr(err, "retryable", False) or isinstance(err, sqlite3.OperationalError) and (
+            "locked" in str(err) or "busy" in str(err)
+        )
+
+    # A write transaction holds the database lock: every read is current
+    def share_lock_sql(self):
+        return ""
+
+    def is_duplicate_key(self, err):
+        return isinstance(err, sqlite3.IntegrityError) and "UNIQUE" in str(err)
+
+    # Open the transaction explicitly: releasing an outermost SAVEPOINT
+    # would otherwise commit
+    def begin(self, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def database_ddl(self, db_name):
+        return []
+
+    def table_ddl(self, table):
+        return SQLITE_TABLES[table]
+
+    def ensure_index(self, cursor, table, name, columns, unique=False):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = %s", (name,))
+        if cursor.fetchone():
+            return False
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+        return True
+
+    def drop_index(self, cursor, table, name):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+    # SQLite cannot add constraints to an existing table; the column is still
+    # only ever written from subcategories ids
+    def add_foreign_key(self, cursor, table, column, ref_table, name):
+        pass
+
+    def set_not_null(self, cursor, table, column, column_type):
+        pass
+
+    # SQLite will not drop a column that has a foreign key, so the table is
+    # rebuilt without them: new table, copy rows, swap, re-create indexes
+    def drop_columns(self, cursor, table, columns):
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        ddl = cursor.fetchone()[0]
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                       (table,))
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"PRAGMA table_info({table})")
+        kept_columns = ", ".join(row[1] for row in cursor.fetchall() if row[1] not in columns)
+
+        body = ddl[ddl.index("(") + 1:ddl.rindex(")")]
+        kept = [element for element in _table_elements(body)
+                if _ELEMENT_COLUMN_RE.match(element).group(1) not in columns]
+        cursor.execute(f"CREATE TABLE {table}__rebuild (" + ", ".join(kept) + ")")
+        cursor.execute(f"INSERT INTO {table}__rebuild ({kept_columns}) SELECT {kept_columns} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}__rebuild RENAME TO {table}")
+        for index in indexes:
+            if not any(re.search(rf"\b{column}\b", index) for column in columns):
+                cursor.execute(index)
+
+    def upsert_sql(self, table, columns, key_columns, update_columns, row_count):
+        row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row] * row_count)
+        if not update_columns:
+            return f"{sql} ON CONFLICT ({', '.join(key_columns)}) DO NOTHING"
+        assignments = ", ".join(f"{col} = excluded.{col}" for col in update_columns)
+        return f"{sql} ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {assignments}"
+
+    # The key is every non-counter column. A SELECT source needs a WHERE
+    # clause here: SQLite would otherwise read ON CONFLICT as a join constraint
+    def accumulate_sql(self, table, columns, counter_columns, source):
+        assignments = ", ".join(f"{col} = {col} + excluded.{col}" for col in counter_columns)
+        key = ", ".join(c for c in columns if c not in counter_columns)
+        return f"INSERT INTO {table} ({', '.join(columns)}) {source} ON CONFLICT ({key}) DO UPDATE SET {assignments}"
+
+
+def create_backend(settings):
+    if settings.db_backend == "mysql":
+        return MySQLBackend(settings.db_host, settings.db_port, settings.db_user, settings.db_password,
+                            settings.prepared_statements)
+    if settings.db_backend == "sqlite":
+        return SQLiteBackend(settings.sqlite_path, prepared_statements=settings.prepared_statements)
+    raise ValueError(f"Unknown db_backend: {settings.db_backend!r}")
+
+
+# [(name, backend)] for each entry of settings.db_replicas
+def create_replica_backends(settings):
+    names = [name.strip() for name in settings.db_replicas.split(",") if name.strip()]
+    backends = []
+    for name in names:
+        if settings.db_backend == "mysql":
+            host, _, port = name.partition(":")
+            backend = MySQLBackend(host, int(port) if port else settings.db_port, settings.db_user,
+                                   settings.db_password, settings.prepared_statements)
+        elif settings.db_backend == "sqlite":
+            backend = SQLiteBackend(name, prepared_statements=settings.prepared_statements)
+        else:
+            raise ValueError(f"Unknown db_backend: {settings.db_backend!r}")
+        backends.append((name, backend))
+    return backends
@@ -0,0 +1,191 @@
+#  Sales and order-status summaries
+#
+#  sales_daily holds units and revenue per (order day, product) over orders
+#  that are not cancelled; order_status_counts holds how many orders have
+#  each status. The order writes in services.py keep both current inside
+#  their own transaction, so reports never scan orders; rebuild() recomputes
+#  them from orders and drift() says where the two disagree.
+#
+#  Each status is counted over STATUS_SLOTS rows (by order id): otherwise
+#  every checkout would queue on the single 'Placed' counter row.
+#
+#  Archived orders (order_archive.py) stay in the summaries: archiving moves
+#  rows, it does not change history, so rebuild() and drift() read the
+#  archive tables as well.
+
+STATUS_SLOTS = 16
+
+SALES_COLUMNS = ("day", "product_id", "units", "revenue")
+STATUS_COLUMNS = ("status", "slot", "orders")
+
+ALL_ORDERS = """(
+    SELECT id, status, requested_date FROM orders
+    UNION ALL SELECT id, status, requested_date FROM orders_archive
+)"""
+ALL_ORDER_LINES = """(
+    SELECT order_id, product_id, quantity, unit_price FROM order_lines
+    UNION ALL SELECT order_id, product_id, quantity, unit_price FROM order_lines_archive
+)"""
+
+
+def _sources(archived):
+    if archived:
+        return ALL_ORDERS, ALL_ORDER_LINES
+    return "orders", "order_lines"
+
+
+def _sales_from_orders(archived=True):
+    orders, lines = _sources(archived)
+    return f"""
+        SELECT DATE(o.requested_date), l.product_id, SUM(l.quantity), SUM(l.quantity * l.unit_price)
+        FROM {orders} o JOIN {lines} l ON l.order_id = o.id
+        WHERE o.status != 'Cancelled'
+        GROUP BY DATE(o.requested_date), l.product_id
+    """
+
+
+def _status_from_orders(archived=True):
+    orders, _ = _sources(archived)
+    return f"""
+        SELECT o.status, o.id % {STATUS_SLOTS}, COUNT(*)
+        FROM {orders} o
+        GROUP BY o.status, o.id % {STATUS_SLOTS}
+    """
+
+
+#  Incremental maintenance, called inside the order write's transaction
+
+# Adds every line of an order to the sales of its day (sign=-1 takes them off)
+def add_order_sales(cursor, backend, order_id, sign=1):
+    cursor.execute(backend.accumulate_sql("sales_daily", SALES_COLUMNS, ("units", "revenue"), """
+        SELECT DATE(o.requested_date), l.product_id, %s * l.quantity, %s * l.quantity * l.unit_price
+        FROM order_lines l JOIN orders o ON o.id = l.order_id
+        WHERE l.order_id = %s
+    """), (sign, sign, order_id))
+
+# The lines of many new orders at once, one row per (day, product)
+def add_orders_sales(cursor, backend, order_ids):
+    if not order_ids:
+        return
+    cursor.execute(backend.accumulate_sql("sales_daily", SALES_COLUMNS, ("units", "revenue"), f"""
+        SELECT DATE(o.requested_date), l.product_id, SUM(l.quantity), SUM(l.quantity * l.unit_price)
+        FROM order_lines l JOIN orders o ON o.id = l.order_id
+        WHERE l.order_id IN ({', '.join(['%s'] * len(order_ids))})
+        GROUP BY DATE(o.requested_date), l.product_id
+    """), list(order_ids))
+
+# One line's quantity changed by delta units
+def add_line_sales(cursor, backend, order_id, product_id, delta):
+    if not delta:
+        return
+    cursor.execute(backend.accumulate_sql("sales_daily", SALES_COLUMNS, ("units", "revenue"), """
+        SELECT DATE(o.requested_date), l.product_id, %s, %s * l.unit_price
+        FROM order_lines l JOIN orders o ON o.id = l.order_id
+        WHERE l.order_id = %s AND l.product_id = %s
+    """), (delta, delta, order_id, product_id))
+
+# An order got new_status, coming from old_status (None for a new order)
+def count_status(cursor, backend, order_id, new_status, old_status=None):
+    if new_status == old_status:
+        return
+    slot = order_id % STATUS_SLOTS
+    rows = [(new_status, slot, 1)]
+    if old_status is not None:
+        rows.append((old_status, slot, -1))
+    values = "VALUES " + ", ".join(["(%s, %s, %s)"] * len(rows))
+    cursor.execute(backend.accumulate_sql("order_status_counts", STATUS_COLUMNS, ("orders",), values),
+                   [value for row in rows for value in row])
+
+# Many new orders with status, counted per slot in one statement
+def count_new_orders(cursor, backend, order_ids, status="Placed"):
+    slots = {}
+    for order_id in order_ids:
+        slots[order_id % STATUS_SLOTS] = slots.get(order_id % STATUS_SLOTS, 0) + 1
+    if not slots:
+        return
+    values = "VALUES " + ", ".join(["(%s, %s, %s)"] * len(slots))
+    cursor.execute(backend.accumulate_sql("order_status_counts", STATUS_COLUMNS, ("orders",), values),
+                   [value for slot, count in sorted(slots.items()) for value in (status, slot, count)])
+
+
+#  Rebuild and verification; archived=False leaves out the archive tables,
+#  for schemas that do not have them yet
+def rebuild(cursor, archived=True):
+    cursor.execute("DELETE FROM sales_daily")
+    cursor.execute(f"INSERT INTO sales_daily ({', '.join(SALES_COLUMNS)}) {_sales_from_orders(archived)}")
+    cursor.execute("DELETE FROM order_status_counts")
+    cursor.execute(f"INSERT INTO order_status_counts ({', '.join(STATUS_COLUMNS)}) {_status_from_orders(archived)}")
+
+
+def _sales(rows):
+    # Days come back as dates or ISO strings depending on backend and
+    # expression; rows that netted out to nothing are the same as no row
+    return {
+        (str(day)[:10], product_id): (int(units), round(float(revenue), 2))
+        for day, product_id, units, revenue in rows
+        if units or round(float(revenue), 2)
+    }
+
+
+# [(table, key, stored, recomputed)] for every summary row that is off
+def drift(cursor):
+    differences = []
+    cursor.execute(_sales_from_orders())
+    expected = _sales(cursor.fetchall())
+    cursor.execute(f"SELECT {', '.join(SALES_COLUMNS)} FROM sales_daily")
+    stored = _sales(cursor.fetchall())
+    for key in sorted(expected.keys() | stored.keys()):
+        if expected.get(key) != stored.get(key):
+            differences.append(("sales_daily", key, stored.get(key), expected.get(key)))
+
+    cursor.execute(f"SELECT o.status, COUNT(*) FROM {ALL_ORDERS} o GROUP BY o.status")
+    expected = {status: count for status, count in cursor.fetchall()}
+    cursor.execute("SELECT status, SUM(orders) FROM order_status_counts GROUP BY status")
+    stored = {status: int(count) for status, count in cursor.fetchall() if count}
+    for key in sorted(expected.keys() | stored.keys()):
+        if expected.get(key) != stored.get(key):
+            differences.append(("order_status_counts", key, stored.get(key), expected.get(key)))
+    return differences
+
+
+#  Reports: read the summary tables (plus names), never orders
+
+# [(status, orders)]
+def status_totals(cursor):
+    cursor.execute("""
+        SELECT status, SUM(orders) FROM order_status_counts
+        GROUP BY status HAVING SUM(orders) != 0
+        ORDER BY status
+    """)
+    return [(status, int(count)) for status, count in cursor.fetchall()]
+
+
+# [(day, category, units, revenue)] from since on, newest day first
+def category_sales(cursor, since):
+    cursor.execute("""
+        SELECT s.day, COALESCE(c.name, '(deleted)'), SUM(s.units), SUM(s.revenue)
+        FROM sales_daily s
+        LEFT JOIN products p ON p.id = s.product_id
+        LEFT JOIN subcategories sc ON sc.id = p.subcategory_id
+        LEFT JOIN categories c ON c.id = sc.category_id
+        WHERE s.day >= %s
+        GROUP BY s.day, COALESCE(c.name, '(deleted)')
+        HAVING SUM(s.units) != 0
+        ORDER BY s.day DESC, SUM(s.revenue) DESC
+    """, (since,))
+    return cursor.fetchall()
+
+
+# [(product_id, name, units, revenue)] from since on, best sellers first
+def product_sales(cursor, since, limit=10):
+    cursor.execute("""
+        SELECT s.product_id, COALESCE(p.name, '(deleted)'), SUM(s.units), SUM(s.revenue)
+        FROM sales_daily s
+        LEFT JOIN products p ON p.id = s.product_id
+        WHERE s.day >= %s
+        GROUP BY s.product_id, COALESCE(p.name, '(deleted)')
+        HAVING SUM(s.units) != 0
+        ORDER BY SUM(s.revenue) DESC, s.product_id
+        LIMIT %s
+    """, (since, limit))
+    return cursor.fetchall()
@@ -7,8 +7,8 @@ from unittest.mock import patch, MagicMock
 from pharmacy_portal import admin_menu
 
 def test_admin_menu_all_choices():
-    # Simulate user inputs in order for each menu option 1 through 7
-    inputs = iter(["1", "2", "3", "4", "5", "6", "7"])
+    # Simulate user inputs in order for each menu option 1 through 10
+    inputs = iter(["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"])
 
     with patch("builtins.input", lambda _: next(inputs)), \
          patch("pharmacy_portal.view_products") as mock_view_products, \
@@ -17,6 +17,9 @@ def test_admin_menu_all_choices():
          patch("pharmacy_portal.register") as mock_register, \
          patch("pharmacy_portal.add_new_product") as mock_add_new_product, \
          patch("pharmacy_portal.delete_product") as mock_delete_product, \
+         patch("pharmacy_portal.sales_report") as mock_sales_report, \
+         patch("pharmacy_portal.view_low_stock") as mock_view_low_stock, \
+         patch("pharmacy_portal.archive_orders") as mock_archive_orders, \
          patch("builtins.print") as mock_print:
 
         admin_menu()
@@ -28,13 +31,16 @@ def test_admin_menu_all_choices():
         mock_register.assert_called_once()
         mock_add_new_product.assert_called_once()
         mock_delete_product.assert_called_once()
+        mock_sales_report.assert_called_once()
+        mock_view_low_stock.assert_called_once()
+        mock_archive_orders.assert_called_once()
 
         # Check that "Logging out..." was printed once
         mock_print.assert_any_call("Logging out...")
 
 def test_admin_menu_invalid_choice_then_logout():
     # Inputs: invalid choice first, then logout
-    inputs = iter(["invalid", "7"])
+    inputs = iter(["invalid", "10"])
 
     with patch("builtins.input", lambda _: next(inputs)), \
          patch("builtins.print") as mock_print:
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+import services
+from async_portal import AsyncPortal
+from conftest import add_customer, query
+from reservations import ReservationConflict
+from services import OrderUnavailable
+from storage import SQLiteBackend
+
+
+def test_services_work_without_a_console(sqlite_portal):
+    services.register_user("202", "pw", "Customer", "c@example.com", 30, "9999999999", "Pune", "MH", "411001")
+    assert services.authenticate("202", "pw", "Customer")
+    assert not services.authenticate("202", "wrong", "Customer")
+    with pytest.raises(ValueError):
+        services.register_user("203", "pw", "Guest", "", 30, "", "", "", "")
+
+    gel = query("SELECT id FROM products WHERE name = 'Aloe Vera Gel'")[0][0]
+    order_id = services.place_order("202", [(gel, 1), (gel, 2)])
+    assert query("SELECT quantity FROM order_lines WHERE order_id = %s", (order_id,)) == [(3,)]
+    with pytest.raises(ValueError):
+        services.place_order("202", {})
+
+    services.update_order_line("202", order_id, gel, 1)
+    with pytest.raises(OrderUnavailable):
+        services.update_order_line("202", order_id, gel, 5, expected_quantity=3)
+    assert services.cancel_order("202", order_id) == [gel]
+    with pytest.raises(OrderUnavailable):
+        services.cancel_order("202", order_id)
+
+
+def test_async_sessions_share_a_bounded_executor(tmp_path, monkeypatch, make_store):
+    make_store(SQLiteBackend(str(tmp_path / "store.db")), customers=["101"])
+    pen = query("SELECT id FROM products WHERE name = 'Insulin Pen'")[0][0]
+    query("UPDATE products SET stock = 10 WHERE id = %s", (pen,))
+
+    threads = set()
+    place = services.place_order
+
+    def tracking_place_order(user_id, cart, idempotency_key=None):
+        threads.add(threading.current_thread().name)
+        return place(user_id, cart, idempotency_key)
+
+    async def session(portal):
+        try:
+            return await portal.place_order("101", {pen: 1})
+        except ReservationConflict:
+            return None
+
+    async def main():
+        async with AsyncPortal(max_workers=4) as portal:
+            results = await asyncio.gather(*(session(portal) for _ in range(25)))
+            orders = [row async for row in portal.iter_orders(user_id="101", page_size=3)]
+        return results, orders
+
+    monkeypatch.setattr(services, "place_order", tracking_place_order)
+    results, orders = asyncio.run(main())
+
+    placed = [r for r in results if r is not None]
+    assert len(placed) == 10 and len(orders) == 10
+    assert query("SELECT stock FROM products WHERE id = %s", (pen,))[0][0] == 0
+    assert 1 <= len(threads) <= 4
+
+
+def test_async_history_includes_archived_orders(sqlite_portal):
+    add_customer("101")
+    gel = query("SELECT id FROM products WHERE name = 'Aloe Vera Gel'")[0][0]
+    old = services.place_order("101", {gel: 1})
+    services.cancel_order("101", old)
+    query("UPDATE orders SET requested_date = '2020-01-01 10:00:00' WHERE id = %s", (old,))
+    services.rebuild_summaries()
+    services.archive_orders(days=30)
+    live = services.place_order("101", {gel: 1})
+
+    async def main():
+        async with AsyncPortal(max_workers=2) as portal:
+            page, _ = await portal.fetch_orders_page(user_id="101")
+            history = [row async for row in portal.iter_orders(user_id="101", page_size=1, include_archived=True)]
+            return page, history
+
+    page, history = asyncio.run(main())
+    assert [row[0] for row in page] == [live]
+    assert [row[0] for row in history] == [live, old]
+
+
+def test_async_added_product_joins_the_watchlist(sqlite_portal):
+    add_customer("101")
+
+    async def main():
+        async with AsyncPortal(max_workers=2) as portal:
+            product_id = await portal.add_product("Foot Balm", "Personal Care", "Hand and Foot care", 120.0, 5,
+                                                  reorder_threshold=10)
+            await portal.place_order("101", {product_id: 2})
+            return (product_id, await portal.low_stock_watchlist(), await portal.search_products("foot balm"),
+                    await portal.sales_report(days=1, top=1))
+
+    product_id, watchlist, found, report = asyncio.run(main())
+    assert [row[0] for row in watchlist] == [product_id]
+    assert [row[0] for row in found] == [product_id]
+    assert report == services.sales_report(days=1, top=1) and report["products"][0][1] == "Foot Balm"
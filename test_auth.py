@@ -0,0 +1,115 @@
+import pytest
+
+import bench_auth
+import database
+import migrations
+import services
+from conftest import add_customer, product, query
+from passwords import hash_password, is_hashed, needs_rehash, verify_password
+from sessions import SessionCache
+from storage import SQLiteBackend
+
+
+def test_password_hashes():
+    stored = hash_password("s3cret", 1000)
+    assert stored.startswith("pbkdf2_sha256$1000$") and stored != hash_password("s3cret", 1000)
+    assert verify_password("s3cret", stored)
+    assert not verify_password("S3cret", stored)
+    assert not verify_password("s3cret", "s3cret")  # plaintext never verifies
+    assert not needs_rehash(stored, 1000) and needs_rehash(stored, 2000) and needs_rehash("s3cret", 1000)
+    with pytest.raises(ValueError):
+        hash_password("s3cret", 0)
+
+
+def test_session_cache_expires_and_evicts():
+    now = [0.0]
+    cache = SessionCache(ttl=10, max_sessions=2, clock=lambda: now[0])
+    first = cache.issue("101", "Customer")
+    second = cache.issue("102", "Customer")
+    assert cache.get(first) == ("101", "Customer")
+    third = cache.issue("103", "Admin")  # over max_sessions: the oldest goes
+    assert cache.get(first) is None and cache.get(third) == ("103", "Admin")
+
+    cache.revoke_user("102")
+    assert cache.get(second) is None
+    now[0] = 10.0
+    assert cache.get(third) is None
+    stats = cache.stats()
+    assert (stats["evicted"], stats["revoked"], stats["expired"], stats["active"]) == (1, 1, 1, 0)
+
+
+def test_login_issues_tokens_and_upgrades_hash_cost(sqlite_portal, monkeypatch):
+    services.register_user("202", "pw", "Customer", "c@example.com", 30, "", "", "", "")
+    stored = query("SELECT password FROM users WHERE user_id = '202'")[0][0]
+    assert is_hashed(stored) and "pw" not in stored.split("$")
+
+    assert services.login("202", "pw", "Admin") is None
+    assert services.login("nobody", "pw", "Customer") is None
+    token = services.login("202", "pw", "Customer")
+    assert services.session_user(token) == ("202", "Customer")
+
+    # Raising the cost re-hashes on the next successful login
+    monkeypatch.setattr(database.settings, "password_hash_iterations", 1500)
+    assert services.authenticate("202", "pw", "Customer")
+    assert query("SELECT password FROM users WHERE user_id = '202'")[0][0].startswith("pbkdf2_sha256$1500$")
+
+    services.logout(token)
+    assert services.session_user(token) is None
+
+
+
+def test_sessions_and_orders_use_the_registered_user_id(sqlite_portal):
+    services.register_user("Alice", "pw", "Customer", "a@example.com", 30, "", "Pune", "MH", "411001")
+    assert services.authenticate("alice", "pw", "Customer") == "Alice"
+    token = services.login("ALICE", "pw", "Customer")
+    assert services.session_user(token) == ("Alice", "Customer")
+
+    gel, _ = product("Aloe Vera Gel")
+    order_id = services.place_order("alice", {gel: 1})
+    assert query("SELECT user_id FROM orders WHERE id = %s", (order_id,)) == [("Alice",)]
+    assert [row[0] for row in services.fetch_orders_page("Alice")[0]] == [order_id]
+
+def test_migration_hashes_plaintext_passwords():
+    database.configure_backend(SQLiteBackend(":memory:"))
+    try:
+        with database.borrow_connection() as conn:
+            migrations.migrate(conn, database.get_backend(), migrations.MIGRATIONS[:5])
+        query("""
+            INSERT INTO users (user_id, password, role, email, age, contact_number, city, state, pincode)
+            VALUES ('301', 'plain', 'Customer', '', 30, '', '', '', '')
+        """)
+        add_customer("302")
+        hashed = query("SELECT password FROM users WHERE user_id = '302'")[0][0]
+
+        assert database.apply_migrations()[0] == (6, "hashed passwords")
+        assert is_hashed(query("SELECT password FROM users WHERE user_id = '301'")[0][0])
+        assert query("SELECT password FROM users WHERE user_id = '302'")[0][0] == hashed
+        assert services.authenticate("301", "plain", "Customer")
+        assert services.authenticate("302", "secret", "Customer")
+    finally:
+        database.configure_backend(None)
+
+
+def test_cli_menu_ends_when_the_session_expires(sqlite_portal, monkeypatch):
+    add_customer("101")
+    inputs = iter(["Customer", "101", "secret", "5"])
+    printed = []
+
+    def choose(prompt=""):
+        answer = next(inputs)
+        if answer == "5":  # the session runs out while the customer looks at orders
+            services.session_cache.clear()
+        return answer
+
+    monkeypatch.setattr("builtins.input", choose)
+    monkeypatch.setattr("builtins.print", lambda *args, **kwargs: printed.append(" ".join(map(str, args))))
+    sqlite_portal.login()
+    assert "⚠️ Session expired, please log in again." in printed
+    assert services.session_cache.stats()["active"] == 0
+
+
+def test_auth_benchmark_runs(sqlite_portal):
+    report = bench_auth.run_benchmark(costs=(500, 1000), logins=3, requests=50)
+    assert [r["iterations"] for r in report["costs"]] == [500, 1000]
+    assert all(r["login_failures"] == 0 for r in report["costs"])
+    assert database.settings.password_hash_iterations == 1000  # restored
@@ -0,0 +1,28 @@
+import database
+import pharmacy_portal
+from bench_orders import CountingBackend, percentile, run_benchmark
+from storage import SQLiteBackend
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_benchmark_run_reports_every_operation():
+    database.configure_backend(CountingBackend(SQLiteBackend(":memory:")))
+    try:
+        report = run_benchmark(customers=3, admins=1, ops=30, seed=7, stock=5)
+    finally:
+        database.configure_backend(None)
+
+    assert report["total_ops"] == 120
+    assert report["consistency"]["violations"] == 0
+    place = report["operations"]["place_order"]
+    assert place["errors"] == 0
+    assert place["round_trips_per_op"] > 0
+    assert place["p50_ms"] <= place["p99_ms"]
+    # The portal module is left with the real print/input afterwards
+    assert "input" not in vars(pharmacy_portal)
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+import bench_orders
+import database
+import services
+from conftest import query
+from storage import SQLiteBackend
+
+
+def test_bootstrap_skips_work_an_up_to_date_store_has_done(tmp_path):
+    path = str(tmp_path / "store.db")
+    database.configure_backend(SQLiteBackend(path))
+    try:
+        assert services.stored_versions() == (None, None)
+        assert services.bootstrap() == ["create_database", "migrations", "seed"]
+        products = query("SELECT COUNT(*) FROM products")[0][0]
+        assert products > 0
+
+        # A deleted seed product stays deleted: the seed is not re-applied
+        query("DELETE FROM products WHERE name = 'Glucometer'")
+        database.configure_backend(bench_orders.CountingBackend(SQLiteBackend(path)))
+        bench_orders._local.round_trips = 0
+        assert services.bootstrap() == []
+        assert bench_orders._local.round_trips <= 2  # the version query (+ the pool's reset)
+        assert query("SELECT COUNT(*) FROM products")[0][0] == products - 1
+
+        query("UPDATE seed_version SET version = 0")
+        assert services.bootstrap() == ["seed"]
+        assert query("SELECT COUNT(*) FROM products")[0][0] == products
+    finally:
+        database.configure_backend(None)
+
+
+def test_importing_the_portal_loads_no_settings_or_driver():
+    code = ("import sys, pharmacy_portal; "
+            "print([m for m in ('pydantic_settings', 'mysql.connector') if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,56 @@
+import services
+from conftest import add_customer, product, query, run_scripted
+
+
+def test_cart_checks_out_every_line_in_one_order(sqlite_portal):
+    add_customer("101")
+    gel, gel_stock = product("Aloe Vera Gel")
+    wash, wash_stock = product("Face Wash")
+    script = {
+        "Select": "1",
+        "Enter the Product ID": [str(gel), str(wash), str(gel)],
+        "Enter quantity": ["2", "1", "1"],
+        "Add another product": ["y", "y", "n"],
+    }
+    printed = run_scripted(sqlite_portal.place_order, script, "101")
+    assert any(line.startswith("✅ Order placed successfully.") for line in printed)
+
+    order_id = query("SELECT id FROM orders")[0][0]
+    assert query("SELECT product_id, quantity FROM order_lines WHERE order_id = %s ORDER BY product_id",
+                 (order_id,)) == sorted([(gel, 3), (wash, 1)])
+    assert product("Aloe Vera Gel")[1] == gel_stock - 3
+    assert product("Face Wash")[1] == wash_stock - 1
+
+    rows, _ = services.fetch_orders_page(user_id="101")
+    assert [(r[0], r[3]) for r in rows] == [(order_id, 4)] and len(rows[0][2]) == 2
+
+    # Updating one line leaves the other alone; cancelling releases both
+    script = {"Enter Order ID": str(order_id), "Select line number": "1", "Enter new quantity": "1"}
+    run_scripted(sqlite_portal.update_order, script, "101")
+    assert product("Aloe Vera Gel")[1] == gel_stock - 1
+    run_scripted(sqlite_portal.cancel_order, {"Enter Order ID": str(order_id)}, "101")
+    assert (product("Aloe Vera Gel")[1], product("Face Wash")[1]) == (gel_stock, wash_stock)
+
+
+def test_cart_short_on_one_line_orders_nothing(sqlite_portal):
+    add_customer("101")
+    gel, gel_stock = product("Aloe Vera Gel")
+    wash, wash_stock = product("Face Wash")
+
+    # Someone buys the Face Wash out while the cart is being filled
+    def sold_out():
+        query("UPDATE products SET stock = 0 WHERE id = %s", (wash,))
+        return "n"
+
+    script = {
+        "Select": "1",
+        "Enter the Product ID": [str(gel), str(wash)],
+        "Enter quantity": ["2", "1"],
+        "Add another product": ["y", sold_out],
+        "Enter Customer User ID": "101",
+    }
+    printed = run_scripted(sqlite_portal.place_order, script, None)
+    assert "❌ Only 0 items of Face Wash in stock." in printed
+    assert query("SELECT COUNT(*) FROM orders")[0][0] == 0
+    assert query("SELECT COUNT(*) FROM order_lines")[0][0] == 0
+    assert product("Aloe Vera Gel")[1] == gel_stock
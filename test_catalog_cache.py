@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import database
+from catalog_cache import CatalogCache
+from conftest import add_customer, query, run_scripted
+
+
+ROWS = [
+    (1, 1, "Personal Care", 10, "Skin Care", "Face Wash", 149.0, 40),
+    (2, 1, "Personal Care", 10, "Skin Care", "Moisturizer", 299.0, 0),
+    (3, 2, "Nutrition", 20, "Sports Nutrition", "Whey Protein", 1500.0, 40),
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(ttl=60.0):
+    calls = {"all": 0, "products": []}
+
+    def load_all():
+        calls["all"] += 1
+        return list(ROWS)
+
+    def load_products(ids):
+        calls["products"].append(list(ids))
+        return [row for row in ROWS if row[0] in ids]
+
+    clock = FakeClock()
+    return CatalogCache(load_all, load_products, ttl=ttl, clock=clock), calls, clock
+
+
+def test_tree_groups_like_the_menu_and_counts_hits():
+    cache, calls, _ = make_cache()
+    assert cache.categories() == [(1, "Personal Care"), (2, "Nutrition")]
+    assert cache.subcategories(1) == [(10, "Skin Care")]
+    assert cache.subcategories(3) == []
+    assert [r[0] for r in cache.products(10)] == [1, 2]
+    assert [r[0] for r in cache.products(10, in_stock_only=True)] == [1]
+    assert calls["all"] == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 4
+
+
+def test_ttl_expiry_and_invalidation_reload():
+    cache, calls, clock = make_cache(ttl=10)
+    cache.categories()
+    clock.now = 11
+    cache.categories()
+    cache.invalidate()
+    cache.categories()
+    assert calls["all"] == 3
+
+
+def test_invalidate_products_refreshes_only_those_rows():
+    cache, calls, _ = make_cache()
+    cache.categories()
+    cache.invalidate_products([3])
+    cache.products(20)
+    cache.products(20)
+    assert calls["all"] == 1
+    assert calls["products"] == [[3]]
+
+
+def test_browsing_hits_cache_and_orders_refresh_stock(sqlite_portal):
+    add_customer("101")
+    database.catalog_cache.invalidate()
+    product_id, stock = query("SELECT id, stock FROM products WHERE name = 'Aloe Vera Gel'")[0]
+    run_scripted(sqlite_portal.place_order, ["1", "1", str(product_id), "2", "n"], "101")
+
+    # Menu positions of the product's category and subcategory
+    cat_id, sub_id = query("""
+        SELECT s.category_id, s.id FROM products p JOIN subcategories s ON s.id = p.subcategory_id
+        WHERE p.id = %s
+    """, (product_id,))[0]
+    cat_pos = [c[0] for c in database.catalog_cache.categories()].index(cat_id) + 1
+    sub_pos = [s[0] for s in database.catalog_cache.subcategories(cat_id)].index(sub_id) + 1
+
+    misses = database.catalog_cache.stats()["misses"]
+    with patch("builtins.input", side_effect=[str(cat_pos), str(sub_pos)]), patch("builtins.print"):
+        products = sqlite_portal.view_products()
+    assert database.catalog_cache.stats()["misses"] == misses
+    assert (product_id, stock - 2) in [(p[0], p[3]) for p in products]
@@ -0,0 +1,41 @@
+import json
+
+from catalog_import import import_catalog
+from conftest import query
+
+
+def test_csv_import_upserts_on_catalog_key(sqlite_portal, tmp_path):
+    path = tmp_path / "supplier.csv"
+    path.write_text(
+        "name,category,subcategory,price,stock\n"
+        "Aloe Vera Gel,Personal Care,Skin Care,210.50,80\n"
+        "Sunscreen,Personal Care,Skin Care,399,15\n"
+        "sunscreen,personal care,skin care,405,20\n"
+        "Broken,Personal Care,Skin Care,abc,1\n"
+    )
+    report = import_catalog(str(path), batch_size=2, batches_per_commit=1)
+
+    assert report["rows_read"] == 4
+    assert report["rows_rejected"] == 1 and "line 5" in report["errors"][0]
+    assert report["commits"] == 2
+    assert query("SELECT price, stock FROM products WHERE name = 'Aloe Vera Gel'") == [(210.5, 80)]
+    # Same key in a different case is the same product
+    assert query("SELECT COUNT(*), MAX(stock) FROM products WHERE name = 'Sunscreen'") == [(1, 20)]
+    assert query("SELECT COUNT(*) FROM products")[0][0] == 24
+
+
+def test_jsonl_import_skip_keeps_existing_rows(sqlite_portal, tmp_path):
+    path = tmp_path / "supplier.jsonl"
+    rows = [{"name": "Face Wash", "category": "Personal Care", "subcategory": "Skin Care", "price": 1, "stock": 1}]
+    rows += [{"name": f"SKU {i}", "category": "Nutrition", "subcategory": "Bulk", "price": 10, "stock": i}
+             for i in range(250)]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+
+    report = import_catalog(str(path), batch_size=100, on_duplicate="skip")
+
+    assert report["rows_read"] == 251 and report["batches"] == 3
+    assert query("SELECT price, stock FROM products WHERE name = 'Face Wash'") == [(149, 40)]
+    assert query("""
+        SELECT COUNT(*) FROM products p JOIN subcategories s ON s.id = p.subcategory_id
+        WHERE s.name = 'Bulk'
+    """)[0][0] == 250
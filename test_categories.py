@@ -0,0 +1,63 @@
+import pytest
+
+import database
+import migrations
+import pharmacy_portal
+from categories import canonical_name
+from conftest import add_customer, query
+from storage import SQLiteBackend
+
+
+def test_canonical_name():
+    assert canonical_name("  hand and foot  care ") == "Hand and Foot Care"
+    assert canonical_name("Personalcare") == "Personal Care"
+    assert canonical_name("skin care") == "Skin Care"
+    assert canonical_name("nutritions") == "Nutrition"
+    assert canonical_name("ORS sachets") == "ORS Sachets"
+    with pytest.raises(ValueError):
+        canonical_name("   ")
+
+
+# A store created before the category tables, with the spellings ms.sql fixed by hand
+@pytest.fixture
+def legacy_portal():
+    database.configure_backend(SQLiteBackend(":memory:"))
+    with database.borrow_connection() as conn:
+        migrations.migrate(conn, database.get_backend(), migrations.MIGRATIONS[:3])
+    query("""
+        INSERT INTO products (name, category, subcategory, price, stock) VALUES
+        ('Face Wash', 'Personal Care', 'Skin Care', 149, 10),
+        ('Face Wash ', 'Personalcare', 'skincare', 149, 5),
+        ('Shampoo', 'personal care', 'Hair Care', 199, 7),
+        ('Whey Protein', 'Nutritions', 'Sports Nutrition', 1500, 3)
+    """)
+    yield pharmacy_portal
+    database.configure_backend(None)
+
+
+def test_migration_canonicalises_legacy_catalog(legacy_portal):
+    add_customer("101")
+    duplicate = query("SELECT id FROM products WHERE category = 'Personalcare'")[0][0]
+    query("""
+        INSERT INTO orders (user_id, product_id, quantity, status, shipping_city, shipping_state, shipping_pincode)
+        VALUES ('101', %s, 2, 'Placed', 'Pune', 'MH', '411001')
+    """, (duplicate,))
+
+    applied = database.apply_migrations()
+    assert applied[:2] == [(4, "category and subcategory tables"), (5, "order lines")]
+
+    assert query("SELECT name FROM categories ORDER BY name") == [("Nutrition",), ("Personal Care",)]
+    rows = query("""
+        SELECT c.name, s.name, p.name, p.stock, p.id FROM products p
+        JOIN subcategories s ON s.id = p.subcategory_id
+        JOIN categories c ON c.id = s.category_id
+        ORDER BY p.id
+    """)
+    assert [row[:4] for row in rows] == [
+        ("Personal Care", "Skin Care", "Face Wash", 15),
+        ("Personal Care", "Hair Care", "Shampoo", 7),
+        ("Nutrition", "Sports Nutrition", "Whey Protein", 3),
+    ]
+    assert query("SELECT product_id, quantity FROM order_lines") == [(rows[0][4], 2)]
+    browse = database.catalog_cache.categories()
+    assert [name for _, name in browse] == ["Nutrition", "Personal Care"]
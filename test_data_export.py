@@ -0,0 +1,103 @@
+import csv
+import gzip
+import json
+import os
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+import bench_export
+import catalog_import
+import data_export
+import services
+from conftest import add_customer, product, query
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_orders_export_one_row_per_line_with_filters(sqlite_portal, tmp_path):
+    add_customer("101", city="Nashik")
+    gel, pen = product("Aloe Vera Gel")[0], product("Insulin Pen")[0]
+    first = services.place_order("101", {gel: 2, pen: 1})
+    second = services.place_order("101", {gel: 1})
+    services.cancel_order("101", second)
+
+    rows = read_csv(data_export.export_table("orders", str(tmp_path / "orders.csv"))["path"])
+    assert [(int(r["order_id"]), int(r["product_id"]), int(r["quantity"])) for r in rows] == [
+        (first, min(gel, pen), 2 if gel < pen else 1),
+        (first, max(gel, pen), 1 if gel < pen else 2),
+        (second, gel, 1),
+    ]
+    assert rows[0]["user_id"] == "101" and rows[0]["shipping_city"] == "Nashik"
+    line = next(r for r in rows if int(r["product_id"]) == gel and int(r["order_id"]) == first)
+    assert line["product"] == "Aloe Vera Gel" and float(line["line_total"]) == 2 * float(line["unit_price"])
+
+    report = data_export.export_table("orders", str(tmp_path / "cancelled.jsonl"), status="Cancelled")
+    assert report["rows"] == 1 and report["format"] == "jsonl" and not report["gzip"]
+    with open(tmp_path / "cancelled.jsonl") as f:
+        record = json.loads(f.readline())
+    assert record["order_id"] == second and record["status"] == "Cancelled"
+    assert record["unit_price"] == 199 and datetime.fromisoformat(record["requested_date"])
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    assert data_export.export_table("orders", str(tmp_path / "later.csv"), since=tomorrow)["rows"] == 0
+    assert data_export.export_table("orders", str(tmp_path / "earlier.csv"), until=tomorrow)["rows"] == 3
+
+
+def test_gzip_products_round_trip_through_the_importer(sqlite_portal, tmp_path):
+    path = str(tmp_path / "products.csv.gz")
+    report = data_export.export_table("products", path)
+    assert report["gzip"] and report["rows"] == len(query("SELECT id FROM products"))
+    with gzip.open(path, "rt", newline="") as f:
+        exported = list(csv.DictReader(f))
+    assert exported[0].keys() >= {"name", "category", "subcategory", "price", "stock"}
+
+    plain = tmp_path / "products.csv"
+    plain.write_text(gzip.open(path, "rt").read())
+    imported = catalog_import.import_catalog(str(plain))
+    assert imported["rows_upserted"] == report["rows"] and imported["rows_rejected"] == 0
+
+
+def test_users_export_leaves_out_passwords(sqlite_portal, tmp_path):
+    add_customer("101")
+    path = str(tmp_path / "users.jsonl")
+    data_export.export_table("users", path)
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["user_id"] for r in records] == ["101"]
+    assert "password" not in records[0]
+
+
+def test_bad_requests_and_failures_leave_no_file(sqlite_portal, tmp_path):
+    with pytest.raises(ValueError):
+        data_export.export_table("products", str(tmp_path / "p.csv"), status="Placed")
+    with pytest.raises(ValueError):
+        data_export.export_table("products", str(tmp_path / "p.xml"))
+    with pytest.raises(ValueError):
+        data_export.export_table("passwords", str(tmp_path / "p.csv"))
+
+    def fail(rows, elapsed):
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        data_export.export_table("products", str(tmp_path / "p.csv"), chunk_size=5, progress=fail)
+    assert os.listdir(tmp_path) == []
+
+
+def test_memory_does_not_grow_with_the_table(sqlite_portal, tmp_path):
+    def peak_for(orders):
+        bench_export.fill_orders(orders, 2, random.Random(orders))
+        tracemalloc.start()
+        data_export.export_table("orders", str(tmp_path / "orders.jsonl"), chunk_size=500)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small = peak_for(1000)
+    large = peak_for(19000)  # 20x the rows in total
+    assert large < small * 2
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def is_connected(self):
+        return self.alive
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def creator():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(creator, **kwargs), created
+
+
+def test_connections_are_reused():
+    pool, created = make_pool(size=2, max_overflow=0)
+    with pool.connection() as conn:
+        first = conn._raw
+    with pool.connection() as conn:
+        assert conn._raw is first
+    assert len(created) == 1
+    assert first.rollbacks == 2
+    stats = pool.stats()
+    assert stats["checkouts"] == 2
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_dead_connection_is_evicted_on_borrow():
+    pool, created = make_pool(size=1, max_overflow=0)
+    with pool.connection():
+        pass
+    created[0].alive = False
+    with pool.connection() as conn:
+        assert conn._raw is created[1]
+    assert created[0].closed
+    assert pool.stats()["evictions"] == 1
+
+
+def test_overflow_connections_are_closed_on_return():
+    pool, created = make_pool(size=1, max_overflow=1)
+    a = pool.acquire()
+    b = pool.acquire()
+    b.close()
+    a.close()
+    # The first one back fills the idle list, the overflow one is closed
+    assert not created[1].closed and created[0].closed
+    assert pool.stats()["open"] == 1
+
+
+def test_sustained_load_above_size_reuses_connections():
+    pool, created = make_pool(size=5, max_overflow=10, timeout=5)
+    stop = time.monotonic() + 0.3
+
+    def borrower():
+        while time.monotonic() < stop:
+            with pool.connection():
+                time.sleep(0.0005)
+
+    threads = [threading.Thread(target=borrower) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = pool.stats()
+    assert stats["checkouts"] > 100
+    assert stats["created"] <= 15 and stats["created"] - stats["closed"] == stats["open"]
+
+
+def test_connections_returned_after_dispose_are_closed():
+    pool, created = make_pool(size=2, max_overflow=0)
+    held = pool.acquire()
+    with pool.connection():
+        pass
+    pool.dispose()
+    assert created[1].closed and not created[0].closed
+    held.close()
+    assert created[0].closed
+    assert pool.stats()["open"] == 0
+
+
+def test_checkout_times_out_and_counts_waits():
+    pool, _ = make_pool(size=1, max_overflow=0, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    stats = pool.stats()
+    assert stats["waits"] == 1 and stats["timeouts"] == 1
+    held.close()
+
+
+def test_waiter_gets_connection_when_released():
+    pool, created = make_pool(size=1, max_overflow=0, timeout=2)
+    held = pool.acquire()
+    got = []
+
+    def borrower():
+        with pool.connection() as conn:
+            got.append(conn._raw)
+
+    t = threading.Thread(target=borrower)
+    t.start()
+    held.close()
+    t.join(2)
+    assert got == [created[0]]
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+import services
+from conftest import product, query
+from group_commit import GroupCommitWriter
+from reservations import ReservationConflict
+from services import CustomerNotFound
+from storage import SQLiteBackend
+
+
+@pytest.fixture
+def store(tmp_path, make_store):
+    make_store(SQLiteBackend(str(tmp_path / "store.db")), customers=["101"])
+    yield
+    services.close_order_writer()
+
+
+def make_writer(**kwargs):
+    return GroupCommitWriter(lambda: database.borrow_connection(database.settings.db_name),
+                             database.get_backend, **kwargs)
+
+
+def test_batch_commits_once_and_isolates_failing_requests(store):
+    gel, gel_stock = product("Aloe Vera Gel")
+    pen, _ = product("Insulin Pen")
+    writer = make_writer(max_batch=32, max_delay=0.5)
+    futures = [writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 1)])) for _ in range(5)]
+    futures.append(writer.submit(lambda cursor: services.checkout(cursor, "nobody", [(gel, 1)])))
+    futures.append(writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 1), (pen, 999)])))
+    futures += [writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 2)])) for _ in range(2)]
+    writer.close()
+
+    assert isinstance(futures[5].exception(), CustomerNotFound)
+    assert isinstance(futures[6].exception(), ReservationConflict)
+    order_ids = [f.result() for i, f in enumerate(futures) if i not in (5, 6)]
+    assert len(set(order_ids)) == 7
+
+    # Failed requests left nothing behind: no header, no line, no stock taken
+    assert query("SELECT COUNT(*) FROM orders")[0][0] == 7
+    assert query("SELECT COUNT(*) FROM order_lines WHERE product_id = %s", (pen,))[0][0] == 0
+    assert product("Aloe Vera Gel")[1] == gel_stock - 9
+    stats = writer.stats()
+    assert (stats["batches"], stats["requests"], stats["failed_requests"]) == (1, 9, 2)
+    assert stats["max_batch_size"] == 9
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda cursor: None)
+
+
+def test_retryable_errors_rerun_the_batch_then_fall_back_to_single_transactions(store):
+    gel, gel_stock = product("Aloe Vera Gel")
+    failures = {"flaky": 1, "stuck": 99}
+
+    def failing(name):
+        def work(cursor):
+            services.checkout(cursor, "101", [(gel, 1)])
+            if failures[name]:
+                failures[name] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return name
+        return work
+
+    writer = make_writer(max_delay=0.5, retries=2, backoff=0)
+    first = [writer.submit(failing("flaky")), writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 1)]))]
+    assert first[0].result() == "flaky" and first[1].result()
+    assert writer.stats()["batch_retries"] == 1
+
+    second = [writer.submit(failing("stuck")), writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 1)]))]
+    assert isinstance(second[0].exception(), sqlite3.OperationalError)
+    assert second[1].result()
+    writer.close()
+
+    stats = writer.stats()
+    assert stats["fallback_batches"] == 1 and stats["failed_requests"] == 1
+    assert query("SELECT COUNT(*) FROM orders")[0][0] == 3
+    assert product("Aloe Vera Gel")[1] == gel_stock - 3
+
+
+def test_services_group_concurrent_order_writes(store, monkeypatch):
+    monkeypatch.setattr(database.settings, "group_commit", True)
+    monkeypatch.setattr(database.settings, "group_commit_max_delay_ms", 20.0)
+    pen, _ = product("Insulin Pen")
+    query("UPDATE products SET stock = 12 WHERE id = %s", (pen,))
+    database.catalog_cache.invalidate()
+
+    results = []
+
+    def customer():
+        try:
+            results.append(services.place_order("101", {pen: 1}))
+        except ReservationConflict:
+            results.append(None)
+
+    threads = [threading.Thread(target=customer) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    placed = [r for r in results if r is not None]
+    assert len(placed) == 12 and product("Insulin Pen")[1] == 0
+    assert services.cancel_order("101", placed[0]) == [pen]
+    services.update_order_line("101", placed[1], pen, 2)  # takes the unit the cancel returned
+    assert product("Insulin Pen")[1] == 0
+    stats = services.order_writer().stats()
+    assert stats["requests"] == 18 and stats["batches"] < stats["requests"]
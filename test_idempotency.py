@@ -0,0 +1,131 @@
+import sqlite3
+
+import pytest
+
+import bench_idempotency
+import database
+import idempotency
+import services
+from conftest import add_customer, product, query
+from idempotency import IdempotencyKeyReused, KeyInFlight, RecentKeys
+from reservations import ReservationConflict
+from storage import MySQLBackend, SQLiteBackend
+
+
+def order_count():
+    return query("SELECT COUNT(*) FROM orders")[0][0]
+
+
+@pytest.fixture
+def customers(sqlite_portal):
+    add_customer("101")
+    add_customer("102")
+
+
+def test_retried_order_returns_the_first_one(customers):
+    gel, stock = product("Aloe Vera Gel")
+    order_id = services.place_order("101", {gel: 2}, idempotency_key="kiosk-7-0001")
+    assert services.place_order("101", {gel: 2}, idempotency_key="kiosk-7-0001") == order_id
+    assert services.recent_keys.stats()["hits"] == 1
+
+    # A restarted process (or another one) finds the stored result instead
+    services.recent_keys.clear()
+    assert services.place_order("101", [(gel, 1), (gel, 1)], idempotency_key="kiosk-7-0001") == order_id
+    assert order_count() == 1 and product("Aloe Vera Gel")[1] == stock - 2
+
+    with pytest.raises(IdempotencyKeyReused):
+        services.place_order("101", {gel: 3}, idempotency_key="kiosk-7-0001")
+    # Keys belong to one customer; user ids compare like users.user_id
+    assert services.place_order("102", {gel: 2}, idempotency_key="kiosk-7-0001") != order_id
+    services.recent_keys.clear()
+    with pytest.raises(IdempotencyKeyReused):
+        services.cancel_order("101", order_id, idempotency_key="kiosk-7-0001")
+    assert order_count() == 2
+
+
+def test_failed_attempt_leaves_the_key_free(customers):
+    pen, stock = product("Insulin Pen")
+    with pytest.raises(ReservationConflict):
+        services.place_order("101", {pen: stock + 1}, idempotency_key="retry-after-restock")
+    assert query("SELECT COUNT(*) FROM idempotency_keys") == [(0,)]
+    query("UPDATE products SET stock = stock + 1 WHERE id = %s", (pen,))
+    order_id = services.place_order("101", {pen: stock + 1}, idempotency_key="retry-after-restock")
+    assert query("SELECT user_id, idem_key, result FROM idempotency_keys") == [
+        ("101", "retry-after-restock", str(order_id))]
+
+
+def test_retried_update_and_cancel_apply_once(customers):
+    gel, stock = product("Aloe Vera Gel")
+    order_id = services.place_order("101", {gel: 2})
+    for _ in range(2):
+        services.update_order_line("101", order_id, gel, 5, idempotency_key="update-1")
+    assert product("Aloe Vera Gel")[1] == stock - 5
+    # Without the key the same change is a new one: the line no longer holds 2
+    with pytest.raises(services.OrderUnavailable):
+        services.update_order_line("101", order_id, gel, 5, expected_quantity=2)
+
+    assert services.cancel_order("101", order_id, idempotency_key="cancel-1") == [gel]
+    services.recent_keys.clear()
+    assert services.cancel_order("101", order_id, idempotency_key="cancel-1") == [gel]
+    assert product("Aloe Vera Gel")[1] == stock
+    with pytest.raises(ValueError):
+        services.cancel_order("101", order_id, idempotency_key="")
+
+
+def test_keys_with_group_commit_and_purge(customers, monkeypatch):
+    monkeypatch.setattr(database.settings, "group_commit", True)
+    gel, _ = product("Aloe Vera Gel")
+    try:
+        order_id = services.place_order("101", {gel: 1}, idempotency_key="grouped")
+        services.recent_keys.clear()
+        assert services.place_order("101", {gel: 1}, idempotency_key="grouped") == order_id
+    finally:
+        services.close_order_writer()
+    assert order_count() == 1
+
+    assert services.purge_idempotency_keys(days=1) == 0
+    query("UPDATE idempotency_keys SET created_at = '2020-01-01 00:00:00'")
+    assert services.purge_idempotency_keys() == 1
+    assert query("SELECT COUNT(*) FROM idempotency_keys") == [(0,)]
+
+
+def test_recent_keys_drop_the_least_recently_used():
+    keys = RecentKeys(max_keys=2)
+    keys.put("101", "a", "h1", 1)
+    keys.put("101", "b", "h2", 2)
+    assert keys.get("101", "a") == ("h1", 1)
+    keys.put("102", "c", "h3", 3)
+    assert keys.get("101", "b") is None and keys.get("101", "a") == ("h1", 1)
+    assert keys.stats() == {"hits": 2, "misses": 1, "evicted": 1, "keys": 2}
+
+
+# Cursor whose INSERT collides and whose SELECT finds nothing: a MySQL
+# snapshot older than the row that took the key
+class CollidingCursor:
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith("INSERT"):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: idempotency_keys.user_id")
+
+    def fetchone(self):
+        return None
+
+
+def test_invisible_claim_is_a_retryable_conflict():
+    cursor = CollidingCursor()
+    with pytest.raises(KeyInFlight) as excinfo:
+        idempotency.claim(cursor, SQLiteBackend(), "101", "k", "hash")
+    assert SQLiteBackend().is_retryable(excinfo.value)
+    assert MySQLBackend("h", 3306, "u", "p").is_retryable(excinfo.value)
+    assert MySQLBackend("h", 3306, "u", "p").share_lock_sql() == " LOCK IN SHARE MODE"
+
+
+def test_concurrent_attempts_place_one_order(tmp_path):
+    database.configure_backend(SQLiteBackend(str(tmp_path / "portal.db")))
+    try:
+        report = bench_idempotency.run_benchmark(orders=20, races=20, clients=4)
+    finally:
+        database.configure_backend(None)
+    races = report["races"]
+    assert races["orders_created"] == races["keys_with_one_order"] == 20
+    assert races["units_reserved"] == races["units_expected"]
+    assert report["latency"]["retry_cached"]["p50_us"] < report["latency"]["first"]["p50_us"]
@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+import bench_low_stock
+import low_stock
+import services
+import stock_alerts
+from conftest import add_customer, product, query
+from reservations import ReservationConflict
+from services import ProductNotFound
+
+
+def watched():
+    return [row[0] for row in services.low_stock_watchlist()]
+
+
+def alert_kinds():
+    return [(row[1], row[3]) for row in services.stock_alerts()]
+
+
+def scanned():
+    return [row[0] for row in query("SELECT id FROM products WHERE stock < reorder_threshold ORDER BY id")]
+
+
+def test_orders_move_products_on_and_off_the_watchlist(sqlite_portal):
+    add_customer("101")
+    gel, stock = product("Aloe Vera Gel")
+    assert services.set_reorder_threshold(gel, stock - 2) == []
+    assert watched() == []
+
+    order_id = services.place_order("101", {gel: 3})
+    assert watched() == [gel]
+    assert alert_kinds() == [(gel, "low")]
+
+    services.update_order_line("101", order_id, gel, 4)  # lower still: no new alert
+    assert alert_kinds() == [(gel, "low")]
+    services.update_order_line("101", order_id, gel, 1)
+    assert watched() == []
+    services.update_order_line("101", order_id, gel, 5)
+    services.cancel_order("101", order_id)
+    assert watched() == []
+    assert alert_kinds() == [(gel, "low"), (gel, "restocked"), (gel, "low"), (gel, "restocked")]
+    assert watched() == scanned()
+
+
+def test_rejected_writes_raise_no_alerts(sqlite_portal):
+    add_customer("101")
+    gel, stock = product("Aloe Vera Gel")
+    pen, _ = product("Insulin Pen")
+    services.set_reorder_threshold(gel, stock)
+    with pytest.raises(ReservationConflict):
+        services.place_order("101", {gel: 1, pen: 10 ** 6})
+    assert watched() == []
+    assert services.stock_alerts() == []
+
+
+def test_thresholds_new_products_and_deletes(sqlite_portal):
+    gel, stock = product("Aloe Vera Gel")
+    assert services.set_reorder_threshold(gel, stock + 1) == [(gel, "low")]
+    assert services.set_reorder_threshold(gel, 0) == [(gel, "restocked")]
+    with pytest.raises(ProductNotFound):
+        services.set_reorder_threshold(10 ** 6, 5)
+    with pytest.raises(ValueError):
+        services.set_reorder_threshold(gel, -1)
+
+    new = services.add_product("Zinc Drops", "Nutrition", "Vitamins", 50, 2, reorder_threshold=5)
+    assert watched() == [new]
+    services.delete_product(new)
+    assert watched() == []
+
+
+def test_catalog_restock_clears_the_watchlist(sqlite_portal):
+    gel, stock = product("Aloe Vera Gel")
+    services.set_reorder_threshold(gel, stock + 1)
+    name, category, subcategory = query("""
+        SELECT p.name, c.name, s.name FROM products p
+        JOIN subcategories s ON s.id = p.subcategory_id JOIN categories c ON c.id = s.category_id
+        WHERE p.id = %s
+    """, (gel,))[0]
+    with services.borrow_connection(services.settings.db_name) as conn:
+        cursor = conn.cursor()
+        services.upsert_products(cursor, [(name, category, subcategory, 10, stock + 50)])
+        conn.commit()
+        cursor.close()
+    assert watched() == []
+    assert alert_kinds()[-1] == (gel, "restocked")
+
+
+def test_feed_appends_only_new_alerts(sqlite_portal, tmp_path):
+    gel, stock = product("Aloe Vera Gel")
+    feed = str(tmp_path / "alerts.jsonl")
+    assert stock_alerts.append_alerts(feed) == 0
+    services.set_reorder_threshold(gel, stock + 1)
+    assert stock_alerts.append_alerts(feed) == 1
+    assert stock_alerts.append_alerts(feed) == 0
+    services.set_reorder_threshold(gel, 0)
+    assert stock_alerts.append_alerts(feed, batch_size=1) == 1
+
+    with open(feed) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["product_id"], r["product"], r["kind"]) for r in records] == [
+        (gel, "Aloe Vera Gel", "low"), (gel, "Aloe Vera Gel", "restocked")]
+    assert stock_alerts.recent_alert_ids(feed, 1) == {r["id"] for r in records}
+
+    # A run that died mid-record leaves a partial line: later runs skip it
+    with open(feed, "a") as f:
+        f.write('{"id": 99, "prod')
+    assert stock_alerts.recent_alert_ids(feed, 2) == {r["id"] for r in records}
+    services.set_reorder_threshold(gel, stock + 1)
+    assert stock_alerts.append_alerts(feed) == 1
+    with open(feed) as f:
+        lines = f.read().splitlines()
+    assert lines[-2] == '{"id": 99, "prod' and json.loads(lines[-1])["kind"] == "low"
+    assert len(stock_alerts.recent_alert_ids(feed, 4)) == 3
+
+
+def test_feed_picks_up_alerts_that_commit_late(sqlite_portal, tmp_path, monkeypatch):
+    gel, stock = product("Aloe Vera Gel")
+    feed = str(tmp_path / "alerts.jsonl")
+
+    def alert(alert_id):
+        query("""
+            INSERT INTO stock_alerts (id, product_id, kind, stock, threshold, created_at)
+            VALUES (%s, %s, 'low', %s, %s, '2024-01-01 00:00:00')
+        """, (alert_id, gel, stock, stock + 1))
+
+    # The checkout that took id 50 commits after the one that took 100 was fed
+    alert(100)
+    assert stock_alerts.append_alerts(feed) == 1
+    alert(50)
+    assert stock_alerts.append_alerts(feed) == 1
+
+    # Stopped after writing, before marking: the rerun does not repeat them
+    services.set_reorder_threshold(gel, stock + 1)
+    marked = services.mark_stock_alerts_delivered
+    monkeypatch.setattr(services, "mark_stock_alerts_delivered", lambda ids: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        stock_alerts.append_alerts(feed)
+    monkeypatch.setattr(services, "mark_stock_alerts_delivered", marked)
+    assert stock_alerts.append_alerts(feed) == 0
+    with open(feed) as f:
+        ids = [json.loads(line)["id"] for line in f]
+    assert len(ids) == len(set(ids)) == 3 and ids[:2] == [100, 50]
+    assert services.pending_stock_alerts() == []
+
+
+def test_rebuild_repairs_a_stale_watchlist(sqlite_portal):
+    gel, stock = product("Aloe Vera Gel")
+    query("UPDATE products SET reorder_threshold = %s WHERE id = %s", (stock + 1, gel))
+    with services.borrow_connection(services.settings.db_name) as conn:
+        cursor = conn.cursor()
+        assert low_stock.rebuild(cursor, chunk_size=2) == [(gel, "low")]
+        conn.commit()
+        cursor.close()
+    assert watched() == scanned() == [gel]
+
+
+def test_benchmark_runs_and_matches_the_scan(sqlite_portal):
+    report = bench_low_stock.run_benchmark(products=300, watched=0.2, reads=2, orders=20)
+    assert report["watchlist_matches_scan"]
+    assert report["listed_after_orders"] > report["listed_before_orders"]
+    assert report["alerts"] >= report["listed_after_orders"]
@@ -0,0 +1,115 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+import database
+import metrics
+import portal_server
+import services
+from conftest import query
+from portal_server import HTTPError
+
+
+@pytest.fixture
+def instrumented(monkeypatch, tmp_path, make_store):
+    monkeypatch.setattr(database.settings, "metrics_enabled", True)
+    monkeypatch.setattr(database.settings, "metrics_slow_query_ms", 100.0)
+    monkeypatch.setattr(database.settings, "metrics_slow_query_log", str(tmp_path / "slow.jsonl"))
+    monkeypatch.setattr(database.settings, "metrics_dump_path", str(tmp_path / "metrics.json"))
+    monkeypatch.setattr(database.settings, "metrics_dump_interval", 3600.0)
+    make_store(customers=["101"])
+    metrics.registry().reset()
+    yield metrics.registry()
+    metrics.disable()
+
+
+def test_normalize_sql_folds_lists_of_any_length():
+    two = metrics.normalize_sql("SELECT id FROM products\n   WHERE id IN (%s, %s)")
+    three = metrics.normalize_sql("SELECT id FROM products WHERE id IN (%s,%s, %s)")
+    assert two == three == "SELECT id FROM products WHERE id IN (%s, ...)"
+    assert metrics.normalize_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)") == \
+        "INSERT INTO t (a, b) VALUES (%s, ...), ..."
+    assert metrics.normalize_sql("UPDATE p SET s = CASE id WHEN %s THEN %s WHEN %s THEN %s END") == \
+        "UPDATE p SET s = CASE id WHEN %s THEN %s ... END"
+
+
+def test_off_by_default_wraps_nothing(sqlite_portal):
+    assert metrics.registry() is None
+    assert not isinstance(database.get_backend(), metrics.InstrumentedBackend)
+    assert services.list_categories()  # @timed passes straight through
+
+
+def test_operations_and_statements_are_recorded(instrumented):
+    gel = query("SELECT id FROM products WHERE name = 'Aloe Vera Gel'")[0][0]
+    order_id = services.place_order("101", {gel: 1})
+    services.cancel_order("101", order_id)
+    services.get_order(order_id)
+
+    snapshot = instrumented.snapshot()
+    place = snapshot["operations"]["services.place_order"]
+    assert place["count"] == 1 and place["errors"] == 0
+    assert place["round_trips"] >= 4  # header, stock, lines, ... and the commit
+    # checkout runs inside place_order: its statements count for both
+    assert snapshot["operations"]["services.checkout"]["round_trips"] < place["round_trips"]
+    assert snapshot["operations"]["services.get_order"]["rows"] >= 2  # header and its line
+    assert snapshot["statements"]["COMMIT"]["count"] >= 2
+    assert any(sql.startswith("INSERT INTO orders") for sql in snapshot["statements"])
+    assert snapshot["checkouts"]["count"] >= 3
+
+
+def test_failed_operations_count_as_errors(instrumented):
+    with pytest.raises(services.OrderUnavailable):
+        services.cancel_order("101", 10 ** 6)
+    assert instrumented.snapshot()["operations"]["services.cancel_order"]["errors"] == 1
+
+
+def test_slow_queries_are_logged(instrumented, tmp_path):
+    instrumented.slow_query_ms = 0.0
+    services.list_categories()
+    services.get_order(1)
+    slow = instrumented.slow_queries()
+    assert slow and all(entry["ms"] >= 0 for entry in slow)
+    assert {entry["operation"] for entry in slow} >= {"services.get_order"}
+    with open(tmp_path / "slow.jsonl") as f:
+        assert len(f.readlines()) == len(slow)
+
+
+def test_slow_query_file_is_written_outside_the_registry_lock(tmp_path):
+    registry = metrics.MetricsRegistry(slow_query_ms=0.0, slow_query_log=str(tmp_path / "slow.jsonl"))
+    held = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        held.append(registry._lock.locked())
+        return real_open(*args, **kwargs)
+
+    with patch("builtins.open", tracking_open):
+        registry.observe_statement("SELECT 1", 5.0)
+    assert held == [False] and len(registry.slow_queries()) == 1
+
+
+def test_prometheus_text_and_json_dump(instrumented, tmp_path):
+    services.get_order(1)
+    status, text = portal_server.dispatch("GET", "/metrics", {}, {})
+    assert status == 200
+    assert '# TYPE portal_operation_seconds histogram' in text
+    assert 'portal_operation_seconds_bucket{operation="services.get_order",le="+Inf"} 1' in text
+    assert 'portal_operation_seconds_count{operation="services.get_order"} 1' in text
+    assert "portal_sql_rows_total{statement=" in text
+
+    metrics.disable()  # stops the dumper, which writes a last snapshot
+    with open(tmp_path / "metrics.json") as f:
+        assert json.load(f)["operations"]["services.get_order"]["count"] == 1
+    with pytest.raises(HTTPError) as err:
+        portal_server.dispatch("GET", "/metrics", {}, {})
+    assert err.value.status == 404
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = metrics.Histogram()
+    for ms in (0.2, 0.2, 0.2, 3.0, 40.0):
+        histogram.observe(ms)
+    assert histogram.percentile(50) == 0.25
+    assert histogram.percentile(80) == 5
+    assert histogram.percentile(100) == 40.0
@@ -0,0 +1,79 @@
+import pytest
+
+import database
+import migrations
+from conftest import query
+from storage import SQLiteBackend
+
+
+def sqlite_indexes(table):
+    return {row[0] for row in query("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s", (table,))}
+
+
+# Store migrated only up to a given version, for seeding rows the later
+# migrations have to cope with
+@pytest.fixture
+def migrate_to():
+    database.configure_backend(SQLiteBackend(":memory:"))
+
+    def migrate(version):
+        with database.borrow_connection() as conn:
+            return migrations.migrate(conn, database.get_backend(),
+                                      [m for m in migrations.MIGRATIONS if m[0] <= version])
+    yield migrate
+    database.configure_backend(None)
+
+
+def test_migrations_create_hot_path_indexes(sqlite_portal):
+    assert {"idx_orders_user_status", "idx_orders_requested", "idx_orders_user_requested"} <= sqlite_indexes("orders")
+    assert {"uq_products_subcategory_name", "idx_products_subcategory_stock"} <= sqlite_indexes("products")
+    versions = [row[0] for row in query("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [m[0] for m in migrations.MIGRATIONS]
+
+
+def test_only_pending_migrations_run(sqlite_portal):
+    assert database.apply_migrations() == []
+
+    ran = []
+    extra = migrations.MIGRATIONS + [(99, "test step", lambda cursor, backend: ran.append(99))]
+    with database.borrow_connection() as conn:
+        assert migrations.migrate(conn, database.get_backend(), extra) == [(99, "test step")]
+        assert migrations.migrate(conn, database.get_backend(), extra) == []
+    assert ran == [99]
+
+
+def test_browse_query_uses_index(sqlite_portal):
+    plan = query("""
+        EXPLAIN QUERY PLAN SELECT id FROM orders
+        WHERE user_id = '101' AND status != 'Cancelled'
+    """)
+    assert any("idx_orders_user" in row[-1] for row in plan)
+
+
+def test_names_equal_once_trimmed_are_merged(migrate_to):
+    migrate_to(3)
+    query("""
+        INSERT INTO products (name, category, subcategory, price, stock) VALUES
+        ('Face Wash', 'Personal Care', 'Skin Care', 149, 10),
+        ('Face Wash ', 'Personal Care', 'Skin Care', 149, 5)
+    """)
+    database.apply_migrations()
+    assert query("SELECT name, stock FROM products") == [("Face Wash", 15)]
+    assert "uq_products_catalog" not in sqlite_indexes("products")
+
+
+def test_catalog_key_merges_products_listed_twice(migrate_to):
+    migrate_to(1)
+    query("""
+        INSERT INTO products (name, category, subcategory, price, stock) VALUES
+        ('Shampoo', 'Personal Care', 'Hair Care', 199, 7),
+        ('shampoo', 'Personal Care', 'Hair Care', 199, 3),
+        ('Shampoo', 'Personal Care', 'Baby Care', 249, 2)
+    """)
+    query("""
+        INSERT INTO orders (user_id, product_id, quantity, status, shipping_city, shipping_state, shipping_pincode)
+        VALUES ('101', 2, 1, 'Placed', 'Pune', 'MH', '411001')
+    """)
+    database.apply_migrations()
+    assert query("SELECT id, stock FROM products ORDER BY id") == [(1, 10), (3, 2)]
+    assert query("SELECT product_id, quantity FROM order_lines") == [(1, 1)]
@@ -0,0 +1,129 @@
+import csv
+import gzip
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+import bench_archive
+import data_export
+import order_archive
+import pharmacy_portal
+import services
+from conftest import add_customer, product, query
+
+
+# Places an order for user_id, then moves it days back and into status
+def old_order(user_id, product_id, days, status):
+    order_id = services.place_order(user_id, {product_id: 1})
+    if status == "Cancelled":
+        services.cancel_order(user_id, order_id)
+    elif status != "Placed":
+        query("UPDATE orders SET status = %s WHERE id = %s", (status, order_id))
+    query("UPDATE orders SET requested_date = %s WHERE id = %s",
+          (datetime.now().replace(microsecond=0) - timedelta(days=days), order_id))
+    return order_id
+
+
+@pytest.fixture
+def history(sqlite_portal):
+    add_customer("101")
+    add_customer("102")
+    gel, _ = product("Aloe Vera Gel")
+    pen, _ = product("Insulin Pen")
+    orders = {
+        "old_cancelled": old_order("101", gel, 400, "Cancelled"),
+        "old_delivered": old_order("101", pen, 300, "Delivered"),
+        "old_placed": old_order("101", gel, 350, "Placed"),
+        "recent_delivered": old_order("101", gel, 10, "Delivered"),
+        "other_old_delivered": old_order("102", gel, 200, "Delivered"),
+        "live": services.place_order("101", {pen: 2}),
+    }
+    services.rebuild_summaries()  # the orders were moved back in time behind their back
+    return orders
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def test_only_old_final_orders_move_in_batches(history):
+    report_before = services.sales_report(days=1000)
+    report = order_archive.archive_orders(days=180, batch_size=2)
+    assert (report["orders_archived"], report["lines_archived"], report["batches"]) == (3, 3, 2)
+
+    archived = [history["old_cancelled"], history["old_delivered"], history["other_old_delivered"]]
+    assert sorted(ids(query("SELECT id FROM orders_archive"))) == sorted(archived)
+    assert sorted(ids(query("SELECT order_id FROM order_lines_archive"))) == sorted(archived)
+    assert sorted(ids(query("SELECT id FROM orders"))) == sorted(
+        [history["old_placed"], history["recent_delivered"], history["live"]])
+    assert query(f"SELECT COUNT(*) FROM order_lines WHERE order_id IN {tuple(archived)}") == [(0,)]
+
+    # History is unchanged: the summaries count the archive as well
+    assert services.summary_drift() == []
+    assert services.sales_report(days=1000) == report_before
+    assert order_archive.archive_orders(days=180)["orders_archived"] == 0
+
+
+def test_listings_include_archived_orders_when_asked(history):
+    before, _ = services.fetch_orders_page("101")
+    order_archive.archive_orders(days=180)
+
+    live, _ = services.fetch_orders_page("101")
+    assert ids(live) == [history["live"], history["recent_delivered"], history["old_placed"]]
+    everything, _ = services.fetch_orders_page("101", include_archived=True)
+    assert everything == before
+    assert ids(services.iter_orders("101", include_archived=True, page_size=2)) == ids(before)
+    delivered, _ = services.fetch_orders_page(status="Delivered", include_archived=True)
+    assert ids(delivered) == [history["recent_delivered"], history["other_old_delivered"], history["old_delivered"]]
+
+    order, lines = services.get_order(history["old_delivered"])
+    assert order[2] == "Delivered" and lines == [("Insulin Pen", 1)]
+    assert services.get_order(10 ** 6) is None
+    # Updates and cancels only ever see live orders; archived ones are final
+    with pytest.raises(services.OrderUnavailable):
+        services.cancel_order("101", history["old_delivered"])
+
+
+def test_archived_lines_outlive_their_product(history):
+    order_archive.archive_orders(days=180)
+    foot = services.add_product("Foot Balm", "Personal Care", "Hand and Foot care", 120.0, 5)
+    order_id = old_order("102", foot, 500, "Delivered")
+    services.rebuild_summaries()
+    order_archive.archive_orders(days=180)
+    services.delete_product(foot)
+    assert services.get_order(order_id)[1] == [("(deleted)", 1)]
+
+
+def test_console_archive_and_history(history, capsys):
+    with patch("builtins.input", lambda _: "180"):
+        pharmacy_portal.archive_orders()
+    assert "✅ Archived 3 orders placed before" in capsys.readouterr().out
+
+    pharmacy_portal.view_orders("101")
+    assert "Insulin Pen                    1     Delivered" not in capsys.readouterr().out
+    pharmacy_portal.view_orders("101", include_archived=True)
+    out = capsys.readouterr().out
+    assert "Your Order History:" in out and f"{history['old_delivered']:<10} Insulin Pen" in out
+
+    with patch("builtins.input", lambda _: "-1"):
+        pharmacy_portal.archive_orders()
+    assert "⚠️ Days must not be negative." in capsys.readouterr().out
+
+
+def test_archive_export_and_cli(history, tmp_path, capsys):
+    assert order_archive.main(["--days", "180", "--batch-size", "1", "--max-batches", "2"])["orders_archived"] == 2
+    assert "✅ Archived 2 orders (2 lines)" in capsys.readouterr().out
+
+    path = str(tmp_path / "archive.csv.gz")
+    data_export.export_table("orders_archive", path, status="Cancelled")
+    with gzip.open(path, "rt", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [row[0] for row in rows[1:]] == [str(history["old_cancelled"])]
+
+
+def test_benchmark_keeps_every_history(sqlite_portal):
+    report = bench_archive.run_benchmark(orders=400, lines=2, days=90, batch_size=50)
+    assert report["archive"]["orders_archived"] > 0
+    assert report["sizes_after"]["orders"] == report["sizes_before"]["orders"] - report["archive"]["orders_archived"]
+    assert report["histories_match"]
@@ -0,0 +1,74 @@
+import json
+
+import order_ingest
+import services
+from conftest import add_customer, product, query
+
+
+def write_lines(path, lines):
+    path.write_text("".join((line if isinstance(line, str) else json.dumps(line)) + "\n" for line in lines))
+    return str(path)
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_every_line_gets_a_result_in_input_order(sqlite_portal, tmp_path):
+    add_customer("101", city="Pune")
+    add_customer("102", city="Nashik")
+    gel, gel_stock = product("Aloe Vera Gel")
+    pen, pen_stock = product("Insulin Pen")
+    path = write_lines(tmp_path / "orders.jsonl", [
+        {"user_id": "101", "product_id": gel, "quantity": 2},
+        {"user_id": 102, "product_id": pen, "quantity": pen_stock, "shipping_city": "Nagpur"},
+        {"user_id": "999", "product_id": gel, "quantity": 1},
+        {"user_id": "101", "product_id": 10 ** 6, "quantity": 1},
+        {"user_id": "101", "product_id": pen, "quantity": 1},  # the line before took the last pens
+        "{not json",
+        {"user_id": "101", "product_id": gel, "quantity": 0},
+        "",
+        {"user_id": "101", "product_id": gel, "quantity": "3"},
+    ])
+
+    report = order_ingest.ingest_orders(path, chunk_size=4)
+    assert report["lines_read"] == 8 and report["orders_placed"] == 3 and report["lines_rejected"] == 5
+    assert report["chunks"] == 2 and report["results_path"] == str(tmp_path / "orders.results.jsonl")
+
+    results = read_results(report["results_path"])
+    assert [(r["line"], r["status"]) for r in results] == [
+        (1, "placed"), (2, "placed"), (3, "rejected"), (4, "rejected"), (5, "rejected"),
+        (6, "rejected"), (7, "rejected"), (9, "placed"),
+    ]
+    assert [r.get("error") for r in results if r["status"] == "rejected"] == [
+        "customer not found", "product not found", "only 0 in stock",
+        results[5]["error"], "quantity must be a positive integer",
+    ]
+    assert results[5]["error"].startswith("invalid JSON")
+
+    first, second, last = results[0]["order_id"], results[1]["order_id"], results[7]["order_id"]
+    assert query("SELECT id, user_id, shipping_city FROM orders ORDER BY id") == [
+        (first, 101, "Pune"), (second, 102, "Nagpur"), (last, 101, "Pune"),
+    ]
+    assert query("SELECT order_id, product_id, quantity FROM order_lines ORDER BY order_id") == [
+        (first, gel, 2), (second, pen, pen_stock), (last, gel, 3),
+    ]
+    assert product("Aloe Vera Gel")[1] == gel_stock - 5 and product("Insulin Pen")[1] == 0
+    assert services.summary_drift() == []
+    assert services.get_product(pen)[3] == 0
+
+
+def test_ingested_orders_behave_like_placed_ones(sqlite_portal, tmp_path):
+    add_customer("101")
+    gel, stock = product("Aloe Vera Gel")
+    services.set_reorder_threshold(gel, stock - 1)
+    path = write_lines(tmp_path / "orders.jsonl", [{"user_id": "101", "product_id": gel, "quantity": 2}])
+    report = order_ingest.ingest_orders(path, results_path=str(tmp_path / "out.jsonl"))
+    order_id = read_results(tmp_path / "out.jsonl")[0]["order_id"]
+
+    assert report["orders_placed"] == 1
+    assert [row[0] for row in services.low_stock_watchlist()] == [gel]
+    assert services.cancel_order("101", order_id) == [gel]
+    assert product("Aloe Vera Gel")[1] == stock
+    assert services.summary_drift() == []
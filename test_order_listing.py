@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import database
+import services
+from conftest import add_customer, query
+
+
+def seed_orders(count):
+    add_customer("101")
+    add_customer("202")
+    product_id = query("SELECT id FROM products WHERE name = 'Face Wash'")[0][0]
+    base = datetime(2024, 1, 1, 9, 0)
+    for i in range(count):
+        # Pairs of orders share a timestamp so the id tie-breaker matters
+        query("""
+            INSERT INTO orders (id, user_id, status, requested_date, shipping_city)
+            VALUES (%s, %s, %s, %s, 'Pune')
+        """, (i + 1, "101" if i % 3 else "202", "Cancelled" if i % 4 == 0 else "Placed",
+              base + timedelta(hours=i // 2)))
+        query("INSERT INTO order_lines (order_id, product_id, quantity, unit_price) VALUES (%s, %s, 1, 149)",
+              (i + 1, product_id))
+
+
+def test_pages_walk_every_order_newest_first(sqlite_portal):
+    seed_orders(23)
+    rows, after = services.fetch_orders_page(limit=5)
+    assert len(rows) == 5 and after == (rows[-1][5], rows[-1][0])
+
+    ids = [row[0] for row in services.iter_orders(page_size=4)]
+    expected = [r[0] for r in query("SELECT id FROM orders ORDER BY requested_date DESC, id DESC")]
+    assert ids == expected and len(set(ids)) == 23
+
+
+def test_filters_by_user_status_and_date_range(sqlite_portal):
+    seed_orders(23)
+    since, until = datetime(2024, 1, 1, 12, 0), datetime(2024, 1, 1, 15, 0)
+    rows = list(services.iter_orders(user_id="101", status="Placed", since=since, until=until, page_size=2))
+    expected = query("""
+        SELECT id FROM orders WHERE user_id = '101' AND status = 'Placed'
+        AND requested_date >= %s AND requested_date < %s ORDER BY requested_date DESC, id DESC
+    """, (since, until))
+    assert [r[0] for r in rows] == [r[0] for r in expected] and rows
+
+
+def test_view_orders_streams_pages(sqlite_portal):
+    seed_orders(7)
+    database.settings.order_page_size = 2
+    try:
+        with patch("builtins.print") as mock_print:
+            sqlite_portal.view_orders(admin=True)
+    finally:
+        database.settings.order_page_size = 100
+    printed = [call.args[0] for call in mock_print.call_args_list]
+    assert len(printed) == 2 + 7
@@ -0,0 +1,251 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import bench_http
+import database
+import services
+from conftest import add_customer, product, query
+from db_pool import PoolTimeout
+from portal_server import PortalHTTPServer
+from storage import SQLiteBackend
+
+
+# Server on an ephemeral port over a file-backed SQLite store (shared by the worker threads)
+@pytest.fixture
+def server(tmp_path, make_store):
+    make_store(SQLiteBackend(str(tmp_path / "store.db")), customers=["101"])
+    httpd = PortalHTTPServer(("127.0.0.1", 0), workers=4)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+class Client:
+    def __init__(self, httpd):
+        self.conn = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+        self.token = None
+
+    def login(self, user_id, password="secret", role="Customer"):
+        status, body, _ = self("POST", "/sessions", {"user_id": user_id, "password": password, "role": role})
+        assert status == 201
+        self.token = body["token"]
+
+    def __call__(self, method, path, body=None, idempotency_key=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        self.conn.request(method, path, body=payload, headers=headers)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read()), response
+
+
+def test_browse_catalog_over_one_keep_alive_connection(server):
+    client = Client(server)
+    status, categories, response = client("GET", "/categories")
+    assert status == 200 and response.getheader("Server-Timing").startswith("app;dur=")
+    assert [c["name"] for c in categories] == [name for _, name in services.list_categories()]
+
+    status, subcategories, _ = client("GET", f"/categories/{categories[0]['id']}/subcategories")
+    assert status == 200 and subcategories
+    status, products, _ = client("GET", f"/subcategories/{subcategories[0]['id']}/products?in_stock=1")
+    assert status == 200 and all(p["stock"] > 0 for p in products)
+    status, product, _ = client("GET", f"/products/{products[0]['id']}")
+    assert status == 200 and product["name"] == products[0]["name"]
+
+    # Every request above went over the first socket
+    assert client.conn.sock is not None
+    assert client("GET", "/products/999999")[0] == 404
+    assert client("GET", "/nowhere")[0] == 404
+    assert client("PATCH", "/categories")[0] == 405
+    assert client("GET", "/categories/abc/subcategories")[0] == 400
+
+
+def test_search_products_by_words(server):
+    client = Client(server)
+    status, products, _ = client("GET", "/products?q=vit%20tab")
+    assert status == 200 and [p["name"] for p in products] == ["Vitamin C Tablets"]
+    status, products, _ = client("GET", "/products?q=care&limit=2")
+    assert status == 200 and len(products) == 2
+    assert client("GET", "/products")[0] == 400
+    assert client("GET", "/products?q=care&limit=0")[0] == 400
+
+
+def test_order_lifecycle(server):
+    client = Client(server)
+    client.login("101")
+    gel, pen = product("Aloe Vera Gel")[0], product("Insulin Pen")[0]
+    query("UPDATE products SET stock = 5 WHERE id = %s", (pen,))
+    database.catalog_cache.invalidate()
+
+    status, body, _ = client("POST", "/orders", {"items": [
+        {"product_id": gel, "quantity": 2}, {"product_id": pen, "quantity": 1}]})
+    assert status == 201
+    order_id = body["order_id"]
+
+    status, order, _ = client("GET", f"/orders/{order_id}")
+    assert status == 200 and order["quantity"] == 3 and len(order["items"]) == 2
+
+    status, body, _ = client("POST", "/orders", {"items": [{"product_id": pen, "quantity": 9}]})
+    assert status == 409 and body["shortages"] == [{"product_id": pen, "available": 4}]
+    assert client("POST", "/orders", {"user_id": "102", "items": [{"product_id": gel, "quantity": 1}]})[0] == 403
+    assert client("POST", "/orders", {})[0] == 400
+
+    patch = {"product_id": pen, "quantity": 3, "expected_quantity": 1}
+    assert client("PATCH", f"/orders/{order_id}", patch)[0] == 200
+    assert client("PATCH", f"/orders/{order_id}", patch)[0] == 409  # stale expected quantity
+    assert product("Insulin Pen")[1] == 2
+
+    status, body, _ = client("POST", f"/orders/{order_id}/cancel", {})
+    assert status == 200 and sorted(body["released_products"]) == sorted([gel, pen])
+    assert client("POST", f"/orders/{order_id}/cancel", {})[0] == 409
+    assert product("Insulin Pen")[1] == 5
+
+
+def test_sessions_guard_order_changes(server):
+    client = Client(server)
+    gel = product("Aloe Vera Gel")[0]
+    order = {"items": [{"product_id": gel, "quantity": 1}]}
+    assert client("POST", "/orders", order)[0] == 401
+    assert client("POST", "/sessions", {"user_id": "101", "password": "wrong", "role": "Customer"})[0] == 401
+
+    services.register_user("900", "admin-pw", "Admin", "a@example.com", 40, "", "", "", "")
+    client.login("900", "admin-pw", "Admin")
+    assert client("POST", "/orders", order)[0] == 400  # admins name the customer
+    assert client("POST", "/orders", {"user_id": "101", **order})[0] == 201
+    assert client("POST", "/orders", {"user_id": "nobody", **order})[0] == 404
+
+    assert client("DELETE", "/sessions")[0] == 200
+    assert client("POST", "/orders", {"user_id": "101", **order})[0] == 401
+    client.token = None
+    assert client("GET", "/categories")[0] == 200
+
+
+def test_bad_requests_and_failures_still_get_a_response(server, monkeypatch):
+    client = Client(server)
+    client.login("101")
+    status, body, _ = client("POST", "/orders", {"items": [1]})
+    assert status == 400 and body["error"] == "items must be a list of objects"
+
+    def broken():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(services, "list_categories", broken)
+    status, body, _ = client("GET", "/categories")
+    assert status == 500 and body == {"error": "internal server error"}
+
+    def busy(*args, **kwargs):
+        raise PoolTimeout("no connection")
+
+    monkeypatch.setattr(services, "get_product", busy)
+    assert client("GET", "/products/1")[0] == 503
+    assert client("GET", "/sessions")[0] == 405  # the keep-alive connection is still fine
+
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    conn.putrequest("POST", "/sessions")
+    conn.putheader("Content-Length", "lots")
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 400 and "Content-Length" in json.loads(response.read())["error"]
+    conn.close()
+
+
+def test_order_reads_need_a_session_and_stay_with_their_customer(server):
+    add_customer("102")
+    gel = product("Aloe Vera Gel")[0]
+    order = {"items": [{"product_id": gel, "quantity": 1}]}
+    own, other = Client(server), Client(server)
+    own.login("101")
+    other.login("102")
+    order_id = own("POST", "/orders", order)[1]["order_id"]
+    other_id = other("POST", "/orders", order)[1]["order_id"]
+
+    anonymous = Client(server)
+    assert anonymous("GET", "/orders")[0] == 401
+    assert anonymous("GET", f"/orders/{order_id}")[0] == 401
+
+    assert [o["id"] for o in own("GET", "/orders")[1]["orders"]] == [order_id]
+    assert own("GET", "/orders?user_id=102")[0] == 403
+    assert own("GET", f"/orders/{order_id}")[0] == 200
+    assert own("GET", f"/orders/{other_id}")[0] == 404
+
+    services.register_user("900", "admin-pw", "Admin", "a@example.com", 40, "", "", "", "")
+    admin = Client(server)
+    admin.login("900", "admin-pw", "Admin")
+    assert sorted(o["id"] for o in admin("GET", "/orders")[1]["orders"]) == [order_id, other_id]
+    assert [o["id"] for o in admin("GET", "/orders?user_id=102")[1]["orders"]] == [other_id]
+    assert admin("GET", f"/orders/{other_id}")[1]["user_id"] == other("GET", f"/orders/{other_id}")[1]["user_id"]
+
+
+def test_order_listing_pages_with_the_after_token(server):
+    client = Client(server)
+    client.login("101")
+    gel = product("Aloe Vera Gel")[0]
+    for _ in range(5):
+        assert client("POST", "/orders", {"items": [{"product_id": gel, "quantity": 1}]})[0] == 201
+
+    seen = []
+    path = "/orders?user_id=101&limit=2"
+    while True:
+        status, page, _ = client("GET", path)
+        assert status == 200 and len(page["orders"]) <= 2
+        seen.extend(o["id"] for o in page["orders"])
+        if page["next_after"] is None:
+            break
+        path = f"/orders?user_id=101&limit=2&after={page['next_after']}"
+    assert len(seen) == len(set(seen)) == 5
+    assert client("GET", "/orders?after=yesterday,1")[0] == 400
+
+
+def test_retried_requests_with_an_idempotency_key_apply_once(server):
+    client = Client(server)
+    client.login("101")
+    cart = {"items": [{"product_id": product("Aloe Vera Gel")[0], "quantity": 2}]}
+    first = client("POST", "/orders", cart, idempotency_key="kiosk-3-17")
+    retry = client("POST", "/orders", cart, idempotency_key="kiosk-3-17")
+    assert first[0] == retry[0] == 201 and first[1] == retry[1]
+    assert query("SELECT COUNT(*) FROM orders") == [(1,)]
+
+    status, body, _ = client("POST", "/orders", {"items": []}, idempotency_key="kiosk-3-17")
+    assert status == 400  # an empty cart never gets as far as the key
+    cart["items"][0]["quantity"] = 3
+    status, body, _ = client("POST", "/orders", cart, idempotency_key="kiosk-3-17")
+    assert status == 422 and "already used" in body["error"]
+
+    order_id = first[1]["order_id"]
+    for _ in range(2):
+        status, body, _ = client("POST", f"/orders/{order_id}/cancel", {}, idempotency_key="kiosk-3-18")
+        assert status == 200 and body["released_products"] == [product("Aloe Vera Gel")[0]]
+    assert client("POST", f"/orders/{order_id}/cancel", {})[0] == 409
+
+
+def test_archived_orders_are_listed_when_asked(server):
+    client = Client(server)
+    client.login("101")
+    status, body, _ = client("POST", "/orders", {"items": [{"product_id": product("Aloe Vera Gel")[0], "quantity": 1}]})
+    order_id = body["order_id"]
+    assert client("POST", f"/orders/{order_id}/cancel", {})[0] == 200
+    query("UPDATE orders SET requested_date = '2020-01-01 10:00:00' WHERE id = %s", (order_id,))
+    assert services.archive_orders(days=30)["orders_archived"] == 1
+
+    assert client("GET", "/orders?user_id=101")[1]["orders"] == []
+    status, page, _ = client("GET", "/orders?user_id=101&archived=1")
+    assert [(o["id"], o["status"]) for o in page["orders"]] == [(order_id, "Cancelled")]
+    assert client("GET", f"/orders/{order_id}")[1]["status"] == "Cancelled"
+
+
+def test_load_test_keeps_the_stock_ledger(tmp_path):
+    database.configure_backend(SQLiteBackend(str(tmp_path / "bench.db")))
+    try:
+        report = bench_http.run_load_test(clients=4, requests=25, workers=4, stock=50)
+    finally:
+        database.configure_backend(None)
+    assert report["total_requests"] == 100
+    assert report["server_errors"] == 0 and report["connections_opened"] == 4
+    assert report["consistency"]["violations"] == 0
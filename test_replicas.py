@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+import bench_replicas
+import database
+import services
+from conftest import product
+from replicas import ReplicaRouter
+from storage import SQLiteBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePool:
+    def __init__(self, name):
+        self.name = name
+        self.up = True
+        self.acquired = 0
+
+    def acquire(self):
+        if not self.up:
+            raise ConnectionError(f"{self.name} is down")
+        self.acquired += 1
+        return self.name
+
+    def dispose(self):
+        pass
+
+
+def make_router(count=2, **kwargs):
+    pools = [FakePool(f"r{i}") for i in range(1, count + 1)]
+    clock = FakeClock()
+    return ReplicaRouter([(pool.name, pool) for pool in pools], clock=clock, **kwargs), pools, clock
+
+
+def in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_round_robin_skips_failed_replicas_until_retry():
+    router, pools, clock = make_router(retry_interval=5)
+    assert [router.acquire() for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+
+    pools[0].up = False
+    assert [router.acquire() for _ in range(3)] == ["r2", "r2", "r2"]
+    pools[1].up = False
+    assert router.acquire() is None  # both down: the primary
+
+    pools[0].up = pools[1].up = True
+    clock.now = 4
+    assert router.acquire() is None  # still sitting out
+    clock.now = 6
+    assert {router.acquire(), router.acquire()} == {"r1", "r2"}
+    stats = router.stats()
+    assert stats["fallbacks"] == 2
+    assert [(r["reads"], r["failures"], r["healthy"]) for r in stats["replicas"]] == [(3, 1, True), (6, 1, True)]
+
+
+def test_writers_read_from_the_primary_for_a_while():
+    router, _, clock = make_router(sticky_seconds=2)
+    router.note_write("Alice")
+    assert router.acquire("alice") is None  # user ids compare like the users table does
+    assert router.acquire("bob") == "r1"
+    assert router.acquire() is None  # this thread wrote
+    assert in_thread(router.acquire) == "r2"  # another thread did not
+    clock.now = 3
+    assert router.acquire("alice") == "r1" and router.acquire() == "r2"
+    assert router.stats()["sticky_reads"] == 2
+
+    with pytest.raises(ValueError):
+        ReplicaRouter([])
+
+
+#  Two SQLite files standing in for replicas of a file primary
+@pytest.fixture
+def replicated(tmp_path, make_store):
+    primary = str(tmp_path / "primary.db")
+    replicas = [str(tmp_path / f"replica{i}.db") for i in (1, 2)]
+    make_store(SQLiteBackend(primary), customers=["101"])
+
+    def replicate():
+        bench_replicas.replicate(primary, replicas)
+
+    replicate()
+    database.configure_replicas([(path, SQLiteBackend(path)) for path in replicas])
+    return replicate
+
+
+def test_reads_spread_over_replicas_and_writers_see_their_writes(replicated):
+    gel, _ = product("Aloe Vera Gel")
+    assert services.fetch_orders_page("101")[0] == []
+    assert services.sales_report()["statuses"] == []
+    assert [r["reads"] for r in database.replica_stats()["replicas"]] == [1, 1]
+
+    order_id = services.place_order("101", {gel: 2})
+    # The replicas don't have it yet; the customer and this thread read the primary
+    assert [row[0] for row in services.fetch_orders_page("101")[0]] == [order_id]
+    assert [row[0] for row in in_thread(lambda: services.fetch_orders_page()[0])] == []
+    assert in_thread(lambda: services.get_order(order_id, user_id="101"))[0][0] == order_id
+    assert database.replica_stats()["sticky_reads"] == 2
+
+    replicated()
+    assert in_thread(lambda: services.get_order(order_id))[0][0] == order_id
+
+
+def test_register_then_login_reads_the_primary(replicated):
+    services.register_user("202", "secret", "Customer", "c@example.com", 30, "9999999999", "Pune", "MH", "411001")
+    assert in_thread(lambda: services.authenticate("202", "secret", "Customer"))
+    assert database.replica_stats()["sticky_reads"] == 1
+
+
+def test_a_missing_replica_is_skipped(replicated, tmp_path):
+    database.configure_replicas([
+        ("gone", SQLiteBackend(str(tmp_path / "no_such_dir" / "replica.db"))),
+        ("replica1", SQLiteBackend(str(tmp_path / "replica1.db"))),
+    ])
+    assert [services.low_stock_watchlist() for _ in range(3)] == [[], [], []]
+    gone, replica = database.replica_stats()["replicas"]
+    assert (gone["healthy"], gone["failures"], replica["reads"]) == (False, 1, 3)
+
+    database.configure_replicas(None)  # back to settings.db_replicas: none
+    assert database.replica_stats() is None
+    services.low_stock_watchlist()
+
+
+def test_settings_name_the_replicas(monkeypatch, tmp_path):
+    monkeypatch.setattr(database.settings, "db_backend", "sqlite")
+    monkeypatch.setattr(database.settings, "db_replicas", f"{tmp_path}/a.db, {tmp_path}/b.db")
+    database.configure_replicas(None)
+    try:
+        assert [r["name"] for r in database.replica_stats()["replicas"]] == [f"{tmp_path}/a.db", f"{tmp_path}/b.db"]
+    finally:
+        monkeypatch.setattr(database.settings, "db_replicas", "")
+        database.configure_replicas(None)
+
+
+def test_benchmark_moves_reads_off_the_primary(tmp_path):
+    report = bench_replicas.run_benchmark(str(tmp_path), customers=10, ops=80, threads=2)
+    assert report["primary_reduction_pct"] > 0
+    assert report["with_replicas"]["replica_statements"] > 0
+    assert report["with_replicas"]["errors"] == 0 and report["primary_only"]["errors"] == 0
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+import database
+import reservations
+import services
+from conftest import add_customer, query, run_scripted
+from reservations import ReservationConflict
+from storage import SQLiteBackend
+
+
+def test_reserve_is_conditional(sqlite_portal):
+    product_id = query("SELECT id FROM products WHERE name = 'Insulin Pen'")[0][0]
+    query("UPDATE products SET stock = 2 WHERE id = %s", (product_id,))
+    database.run_transaction(lambda cursor: reservations.reserve(cursor, product_id, 2))
+    with pytest.raises(ReservationConflict) as excinfo:
+        database.run_transaction(lambda cursor: reservations.reserve(cursor, product_id, 1))
+    assert excinfo.value.available == 0
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == 0
+
+
+def test_concurrent_buyers_never_oversell(tmp_path, make_store):
+    make_store(SQLiteBackend(str(tmp_path / "store.db")), customers=["101"])
+    product_id = query("SELECT id FROM products WHERE name = 'Insulin Pen'")[0][0]
+    query("UPDATE products SET stock = 10 WHERE id = %s", (product_id,))
+    outcomes = []
+
+    def buy():
+        try:
+            database.run_transaction(lambda cursor: services.checkout(cursor, "101", [(product_id, 1)]))
+            outcomes.append("ok")
+        except ReservationConflict:
+            outcomes.append("conflict")
+
+    threads = [threading.Thread(target=buy) for _ in range(25)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes.count("ok") == 10 and outcomes.count("conflict") == 15
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == 0
+    assert query("SELECT COUNT(*) FROM orders")[0][0] == 10
+
+
+def test_stale_update_and_double_cancel_are_rejected(sqlite_portal):
+    add_customer("101")
+    product_id, stock = query("SELECT id, stock FROM products WHERE name = 'Aloe Vera Gel'")[0]
+    run_scripted(sqlite_portal.place_order, ["1", "1", str(product_id), "3", "n"], "101")
+    order_id = query("SELECT id FROM orders")[0][0]
+
+    # Quantity changed by someone else while the customer is typing
+    def stale_quantity():
+        query("UPDATE order_lines SET quantity = 4 WHERE order_id = %s", (order_id,))
+        return "5"
+
+    printed = run_scripted(sqlite_portal.update_order,
+                           {"Enter Order ID": str(order_id), "Enter new quantity": stale_quantity}, "101")
+    assert "❌ Order not found or cannot be updated." in printed
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == stock - 3
+
+    run_scripted(sqlite_portal.cancel_order, [str(order_id)], "101")
+    printed = run_scripted(sqlite_portal.cancel_order, [str(order_id)], "101")
+    assert "You have no active orders to cancel." in printed
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == stock + 1
@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+import bench_search
+import database
+import services
+from conftest import add_customer, query, run_scripted
+from search_index import ProductSearchIndex, tokenize
+
+
+ROWS = [
+    (1, 1, "Personal Care", 10, "Skin Care", "Face Wash", 149.0, 40),
+    (2, 1, "Personal Care", 10, "Skin Care", "Moisturizer", 299.0, 0),
+    (3, 2, "Nutrition", 20, "Vitamins and Supplements", "Vitamin C Tablets", 350.0, 60),
+    (4, 2, "Nutrition", 20, "Vitamins and Supplements", "Omega 3 Capsules", 400.0, 55),
+]
+
+
+def make_index(rows):
+    calls = {"all": 0, "products": []}
+
+    def load_all():
+        calls["all"] += 1
+        return list(rows)
+
+    def load_products(ids):
+        calls["products"].append(list(ids))
+        return [row for row in rows if row[0] in ids]
+
+    return ProductSearchIndex(load_all, load_products), calls
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def test_tokenize_folds_case_and_punctuation():
+    assert tokenize("COVID-19 Rapid  Test-Kit") == ["covid", "19", "rapid", "test", "kit"]
+
+
+def test_every_word_matches_a_token_prefix_in_any_field():
+    index, calls = make_index(ROWS)
+    assert ids(index.search("vit")) == [3, 4]  # name and subcategory
+    assert ids(index.search("VIT tab")) == [3]
+    assert ids(index.search("tab vit")) == [3]
+    assert ids(index.search("personal care")) == [1]  # the moisturizer is out of stock
+    assert ids(index.search("personal care", in_stock_only=False)) == [1, 2]
+    assert ids(index.search("nutrition", limit=1)) == [3]
+    assert index.search("tamin") == []  # prefixes only
+    assert index.search("vitamin zzz") == []
+    assert index.search("  ") == []
+    assert calls["all"] == 1
+    assert index.search("wash")[0] == (1, "Face Wash", 149.0, 40)
+
+
+def test_stale_products_are_reread_alone():
+    rows = list(ROWS)
+    index, calls = make_index(rows)
+    index.warm()
+    rows[0] = rows[0][:7] + (0,)  # Face Wash sold out
+    rows[1] = (2, 1, "Personal Care", 10, "Skin Care", "Night Cream", 299.0, 5)
+    rows.append((5, 2, "Nutrition", 20, "Vitamins and Supplements", "Vitamin D Drops", 250.0, 10))
+    del rows[3]  # Omega 3 deleted
+    index.invalidate_products([1, 2, 4, 5])
+
+    assert ids(index.search("care")) == [2]
+    assert ids(index.search("moist", in_stock_only=False)) == []
+    assert ids(index.search("night")) == [2]
+    assert ids(index.search("vit")) == [3, 5]
+    assert index.search("omega") == []
+    assert calls["all"] == 1 and calls["products"] == [[1, 2, 4, 5]]
+    stats = index.stats()
+    assert stats["products"] == 4 and stats["stale"] == 0 and stats["refreshed_products"] == 4
+
+
+def test_invalidate_rebuilds_on_next_search():
+    index, calls = make_index(ROWS)
+    index.search("face")
+    index.invalidate()
+    assert ids(index.search("face")) == [1]
+    assert calls["all"] == 2
+
+
+def test_store_writes_keep_search_current(sqlite_portal):
+    add_customer("101")
+    insulin, stock = query("SELECT id, stock FROM products WHERE name = 'Insulin Pen'")[0]
+    assert ids(services.search_products("insulin")) == [insulin]
+    assert ids(services.search_products("diabetes")) == ids(services.list_products(
+        query("SELECT subcategory_id FROM products WHERE id = %s", (insulin,))[0][0]))
+
+    order_id = services.place_order("101", {insulin: stock})
+    assert services.search_products("insulin") == []
+    assert ids(services.search_products("insulin", in_stock_only=False)) == [insulin]
+    services.cancel_order("101", order_id)
+    assert services.search_products("insulin")[0][3] == stock
+
+    product_id = services.add_product("Insulin Cooler Bag", "Health Care", "Diabetes Management", 650, 5)
+    assert ids(services.search_products("insulin")) == [insulin, product_id]
+    services.delete_product(product_id)
+    assert ids(services.search_products("insulin")) == [insulin]
+
+
+def test_category_prompt_searches_when_given_words(sqlite_portal):
+    add_customer("101")
+    gel = query("SELECT id FROM products WHERE name = 'Aloe Vera Gel'")[0][0]
+    run_scripted(sqlite_portal.place_order, ["aloe", str(gel), "2", "n"], "101")
+    assert query("SELECT product_id, quantity FROM order_lines") == [(gel, 2)]
+
+    with patch("builtins.print") as printed:
+        assert sqlite_portal.search_products("no such thing") == []
+    assert "No products in stock match" in printed.call_args[0][0]
+
+
+def test_benchmark_runs_and_agrees_with_like(sqlite_portal):
+    report = bench_search.run_benchmark(products=2000, searches=20, like_searches=10, orders=5)
+    assert report["index_products"] >= 2000
+    assert report["index_results_in_stock"] and report["like_agrees"]
+    assert report["search_after_write"]["p50_ms"] > 0
+    database.product_search.invalidate()
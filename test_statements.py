@@ -0,0 +1,95 @@
+import pytest
+
+import bench_statements
+import database
+import services
+import statements
+from conftest import add_customer, product, query
+from reservations import RESERVE_STOCK, STOCK_BY_ID, ReservationConflict
+from statements import PreparingConnection
+from storage import SQLiteBackend, create_backend
+
+
+# SQLite with the wrapper MySQLBackend puts on its connections, so the
+# registry runs under the portal's own calls
+class PreparingSQLiteBackend(SQLiteBackend):
+    def connect(self, db=None):
+        return PreparingConnection(super().connect(db), lambda raw: raw.cursor())
+
+
+@pytest.fixture
+def prepared_portal(make_store):
+    make_store(PreparingSQLiteBackend(":memory:"))
+    statements.reset_stats()
+
+
+def test_hot_statements_are_prepared_once_per_connection(prepared_portal):
+    gel, stock = product("Aloe Vera Gel")
+    with database.borrow_connection(database.settings.db_name) as conn:
+        for _ in range(3):
+            cursor = conn.cursor()
+            cursor.execute(STOCK_BY_ID, (gel,))
+            assert cursor.fetchone() == (stock,) and cursor.fetchone() is None
+            cursor.close()
+        cursor = conn.cursor()
+        cursor.execute(RESERVE_STOCK, (2, gel, 2))
+        assert cursor.rowcount == 1
+        # Plain statements still run on the caller's cursor, results and all
+        cursor.execute("SELECT name FROM products WHERE id = %s", (gel,))
+        assert cursor.fetchall() == [("Aloe Vera Gel",)]
+        cursor.execute(STOCK_BY_ID, (gel,))
+        assert list(cursor) == [(stock - 2,)]
+        conn.rollback()
+        cursor.close()
+        assert len(conn.statements) == 2
+
+    assert statements.stats() == {
+        "stock_by_id": {"prepared": 1, "executions": 4},
+        "reserve_stock": {"prepared": 1, "executions": 1},
+    }
+
+
+def test_portal_runs_on_prepared_statements(prepared_portal):
+    add_customer("101", city="Nashik")
+    gel, stock = product("Aloe Vera Gel")
+    pen, pen_stock = product("Insulin Pen")
+
+    order_id = services.place_order("101", {gel: 2})
+    assert query("SELECT shipping_city FROM orders WHERE id = %s", (order_id,)) == [("Nashik",)]
+    assert services.active_order_lines("101") == [(order_id, "Aloe Vera Gel", 2, "Placed", gel)]
+    with pytest.raises(ReservationConflict) as excinfo:
+        services.place_order("101", {pen: pen_stock + 1})
+    assert excinfo.value.available == pen_stock
+    with pytest.raises(services.CustomerNotFound):
+        services.place_order("999", {gel: 1})
+    services.cancel_order("101", order_id)
+    assert services.active_order_lines("101") == []
+    assert product("Aloe Vera Gel")[1] == stock
+
+    counts = statements.stats()
+    assert {name: c["prepared"] for name, c in counts.items()} == {
+        "insert_order": 1, "reserve_stock": 1, "stock_by_id": 1, "active_order_lines": 1,
+    }
+    assert counts["insert_order"]["executions"] == 3 and counts["active_order_lines"]["executions"] == 2
+
+
+def test_settings_switch_prepared_statements_off(monkeypatch, sqlite_portal):
+    monkeypatch.setattr(database.settings, "db_backend", "sqlite")
+    monkeypatch.setattr(database.settings, "prepared_statements", False)
+    assert create_backend(database.settings).prepared_statements is False
+
+    database.configure_backend(SQLiteBackend(":memory:", prepared_statements=False))
+    database.apply_migrations()
+    services.populate_products()
+    add_customer("101")
+    gel, stock = product("Aloe Vera Gel")
+    services.place_order("101", {gel: 1})
+    assert product("Aloe Vera Gel")[1] == stock - 1
+
+
+def test_benchmark_reports_every_hot_statement():
+    report = bench_statements.run_benchmark(iterations=50, warmup=5, orders_per_customer=1)
+    assert set(report["text"]) == set(report["prepared"]) == set(report["savings_pct"]) == {
+        "stock_by_id", "reserve_stock", "release_stock", "insert_order", "active_order_lines",
+    }
+    assert all(result["p50_us"] > 0 for result in report["prepared"].values())
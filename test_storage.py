@@ -0,0 +1,37 @@
+import services
+from conftest import add_customer, query, run_scripted
+
+
+def test_sqlite_backend_creates_schema_and_seed(sqlite_portal):
+    services.populate_products()  # idempotent
+    assert query("SELECT COUNT(*) FROM products")[0][0] == 23
+
+
+def test_order_lifecycle_on_sqlite(sqlite_portal):
+    add_customer("101")
+    product_id, stock = query("SELECT id, stock FROM products WHERE name = 'Aloe Vera Gel'")[0]
+
+    run_scripted(sqlite_portal.place_order, ["1", "1", str(product_id), "3", "n"], "101")
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == stock - 3
+    order_id, quantity, city = query("""
+        SELECT o.id, l.quantity, o.shipping_city FROM orders o JOIN order_lines l ON l.order_id = o.id
+    """)[0]
+    assert (quantity, city) == (3, "Pune")
+
+    run_scripted(sqlite_portal.update_order, [str(order_id), "5"], "101")
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == stock - 5
+
+    run_scripted(sqlite_portal.cancel_order, [str(order_id)], "101")
+    assert query("SELECT stock FROM products WHERE id = %s", (product_id,))[0][0] == stock
+    assert query("SELECT status FROM orders WHERE id = %s", (order_id,))[0][0] == "Cancelled"
+
+    # Date columns come back as datetimes, as from MySQL
+    run_scripted(sqlite_portal.view_orders, [], "101")
+    run_scripted(sqlite_portal.view_orders, [], admin=True)
+
+
+def test_place_order_rejects_quantity_above_stock(sqlite_portal):
+    add_customer("101")
+    product_id, stock = query("SELECT id, stock FROM products WHERE name = 'Aloe Vera Gel'")[0]
+    run_scripted(sqlite_portal.place_order, ["1", "1", str(product_id), str(stock + 1)], "101")
+    assert query("SELECT COUNT(*) FROM orders")[0][0] == 0
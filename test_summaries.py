@@ -0,0 +1,138 @@
+import pytest
+
+import database
+import rebuild_summaries
+import services
+from conftest import add_customer, product, query
+from reservations import ReservationConflict
+from services import OrderUnavailable
+from storage import SQLiteBackend
+
+
+def sales():
+    return {product_id: (units, round(float(revenue), 2))
+            for product_id, units, revenue in query("""
+                SELECT product_id, SUM(units), SUM(revenue) FROM sales_daily
+                GROUP BY product_id HAVING SUM(units) != 0
+            """)}
+
+
+def statuses():
+    return dict(query("SELECT status, SUM(orders) FROM order_status_counts GROUP BY status HAVING SUM(orders) != 0"))
+
+
+def test_order_writes_keep_the_summaries_current(sqlite_portal):
+    add_customer("101")
+    gel, gel_price = product("Aloe Vera Gel", "price")
+    pen, pen_price = product("Insulin Pen", "price")
+
+    first = services.place_order("101", {gel: 2, pen: 1})
+    second = services.place_order("101", {gel: 3})
+    assert sales() == {gel: (5, round(5 * float(gel_price), 2)), pen: (1, round(float(pen_price), 2))}
+    assert statuses() == {"Placed": 2}
+
+    services.update_order_line("101", first, gel, 4)
+    assert sales()[gel] == (7, round(7 * float(gel_price), 2))
+    assert statuses() == {"Placed": 1, "Updated": 1}
+
+    services.cancel_order("101", first)
+    assert sales() == {gel: (3, round(3 * float(gel_price), 2))}
+    assert statuses() == {"Placed": 1, "Cancelled": 1}
+
+    services.cancel_order("101", second)
+    assert sales() == {}
+    assert statuses() == {"Cancelled": 2}
+    assert services.summary_drift() == []
+
+
+def test_rejected_writes_leave_the_summaries_alone(sqlite_portal):
+    add_customer("101")
+    gel, _ = product("Aloe Vera Gel", "price")
+    order_id = services.place_order("101", {gel: 1})
+    before = (sales(), statuses())
+
+    with pytest.raises(ReservationConflict):
+        services.place_order("101", {gel: 10 ** 6})
+    with pytest.raises(ReservationConflict):
+        services.update_order_line("101", order_id, gel, 10 ** 6)
+    services.cancel_order("101", order_id)
+    with pytest.raises(OrderUnavailable):
+        services.cancel_order("101", order_id)
+    with pytest.raises(OrderUnavailable):
+        services.update_order_line("101", order_id, gel, 2)
+
+    assert before[1] == {"Placed": 1}
+    assert statuses() == {"Cancelled": 1}
+    assert services.summary_drift() == []
+
+
+def test_rebuild_repairs_drift(sqlite_portal, capsys):
+    add_customer("101")
+    gel, _ = product("Aloe Vera Gel", "price")
+    services.place_order("101", {gel: 2})
+    expected = (sales(), statuses())
+
+    query("UPDATE sales_daily SET units = units + 5")
+    query("DELETE FROM order_status_counts")
+    assert {table for table, *_ in services.summary_drift()} == {"sales_daily", "order_status_counts"}
+    assert rebuild_summaries.main(["--check"]) == 1
+
+    assert rebuild_summaries.main([]) == 0
+    assert (sales(), statuses()) == expected
+    assert rebuild_summaries.main(["--check"]) == 0
+    assert "Summaries match" in capsys.readouterr().out
+
+
+def test_sales_report_reads_the_summaries(sqlite_portal):
+    add_customer("101")
+    gel, gel_price = product("Aloe Vera Gel", "price")
+    pen, pen_price = product("Insulin Pen", "price")
+    services.place_order("101", {gel: 1, pen: 2})
+    services.cancel_order("101", services.place_order("101", {gel: 5}))
+
+    # Orders are not read: emptying them leaves the report as it was
+    report = services.sales_report(days=7, top=1)
+    query("DELETE FROM order_lines")
+    query("DELETE FROM orders")
+    assert services.sales_report(days=7, top=1) == report
+
+    assert report["statuses"] == [("Cancelled", 1), ("Placed", 1)]
+    top = max([(gel, 1, float(gel_price)), (pen, 2, 2 * float(pen_price))], key=lambda r: r[2])
+    assert [(r[0], r[2], round(float(r[3]), 2)) for r in report["products"]] == [(top[0], top[1], round(top[2], 2))]
+    assert sum(r[2] for r in report["categories"]) == 3
+
+
+def test_group_commit_batches_keep_the_summaries_current(tmp_path, monkeypatch):
+    database.configure_backend(SQLiteBackend(str(tmp_path / "store.db")))
+    monkeypatch.setattr(database.settings, "group_commit", True)
+    try:
+        services.bootstrap()
+        add_customer("101")
+        gel, _ = product("Aloe Vera Gel", "price")
+        writer = services.order_writer()
+        futures = [writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 1)])) for _ in range(5)]
+        futures.append(writer.submit(lambda cursor: services.checkout(cursor, "101", [(gel, 10 ** 6)])))
+        order_ids = [f.result() for f in futures[:5]]
+        with pytest.raises(ReservationConflict):
+            futures[-1].result()
+        services.cancel_order("101", order_ids[0])
+
+        assert sales()[gel][0] == 4
+        assert statuses() == {"Placed": 4, "Cancelled": 1}
+        assert services.summary_drift() == []
+    finally:
+        services.close_order_writer()
+        database.configure_backend(None)
+
+
+def test_migration_fills_the_summaries_from_existing_orders(sqlite_portal):
+    add_customer("101")
+    gel, _ = product("Aloe Vera Gel", "price")
+    services.place_order("101", {gel: 2})
+    expected = (sales(), statuses())
+    query("DROP TABLE sales_daily")
+    query("DROP TABLE order_status_counts")
+    query("DELETE FROM schema_version WHERE version >= 8")
+
+    database.apply_migrations()
+    assert (sales(), statuses()) == expected
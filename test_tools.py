@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import bench_export
+import bench_ingest
+import data_export
+import order_ingest
+from conftest import add_customer, product
+
+
+#  Command-line tools and their benchmarks: one smoke run each
+#
+#  Every case is (run the CLI, its summary line, run the benchmark at toy
+#  size, check the report); the tools' own behaviour is tested next to them.
+
+def export_cli(tmp_path):
+    report = data_export.main(["products", str(tmp_path / "products.jsonl")])
+    assert report["rows"] > 0
+
+
+def export_bench(tmp_path):
+    report = bench_export.run_benchmark(orders=300, lines=2, out_dir=str(tmp_path))
+    assert all(s["rows"] == 600 for s in report["formats"].values())
+    assert report["formats"]["csv.gz"]["bytes"] < report["formats"]["csv"]["bytes"]
+
+
+def ingest_cli(tmp_path):
+    add_customer("101")
+    path = tmp_path / "orders.jsonl"
+    path.write_text(json.dumps({"user_id": "101", "product_id": product("Aloe Vera Gel")[0], "quantity": 1}) + "\n")
+    assert order_ingest.main([str(path)])["orders_placed"] == 1
+
+
+def ingest_bench(tmp_path):
+    report = bench_ingest.run_benchmark(orders=300, single=10, chunk_size=50, customers=5)
+    assert report["batch"]["orders_placed"] + report["batch"]["lines_rejected"] == 300
+    assert report["ledger_violations"] == 0 and report["summary_drift"] == 0
+
+
+TOOLS = {
+    "data_export": (export_cli, "✅ Exported", export_bench),
+    "order_ingest": (ingest_cli, "✅ Placed 1 of 1 orders", ingest_bench),
+}
+
+
+@pytest.mark.parametrize("tool", TOOLS)
+def test_cli_and_benchmark(tool, sqlite_portal, tmp_path, capsys):
+    cli, summary, bench = TOOLS[tool]
+    cli(tmp_path)
+    assert summary in capsys.readouterr().out
+    bench(tmp_path)